@@ -0,0 +1,17 @@
+# accounts/hashers.py
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ProfiledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 whose work factor comes from PASSWORD_HASHER_PROFILE.
+
+    It keeps the ``pbkdf2_sha256`` algorithm name, so existing hashes verify
+    as before and are re-encoded with the profile's iteration count on the
+    user's next successful login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHER_PROFILES[settings.PASSWORD_HASHER_PROFILE]
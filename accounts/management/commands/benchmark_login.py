@@ -0,0 +1,74 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from accounts.views import CustomTokenObtainPairView
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Measure login latency and CPU-seconds per login for each password hasher profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', action='append', dest='profiles',
+            help="Profile to measure (repeatable, default: all of PASSWORD_HASHER_PROFILES)",
+        )
+        parser.add_argument('--logins', type=int, default=10, help="Logins per profile (default 10)")
+
+    def handle(self, *args, **options):
+        profiles = options['profiles'] or list(settings.PASSWORD_HASHER_PROFILES)
+        unknown = set(profiles) - set(settings.PASSWORD_HASHER_PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profile(s): {', '.join(sorted(unknown))}")
+
+        self.stdout.write(
+            f"{'profile':<10} {'iterations':>10} {'hash ms':>8} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'CPU s/login':>11} {'logins/s/core':>13}"
+        )
+        for profile in profiles:
+            with override_settings(PASSWORD_HASHER_PROFILE=profile):
+                self.benchmark(profile, options['logins'])
+
+    def benchmark(self, profile, logins):
+        start = time.perf_counter()
+        make_password('benchmark-password')
+        hash_ms = (time.perf_counter() - start) * 1000
+
+        # Throttles are off so only the cost of a login is measured
+        view = CustomTokenObtainPairView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        latencies = []
+
+        with transaction.atomic():
+            User.objects.create_user(
+                'benchmark-login@example.com', 'benchmark-password', first_name='Bench', last_name='Login'
+            )
+            cpu_start = time.process_time()
+            for _ in range(logins):
+                request = factory.post(
+                    '/api/auth/login/',
+                    {'email': 'benchmark-login@example.com', 'password': 'benchmark-password'},
+                    format='json',
+                )
+                start = time.perf_counter()
+                response = view(request)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f"Login failed with {response.status_code}: {response.data}")
+            cpu_per_login = (time.process_time() - cpu_start) / logins
+            transaction.set_rollback(True)
+
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        self.stdout.write(
+            f"{profile:<10} {settings.PASSWORD_HASHER_PROFILES[profile]:>10} {hash_ms:>8.1f} "
+            f"{statistics.median(latencies):>8.1f} {p95:>8.1f} {cpu_per_login:>11.3f} {1 / cpu_per_login:>13.1f}"
+        )
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted refresh tokens in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0, help="Seconds to pause between batches")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        total = 0
+        while True:
+            # Blacklist rows go with their outstanding token (ON DELETE CASCADE)
+            with transaction.atomic():
+                ids = list(
+                    OutstandingToken.objects.filter(expires_at__lt=now)
+                    .values_list('id', flat=True)[:options['batch_size']]
+                )
+                if not ids:
+                    break
+                OutstandingToken.objects.filter(id__in=ids).delete()
+            total += len(ids)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {total} expired token(s)"))
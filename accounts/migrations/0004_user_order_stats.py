@@ -0,0 +1,52 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:57
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_order_stats(apps, schema_editor):
+    User = apps.get_model('accounts', 'CustomUser')
+    totals = {}
+    for model_name in ('Order', 'ArchivedOrder'):
+        rows = (
+            apps.get_model('orders', model_name).objects.exclude(order_status='CANCELLED')
+            .order_by().values('user_id').annotate(orders=Count('pk'), spend=Sum('total'))
+        )
+        for row in rows:
+            orders, spend = totals.get(row['user_id'], (0, 0))
+            totals[row['user_id']] = (orders + row['orders'], spend + row['spend'])
+    users = list(User.objects.filter(pk__in=totals).only('id'))
+    for user in users:
+        user.order_count, user.lifetime_spend = totals[user.pk]
+    User.objects.bulk_update(users, ['order_count', 'lifetime_spend'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_search_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('orders', '0005_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='lifetime_spend',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='order_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['order_count'], name='user_order_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['lifetime_spend'], name='user_lifetime_spend_idx'),
+        ),
+        migrations.RunPython(backfill_order_stats, migrations.RunPython.noop),
+    ]
@@ -2,8 +2,13 @@
 
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.utils import timezone
 
+# Appended to a prefix to get an exclusive upper bound: 'ali' matches ['ali', 'ali\U0010ffff')
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
@@ -27,6 +32,23 @@ class CustomUserManager(BaseUserManager):
         
         return self.create_user(email, password, **extra_fields)
 
+    def search(self, term):
+        """Case-insensitive prefix search on email, first name and last name.
+
+        Each condition is a range on lower(column), which the matching
+        expression index answers directly; LIKE/ILIKE prefixes would not use it.
+        """
+        term = term.strip().lower()
+        bounds = {'gte': term, 'lt': term + PREFIX_UPPER_BOUND}
+        condition = Q()
+        for alias in ('email_lower', 'first_name_lower', 'last_name_lower'):
+            condition |= Q(**{f"{alias}__{lookup}": value for lookup, value in bounds.items()})
+        return self.get_queryset().alias(
+            email_lower=Lower('email'),
+            first_name_lower=Lower('first_name'),
+            last_name_lower=Lower('last_name'),
+        ).filter(condition)
+
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     # Define user roles
     ROLE_CHOICES = (
@@ -48,11 +70,30 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     
     # Role field to differentiate between normal users and admins
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='USER')
+
+    # Totals over the user's orders that were not cancelled, archived ones included.
+    # Kept up to date by orders.stats; rebuild_order_stats recomputes them.
+    order_count = models.PositiveIntegerField(default=0)
+    lifetime_spend = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     
     objects = CustomUserManager()
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name']
+
+    class Meta:
+        indexes = [
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+            models.Index(Lower('first_name'), name='user_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='user_last_name_lower_idx'),
+            # Plain indexes back ordering=first_name/last_name; the Lower() ones serve search
+            models.Index(fields=['first_name'], name='user_first_name_idx'),
+            models.Index(fields=['last_name'], name='user_last_name_idx'),
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+            models.Index(fields=['role', 'date_joined'], name='user_role_date_joined_idx'),
+            models.Index(fields=['order_count'], name='user_order_count_idx'),
+            models.Index(fields=['lifetime_spend'], name='user_lifetime_spend_idx'),
+        ]
     
     def __str__(self):
         return self.email
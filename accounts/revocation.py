@@ -0,0 +1,96 @@
+# accounts/revocation.py
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings: no false negatives, rare false positives."""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RevocationFilter:
+    """
+    In-process view of revoked refresh-token ``jti``s.
+
+    New ``BlacklistedToken`` rows are pulled in incrementally at most every
+    REVOCATION_FILTER['SYNC_INTERVAL'] seconds, and the whole filter is rebuilt
+    from unexpired rows every REBUILD_INTERVAL so purged tokens drop out. A
+    miss means the token is definitely not revoked and needs no query; a hit
+    still has to be confirmed against the database.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.last_id = 0
+        self.synced_at = 0
+        self.rebuilt_at = 0
+
+    @property
+    def config(self):
+        return settings.REVOCATION_FILTER
+
+    def might_be_revoked(self, jti):
+        self.sync()
+        return jti in self.bloom
+
+    def add(self, jti):
+        """Record a revocation made by this process without waiting for the next sync."""
+        self.sync()
+        with self.lock:
+            self.bloom.add(jti)
+
+    def sync(self):
+        now = time.monotonic()
+        if self.bloom is not None and now - self.synced_at < self.config['SYNC_INTERVAL']:
+            return
+        with self.lock:
+            if self.bloom is not None and now - self.synced_at < self.config['SYNC_INTERVAL']:
+                return
+            if self.bloom is None or now - self.rebuilt_at >= self.config['REBUILD_INTERVAL']:
+                self._rebuild()
+                self.rebuilt_at = now
+            else:
+                self._load(BlacklistedToken.objects.filter(id__gt=self.last_id))
+            self.synced_at = now
+
+    def _rebuild(self):
+        # Expired tokens fail verification anyway, so they are left out
+        live = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+        capacity = max(self.config['CAPACITY'], live.count() * 2)
+        self.bloom = BloomFilter(capacity, self.config['ERROR_RATE'])
+        self.last_id = BlacklistedToken.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        self._load(live.filter(id__lte=self.last_id))
+
+    def _load(self, queryset):
+        for row_id, jti in queryset.order_by('id').values_list('id', 'token__jti').iterator(chunk_size=2000):
+            self.bloom.add(jti)
+            self.last_id = max(self.last_id, row_id)
+
+
+revoked_tokens = RevocationFilter()
@@ -3,11 +3,15 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from ppg_backend.fieldsets import SparseFieldsetMixin
+from .tokens import FilteredRefreshToken
 
 User = get_user_model()
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = FilteredRefreshToken
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -20,12 +24,17 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         
         return token
 
-class UserSerializer(serializers.ModelSerializer):
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """Rotates refresh tokens, checking revocation through the in-process filter"""
+    token_class = FilteredRefreshToken
+
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'email', 'first_name', 'last_name', 'phone_number', 
-                 'address', 'city', 'state', 'zip_code', 'role')
-        read_only_fields = ('id',)
+                 'address', 'city', 'state', 'zip_code', 'role', 'order_count', 'lifetime_spend')
+        read_only_fields = ('id', 'order_count', 'lifetime_spend')
 
 
 class RegisterSerializer(serializers.ModelSerializer):
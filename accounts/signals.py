@@ -0,0 +1,31 @@
+# accounts/signals.py
+"""Keep the dashboard's user counters in step with user changes."""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from ppg_backend import counters
+from .models import CustomUser
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_previous_is_active(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'is_active' not in update_fields:
+        # Saves such as the last_login update on every sign-in skip the lookup
+        instance._previous_is_active = instance.is_active
+        return
+    previous = None
+    if instance.pk:
+        previous = CustomUser.objects.filter(pk=instance.pk).values_list('is_active', flat=True).first()
+    instance._previous_is_active = bool(previous)
+
+
+@receiver(post_save, sender=CustomUser)
+def count_saved_user(sender, instance, created, **kwargs):
+    counters.adjust(counters.active_deltas(
+        'users', created, False, instance._previous_is_active, instance.is_active
+    ))
+
+
+@receiver(post_delete, sender=CustomUser)
+def count_deleted_user(sender, instance, **kwargs):
+    counters.adjust(counters.active_deltas('users', False, True, instance.is_active, False))
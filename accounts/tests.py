@@ -1,3 +1,295 @@
-from django.test import TestCase
+import base64
+import json
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password, identify_hasher, make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from . import throttling
+from .models import CustomUser
+from .revocation import BloomFilter, RevocationFilter
+from .tokens import FilteredRefreshToken
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ListUsersViewTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(
+            'admin@example.com', 'pw', first_name='Ada', last_name='Admin', role='ADMIN'
+        )
+        now = timezone.now()
+        self.users = [
+            CustomUser.objects.create_user(email, 'pw', first_name=first, last_name=last,
+                                           date_joined=now - timedelta(days=days), is_active=active)
+            for email, first, last, days, active in [
+                ('alice@example.com', 'Alice', 'Smith', 30, True),
+                ('bob@example.com', 'Bob', 'Alison', 20, True),
+                ('carol@example.com', 'Carol', 'Jones', 10, False),
+                ('dave@example.com', 'Dave', 'Brown', 1, True),
+            ]
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def emails(self, response):
+        return [user['email'] for user in response.data['users']]
+
+    def test_search_matches_prefix_of_email_first_or_last_name(self):
+        response = self.client.get('/api/auth/admin/users/', {'search': 'ALI'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(self.emails(response)), ['alice@example.com', 'bob@example.com'])
+
+    def test_search_does_not_match_inside_words(self):
+        response = self.client.get('/api/auth/admin/users/', {'search': 'son'})
+        self.assertEqual(self.emails(response), [])
+
+    def test_filters_by_role_active_and_date_joined(self):
+        response = self.client.get('/api/auth/admin/users/', {
+            'role': 'USER',
+            'is_active': 'true',
+            'joined_after': (timezone.now() - timedelta(days=25)).date().isoformat(),
+        })
+        self.assertEqual(self.emails(response), ['bob@example.com', 'dave@example.com'])
+
+    def test_keyset_pagination_walks_every_row_once(self):
+        seen, cursor = [], None
+        while True:
+            params = {'ordering': '-date_joined', 'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/api/auth/admin/users/', params)
+            self.assertEqual(response.data['count'], 5)
+            seen += self.emails(response)
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [
+            'admin@example.com', 'dave@example.com', 'carol@example.com', 'bob@example.com', 'alice@example.com'
+        ])
+
+    def test_rejects_unknown_ordering(self):
+        response = self.client.get('/api/auth/admin/users/', {'ordering': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_admin_is_forbidden(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.client.get('/api/auth/admin/users/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_search_query_is_served_by_indexes(self):
+        plan = CustomUser.objects.search('ali').explain()
+        self.assertIn('user_email_lower_idx', plan)
+        self.assertIn('user_first_name_lower_idx', plan)
+        self.assertIn('user_last_name_lower_idx', plan)
+        self.assertNotIn('SCAN accounts_customuser', plan)
+
+    def test_orders_and_filters_by_order_stats(self):
+        for user, (orders, spend) in zip(self.users, [(3, '90.00'), (1, '250.00'), (0, '0'), (2, '40.00')]):
+            CustomUser.objects.filter(pk=user.pk).update(order_count=orders, lifetime_spend=spend)
+        response = self.client.get('/api/auth/admin/users/', {'ordering': '-lifetime_spend', 'min_orders': 1})
+        self.assertEqual(self.emails(response), ['bob@example.com', 'alice@example.com', 'dave@example.com'])
+        response = self.client.get('/api/auth/admin/users/', {'ordering': 'order_count', 'max_spend': '50'})
+        self.assertEqual(self.emails(response), ['admin@example.com', 'carol@example.com', 'dave@example.com'])
+
+    def test_rejects_non_numeric_stat_filter(self):
+        response = self.client.get('/api/auth/admin/users/', {'min_spend': 'lots'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_order_stat_sorts_are_served_by_indexes(self):
+        for field, index in (('order_count', 'user_order_count_idx'), ('lifetime_spend', 'user_lifetime_spend_idx')):
+            plan = CustomUser.objects.filter(**{f"{field}__gte": 1}).order_by(f"-{field}").explain()
+            self.assertIn(index, plan)
+
+    def test_rejects_cursor_with_malformed_sort_value(self):
+        for ordering in ('date_joined', '-lifetime_spend', 'order_count'):
+            with self.subTest(ordering=ordering):
+                cursor = base64.urlsafe_b64encode(json.dumps(['garbage', 1]).encode()).decode()
+                response = self.client.get('/api/auth/admin/users/', {'ordering': ordering, 'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.data)
+
+    def test_name_sorts_are_served_by_indexes(self):
+        for field, index in (('first_name', 'user_first_name_idx'), ('last_name', 'user_last_name_idx')):
+            plan = CustomUser.objects.filter(**{f"{field}__gt": 'M'}).order_by(field, 'pk').explain()
+            self.assertIn(index, plan)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RefreshTokenRevocationTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        self.client = APIClient()
+        response = self.client.post('/api/auth/login/', {'email': 'cust@example.com', 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+        self.refresh = response.data['refresh']
+
+    def refresh_with(self, token):
+        return self.client.post('/api/auth/login/refresh/', {'refresh': token})
+
+    def test_refresh_rotates_and_revokes_the_used_token(self):
+        response = self.refresh_with(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], self.refresh)
+        self.assertEqual(self.refresh_with(response.data['refresh']).status_code, 200)
+
+    def test_replayed_refresh_token_is_rejected(self):
+        self.assertEqual(self.refresh_with(self.refresh).status_code, 200)
+        self.assertEqual(self.refresh_with(self.refresh).status_code, 401)
+
+    def test_logout_revokes_the_refresh_token(self):
+        response = self.client.post('/api/auth/logout/', {'refresh': self.refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh_with(self.refresh).status_code, 401)
+        # A second logout finds the token already revoked
+        self.assertEqual(self.client.post('/api/auth/logout/', {'refresh': self.refresh}).status_code, 400)
+
+    def test_blacklisting_an_already_revoked_token_fails(self):
+        FilteredRefreshToken(self.refresh).blacklist()
+        with self.assertRaises(TokenError):
+            FilteredRefreshToken(self.refresh, verify=False).blacklist()
+
+
+class RevocationFilterTests(TestCase):
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        values = [f"jti-{n}" for n in range(1000)]
+        for value in values:
+            bloom.add(value)
+        self.assertTrue(all(value in bloom for value in values))
+        false_positives = sum(f"other-{n}" in bloom for n in range(1000))
+        self.assertLess(false_positives, 50)
+
+    @override_settings(REVOCATION_FILTER={
+        'CAPACITY': 1000, 'ERROR_RATE': 0.001, 'SYNC_INTERVAL': 0, 'REBUILD_INTERVAL': 3600,
+    })
+    def test_filter_picks_up_tokens_revoked_elsewhere(self):
+        user = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        revoked = RevocationFilter()
+        token = FilteredRefreshToken.for_user(user)
+        self.assertFalse(revoked.might_be_revoked(token['jti']))
+
+        # Revoked by another process: only the blacklist table changes
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+        self.assertTrue(revoked.might_be_revoked(token['jti']))
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    AUTH_THROTTLE_RATES={'login_ip': '100/min', 'login_account': '3/min', 'register_ip': '2/hour'},
+)
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.now = time.time()
+        clock = mock.patch.object(throttling.time, 'time', lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        CustomUser.objects.create_user('bucket@example.com', 'pw', first_name='Bu', last_name='Cket')
+        self.client = APIClient()
+
+    def login(self, password='wrong', email='bucket@example.com'):
+        return self.client.post('/api/auth/login/', {'email': email, 'password': password})
+
+    def test_burst_then_429_with_retry_after(self):
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 401)
+        response = self.login(password='pw')
+        self.assertEqual(response.status_code, 429)
+        # One token comes back every 20 seconds at 3/min
+        self.assertEqual(response['Retry-After'], '20')
+        # Other accounts have their own bucket
+        self.assertEqual(self.login(email='other@example.com').status_code, 401)
+
+    def test_bucket_refills_at_the_steady_rate(self):
+        for _ in range(3):
+            self.login()
+        self.now += 10
+        self.assertEqual(self.login().status_code, 429)
+        self.now += 10
+        self.assertEqual(self.login(password='pw').status_code, 200)
+        self.assertEqual(self.login().status_code, 429)
+
+        # A long pause refills the bucket up to its size and no further
+        self.now += 3600
+        for _ in range(3):
+            self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.login().status_code, 429)
+
+    def test_registration_is_throttled_per_ip(self):
+        for index in range(2):
+            response = self.client.post('/api/auth/register/', {'email': f'new{index}@example.com'})
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/auth/register/', {'email': 'new2@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1800')
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    PASSWORD_HASHING_CONCURRENCY=1, PASSWORD_HASHING_QUEUE_TIMEOUT=0.01,
+)
+class PasswordHashingSlotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # The semaphore is built on first use from the settings above
+        slots = mock.patch.object(throttling, '_hashing_slots', None)
+        slots.start()
+        self.addCleanup(slots.stop)
+
+    def test_busy_slots_fail_fast_with_503(self):
+        CustomUser.objects.create_user('slot@example.com', 'pw', first_name='Sl', last_name='Ot')
+        client = APIClient()
+        with throttling.password_hashing_slot():
+            with self.assertRaises(throttling.PasswordHashingBusy):
+                with throttling.password_hashing_slot():
+                    pass
+            response = client.post('/api/auth/login/', {'email': 'slot@example.com', 'password': 'pw'})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '1')
+
+        response = client.post('/api/auth/login/', {'email': 'slot@example.com', 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_slot_is_released_when_the_body_raises(self):
+        with self.assertRaises(ValueError):
+            with throttling.password_hashing_slot():
+                raise ValueError
+        with throttling.password_hashing_slot():
+            pass
+
+
+@override_settings(
+    PASSWORD_HASHERS=['accounts.hashers.ProfiledPBKDF2PasswordHasher'],
+    PASSWORD_HASHER_PROFILES={'strong': 2000, 'fast': 1000},
+    PASSWORD_HASHER_PROFILE='fast',
+)
+class ProfiledPBKDF2PasswordHasherTests(TestCase):
+    def test_iterations_come_from_the_profile(self):
+        encoded = make_password('pw')
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(check_password('pw', encoded))
+
+        with self.settings(PASSWORD_HASHER_PROFILE='strong'):
+            self.assertTrue(make_password('pw').startswith('pbkdf2_sha256$2000$'))
+            # Older hashes still verify and are flagged for re-encoding
+            self.assertTrue(check_password('pw', encoded))
+            self.assertTrue(identify_hasher(encoded).must_update(encoded))
+
+    def test_login_upgrades_the_stored_hash(self):
+        user = CustomUser.objects.create_user('hash@example.com', 'pw', first_name='Ha', last_name='Sh')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        cache.clear()
+        with self.settings(PASSWORD_HASHER_PROFILE='strong'):
+            response = APIClient().post('/api/auth/login/', {'email': 'hash@example.com', 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
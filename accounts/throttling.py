@@ -0,0 +1,113 @@
+# accounts/throttling.py
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token-bucket throttle keyed by ``scope`` and ``get_cache_key()``.
+
+    A rate of ``"5/min"`` is a bucket of 5 tokens refilled at 5 per minute, so
+    a client can burst up to the bucket size and then continues at the
+    steady rate. Buckets live in the default cache; point CACHES at a shared
+    backend when running several worker processes.
+    """
+    scope = None
+    durations = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.capacity, self.refill_rate = self.parse_rate(settings.AUTH_THROTTLE_RATES[self.scope])
+        self.wait_seconds = None
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        capacity = int(num)
+        return capacity, capacity / self.durations[period[0]]
+
+    def get_cache_key(self, request, view):
+        raise NotImplementedError('.get_cache_key() must be overridden')
+
+    def allow_request(self, request, view):
+        ident = self.get_cache_key(request, view)
+        if ident is None:
+            return True
+
+        key = f"throttle:{self.scope}:{ident}"
+        now = time.time()
+        with self.lock:
+            tokens, updated = cache.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.wait_seconds = (1 - tokens) / self.refill_rate
+            # Keep the bucket around until it would be full again
+            cache.set(key, (tokens, now), int((self.capacity - tokens) / self.refill_rate) + 1)
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.get_ident(request)
+
+
+class LoginAccountThrottle(TokenBucketThrottle):
+    scope = 'login_account'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return email.strip().lower()
+
+
+class RegisterIPThrottle(TokenBucketThrottle):
+    scope = 'register_ip'
+
+    def get_cache_key(self, request, view):
+        return self.get_ident(request)
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-in attempts are being processed. Please retry shortly.'
+    default_code = 'password_hashing_busy'
+    wait = 1
+
+
+_hashing_slots = None
+_hashing_slots_lock = threading.Lock()
+
+
+@contextmanager
+def password_hashing_slot():
+    """Cap how many password hashes run at once in this process.
+
+    Requests that cannot get a slot within PASSWORD_HASHING_QUEUE_TIMEOUT
+    fail fast with a 503 instead of tying up a worker thread.
+    """
+    global _hashing_slots
+    with _hashing_slots_lock:
+        if _hashing_slots is None:
+            _hashing_slots = threading.BoundedSemaphore(settings.PASSWORD_HASHING_CONCURRENCY)
+
+    if not _hashing_slots.acquire(timeout=settings.PASSWORD_HASHING_QUEUE_TIMEOUT):
+        raise PasswordHashingBusy()
+    try:
+        yield
+    finally:
+        _hashing_slots.release()
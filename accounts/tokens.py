@@ -0,0 +1,24 @@
+# accounts/tokens.py
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .revocation import revoked_tokens
+
+
+class FilteredRefreshToken(RefreshToken):
+    """Refresh token whose blacklist check goes through the in-process revocation filter."""
+
+    def check_blacklist(self):
+        # Only tokens the filter cannot rule out cost a database query
+        if revoked_tokens.might_be_revoked(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        blacklisted, created = super().blacklist()
+        revoked_tokens.add(self.payload[api_settings.JTI_CLAIM])
+        if not created:
+            # Another request revoked (or rotated) this token first
+            raise TokenError(_("Token is blacklisted"))
+        return blacklisted, created
@@ -5,6 +5,7 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     CustomTokenObtainPairView, 
     RegisterView, 
+    LogoutView,
     UserDetailView,
     ListUsersView,
     DeleteUserView,
@@ -15,6 +16,7 @@ from .views import (
 urlpatterns = [
     path('login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('login/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('register/', RegisterView.as_view(), name='register'),
     path('profile/', UserDetailView.as_view(), name='user_detail'),
     
@@ -1,11 +1,18 @@
 # views.py - Fixed version with proper profile update handling
 
 from rest_framework import generics, status, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from ppg_backend.filters import parse_datetime_param, parse_decimal_param
+from ppg_backend.pagination import KeysetPaginator
+from ppg_backend.fieldsets import SparseFieldsetViewMixin
 from .serializers import RegisterSerializer, UserSerializer, CustomTokenObtainPairSerializer
+from .tokens import FilteredRefreshToken
+from .throttling import LoginAccountThrottle, LoginIPThrottle, RegisterIPThrottle, password_hashing_slot
 
 
 User = get_user_model()
@@ -18,16 +25,24 @@ class IsAdminUser(permissions.BasePermission):
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [LoginIPThrottle, LoginAccountThrottle]
+
+    def post(self, request, *args, **kwargs):
+        # Checking the password is the expensive part of a login
+        with password_hashing_slot():
+            return super().post(request, *args, **kwargs)
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [RegisterIPThrottle]
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
+        with password_hashing_slot():
+            user = serializer.save()
         
         refresh = RefreshToken.for_user(user)
         
@@ -38,6 +53,17 @@ class RegisterView(generics.CreateAPIView):
             "message": "User account created successfully"
         }, status=status.HTTP_201_CREATED)
 
+class LogoutView(generics.GenericAPIView):
+    """Revoke a refresh token so it can no longer be used"""
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            FilteredRefreshToken(request.data.get('refresh')).blacklist()
+        except TokenError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "Logged out successfully"}, status=status.HTTP_200_OK)
+
 class UserDetailView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -63,19 +89,63 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
 
 # New views for admin functionality
 
-class ListUsersView(generics.ListAPIView):
-    """View to list all users - admin only"""
+class ListUsersView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """View to list users - admin only
+
+    Query params: search (prefix of email, first or last name), role,
+    is_active, joined_after, joined_before, min_orders, max_orders,
+    min_spend, max_spend, ordering, and limit/cursor for keyset pagination.
+    Order count and lifetime spend are stored on the user, so sorting and
+    filtering on them never aggregates orders.
+    """
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAdminUser]
+    ordering_fields = ('id', 'email', 'first_name', 'last_name', 'date_joined', 'order_count', 'lifetime_spend')
     
+    def get_queryset(self):
+        search = self.request.query_params.get('search', '').strip()
+        if search:
+            return User.objects.search(search)
+        return super().get_queryset()
+
+    def filter_queryset(self, queryset):
+        params = self.request.query_params
+        if params.get('role'):
+            queryset = queryset.filter(role=params['role'])
+        if params.get('is_active') in ('true', 'false'):
+            queryset = queryset.filter(is_active=params['is_active'] == 'true')
+        for param, lookup in (('joined_after', 'date_joined__gte'), ('joined_before', 'date_joined__lt')):
+            if params.get(param):
+                queryset = queryset.filter(**{lookup: parse_datetime_param(param, params[param])})
+        for param, lookup in (
+            ('min_orders', 'order_count__gte'), ('max_orders', 'order_count__lte'),
+            ('min_spend', 'lifetime_spend__gte'), ('max_spend', 'lifetime_spend__lte'),
+        ):
+            if params.get(param):
+                queryset = queryset.filter(**{lookup: parse_decimal_param(param, params[param])})
+        return super().filter_queryset(queryset)
+
+    def get_ordering(self):
+        ordering = self.request.query_params.get('ordering', 'id')
+        if ordering.lstrip('-') not in self.ordering_fields:
+            raise ValidationError({"ordering": f"Choose one of {', '.join(self.ordering_fields)}"})
+        return ordering
+
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response({
-            "users": serializer.data,
-            "count": queryset.count()
-        })
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = self.get_ordering()
+        response = {"count": queryset.count()}
+
+        if 'limit' in request.query_params or 'cursor' in request.query_params:
+            users, response["next_cursor"] = KeysetPaginator(ordering).paginate(
+                queryset, request.query_params.get('limit', 50), request.query_params.get('cursor')
+            )
+        else:
+            users = queryset.order_by(ordering, 'pk' if not ordering.startswith('-') else '-pk')
+
+        serializer = self.get_serializer(users, many=True)
+        return Response({"users": serializer.data, **response})
 
 class DeleteUserView(generics.DestroyAPIView):
     """View to delete a user by ID - admin only"""
@@ -93,7 +163,7 @@ class DeleteUserView(generics.DestroyAPIView):
         return Response({"message": f"User {instance.email} deleted successfully"}, 
                         status=status.HTTP_200_OK)
 
-class UpdateUserView(generics.RetrieveUpdateAPIView):
+class UpdateUserView(SparseFieldsetViewMixin, generics.RetrieveUpdateAPIView):
     """View to update a user - admin only"""
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -0,0 +1,44 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from cart.models import Cart
+
+
+class Command(BaseCommand):
+    help = "Delete carts that have not been touched for a number of days, a small batch at a time"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Idle days before a cart is purged (default 30)")
+        parser.add_argument('--batch-size', type=int, default=500, help="Carts deleted per transaction (default 500)")
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help="Seconds to sleep between batches so other writers can take the lock (default 0.05)",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only count the carts that would be deleted")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Editing an item does not save the cart, so its items' timestamps count as activity too
+        stale = Cart.objects.filter(updated_at__lt=cutoff).exclude(items__updated_at__gte=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Would delete {stale.count()} cart(s) idle since {cutoff:%Y-%m-%d}"))
+            return
+
+        deleted = 0
+        while True:
+            # Each batch is its own short transaction so the write lock is released in between
+            with transaction.atomic():
+                cart_ids = list(stale.order_by('id').values_list('id', flat=True)[:options['batch_size']])
+                if not cart_ids:
+                    break
+                Cart.objects.filter(id__in=cart_ids).delete()
+            deleted += len(cart_ids)
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} cart(s) idle since {cutoff:%Y-%m-%d}"))
@@ -15,6 +15,11 @@ class Cart(models.Model):
     def __str__(self):
         return f"Cart of {self.user.email}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='cart_updated_at_idx'),
+        ]
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -1,8 +1,10 @@
 from rest_framework import serializers
 from .models import Cart, CartItem
+from ppg_backend.fieldsets import SparseFieldsetMixin
+from ppg_backend.serializer_cache import PrimingListSerializer
 from products.serializers import ProductSerializer
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
     subtotal = serializers.SerializerMethodField()
@@ -11,11 +13,12 @@ class CartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = ('id', 'cart', 'product', 'product_id', 'quantity', 'subtotal')
         read_only_fields = ('cart',)
+        list_serializer_class = PrimingListSerializer
     
     def get_subtotal(self, obj):
         return obj.get_subtotal()
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total = serializers.SerializerMethodField()
     
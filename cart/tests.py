@@ -1,3 +1,86 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from products.models import Category, Product
+from .models import Cart, CartItem
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CartViewTests(TestCase):
+    def setUp(self):
+        self.customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        category = Category.objects.create(name='Footwear')
+        self.product = Product.objects.create(
+            category=category, name='Shoe', description="Test product", price=Decimal('10.00')
+        )
+
+    def test_reading_without_a_cart_writes_nothing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'id': None, 'items': [], 'total': 0, 'created_at': None, 'updated_at': None})
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse([query for query in queries if not query['sql'].startswith('SELECT')])
+
+    def test_cart_row_is_created_on_the_first_add(self):
+        response = self.client.post('/api/cart/add/', {'product_id': self.product.pk, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.data['id'], Cart.objects.get(user=self.customer).pk)
+        self.assertEqual([item['quantity'] for item in response.data['items']], [2])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class PurgeStaleCartsTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Footwear')
+        self.product = Product.objects.create(
+            category=category, name='Shoe', description="Test product", price=Decimal('10.00')
+        )
+        self.old = timezone.now() - timedelta(days=40)
+
+    def make_cart(self, index, idle=True, item_idle=True):
+        user = CustomUser.objects.create_user(f'cust{index}@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        cart = Cart.objects.create(user=user)
+        item = CartItem.objects.create(cart=cart, product=self.product)
+        if idle:
+            Cart.objects.filter(pk=cart.pk).update(updated_at=self.old)
+        if item_idle:
+            CartItem.objects.filter(pk=item.pk).update(updated_at=self.old)
+        return cart
+
+    def purge(self, *args):
+        stdout = io.StringIO()
+        call_command('purge_stale_carts', '--pause', '0', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_deletes_idle_carts_in_batches(self):
+        stale = [self.make_cart(index) for index in range(3)]
+        fresh = self.make_cart(3, idle=False, item_idle=False)
+        # The cart row is old but one of its items was just edited
+        edited = self.make_cart(4, item_idle=False)
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.purge('--batch-size', '2')
+        self.assertIn("Deleted 3 cart(s)", output)
+        self.assertEqual(set(Cart.objects.values_list('pk', flat=True)), {fresh.pk, edited.pk})
+        self.assertFalse(CartItem.objects.filter(cart__in=stale).exists())
+        cart_deletes = [query for query in queries if query['sql'].startswith('DELETE FROM "cart_cart"')]
+        self.assertEqual(len(cart_deletes), 2)
+
+    def test_dry_run_only_counts(self):
+        self.make_cart(0)
+        self.make_cart(1, idle=False, item_idle=False)
+        self.assertIn("Would delete 1 cart(s)", self.purge('--dry-run'))
+        self.assertEqual(Cart.objects.count(), 2)
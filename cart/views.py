@@ -1,20 +1,35 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from ppg_backend.idempotency import idempotent
 from .models import Cart, CartItem
 from .serializers import CartSerializer, CartItemSerializer
 
 class CartView(generics.RetrieveAPIView):
     serializer_class = CartSerializer
     permission_classes = [permissions.IsAuthenticated]
-    
+
+    # What a user without a cart row sees; the row is only created on the first add
+    EMPTY_CART = {'id': None, 'items': [], 'total': 0, 'created_at': None, 'updated_at': None}
+
+    query_budget = 5
+
     def get_object(self):
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
-        return cart
+        return (
+            Cart.objects.filter(user=self.request.user).order_by('id')
+            .prefetch_related('items__product__category').first()
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        cart = self.get_object()
+        if cart is None:
+            return Response({name: self.EMPTY_CART[name] for name in self.get_serializer().fields})
+        return Response(self.get_serializer(cart).data)
 
 class AddToCartView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @idempotent
     def post(self, request):
         product_id = request.data.get('product_id')
         quantity = int(request.data.get('quantity', 1))
@@ -42,6 +57,7 @@ class AddToCartView(APIView):
 class UpdateCartItemView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @idempotent
     def put(self, request, item_id):
         try:
             cart_item = CartItem.objects.get(id=item_id, cart__user=request.user)
@@ -62,6 +78,7 @@ class UpdateCartItemView(APIView):
 class RemoveFromCartView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @idempotent
     def delete(self, request, item_id):
         try:
             cart_item = CartItem.objects.get(id=item_id, cart__user=request.user)
@@ -0,0 +1,74 @@
+# orders/archive.py
+"""
+Moving old finished orders out of the hot Order/OrderItem tables.
+
+``archive_batch`` copies a batch of DELIVERED or CANCELLED orders into
+ArchivedOrder, with an ArchivedOrderImage row per item image so media
+cleanup still counts them, and deletes the originals in the same
+transaction. The order
+history views fall back to the archive, so customers still see everything.
+"""
+import json
+
+from django.db import transaction
+from rest_framework import permissions
+from rest_framework.utils.encoders import JSONEncoder
+
+from ppg_backend.fieldsets import apply_fieldset, parse_fieldset
+from .models import ArchivedOrder, ArchivedOrderImage, Order
+from .serializers import OrderSerializer
+
+# Orders in these statuses can no longer change, so they are safe to freeze
+ARCHIVABLE_STATUSES = ('DELIVERED', 'CANCELLED')
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(order_status__in=ARCHIVABLE_STATUSES, updated_at__lt=cutoff)
+
+
+def archive_order(order):
+    archived = ArchivedOrder(
+        id=order.id, user_id=order.user_id, total=order.total, order_status=order.order_status,
+        item_count=order.item_count, thumbnail=order.thumbnail.name, created_at=order.created_at,
+        updated_at=order.updated_at,
+    )
+    # Round-trip through JSON so Decimals and datetimes are stored exactly as the API renders them
+    representation = json.loads(json.dumps(OrderSerializer(order).data, cls=JSONEncoder))
+    archived.set_representation(representation)
+    return archived
+
+
+def archive_batch(cutoff, batch_size):
+    """Archive up to ``batch_size`` orders last changed before ``cutoff``; return how many moved."""
+    with transaction.atomic():
+        orders = list(
+            archivable_orders(cutoff).select_for_update().order_by('id')
+            .prefetch_related('items')[:batch_size]
+        )
+        if not orders:
+            return 0
+        ArchivedOrder.objects.bulk_create([archive_order(order) for order in orders])
+        # The items' images are only referenced from the archived JSON from now on
+        ArchivedOrderImage.objects.bulk_create([
+            ArchivedOrderImage(archived_order_id=order.id, image=image)
+            for order in orders
+            for image in sorted({item.product_image.name for item in order.items.all() if item.product_image})
+        ])
+        Order.objects.filter(id__in=[order.id for order in orders]).delete()
+    return len(orders)
+
+
+def render_archived(archived, request):
+    """The stored representation of ``archived``, shaped like a live OrderSerializer response."""
+    data = archived.get_representation()
+    for item in data.get('items', []):
+        product = item.get('product') or {}
+        if product.get('image'):
+            product['image'] = request.build_absolute_uri(product['image'])
+    if request.method not in permissions.SAFE_METHODS:
+        return data
+    return apply_fieldset(
+        data,
+        parse_fieldset(request.query_params.get('fields')),
+        parse_fieldset(request.query_params.get('exclude')),
+    )
@@ -0,0 +1,104 @@
+# orders/events.py
+"""
+In-process change feed for order status updates.
+
+One poller task per process reads the orders changed since its last pass,
+limited to users that currently have an event stream open, and fans the
+changes out to every subscriber queue for that user. With nobody subscribed
+the poller stops, so idle workers never touch the database.
+
+``updated_at`` is stamped before a transaction commits, so a slow
+transaction can become visible after later changes were already read.
+Each pass therefore re-reads ORDER_EVENTS_LOOKBACK seconds behind the
+newest change it has seen and skips the (id, updated_at) pairs it already
+sent; only a transaction that commits more than that long after stamping
+its rows is missed.
+"""
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Order
+
+
+class OrderStatusFeed:
+    def __init__(self):
+        self.subscribers = {}  # user id -> set of asyncio.Queue
+        self.task = None
+        self.watermark = None
+        self.floor = None  # Nothing from before the poller started is sent
+        self.sent = set()  # (id, updated_at) pairs inside the lookback window
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=settings.ORDER_EVENTS_QUEUE_SIZE)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        self.ensure_running()
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    def ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self.run())
+
+    async def run(self):
+        if self.watermark is None:
+            self.watermark = self.floor = await sync_to_async(self.latest_change)()
+        while self.subscribers:
+            await asyncio.sleep(settings.ORDER_EVENTS_POLL_INTERVAL)
+            try:
+                changes = await sync_to_async(self.fetch_changes)(list(self.subscribers))
+            except Exception as feed_error:
+                print(f"Order event feed error: {feed_error}")
+                continue
+            for change in changes:
+                self.publish(change)
+        # Start from "now" again when the next client connects
+        self.watermark = self.floor = None
+        self.sent = set()
+
+    def latest_change(self):
+        return Order.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+
+    def fetch_changes(self, user_ids):
+        queryset = Order.objects.filter(user_id__in=user_ids).order_by('updated_at', 'id')
+        if self.watermark is not None:
+            since = self.watermark - timedelta(seconds=settings.ORDER_EVENTS_LOOKBACK)
+            if self.floor is not None:
+                since = max(since, self.floor)
+            queryset = queryset.filter(updated_at__gte=since)
+            self.sent = {sent for sent in self.sent if sent[1] >= since}
+        changes = []
+        for change in queryset.values('id', 'user_id', 'order_status', 'updated_at'):
+            key = (change['id'], change['updated_at'])
+            if key in self.sent or (self.floor is not None and change['updated_at'] <= self.floor):
+                continue
+            self.sent.add(key)
+            if self.watermark is None or change['updated_at'] > self.watermark:
+                self.watermark = change['updated_at']
+            changes.append(change)
+        return changes
+
+    def publish(self, change):
+        event = {
+            'id': change['id'],
+            'order_status': change['order_status'],
+            'updated_at': change['updated_at'].isoformat(),
+        }
+        for queue in list(self.subscribers.get(change['user_id'], ())):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A client this far behind reconnects and refetches its orders
+                pass
+
+
+order_status_feed = OrderStatusFeed()
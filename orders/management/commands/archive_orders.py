@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.archive import archivable_orders, archive_batch
+
+
+class Command(BaseCommand):
+    help = "Move delivered and cancelled orders older than the archive age into ArchivedOrder, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help=f"Archive orders unchanged for this many days (default {settings.ORDER_ARCHIVE_AFTER_DAYS})",
+        )
+        parser.add_argument('--batch-size', type=int, default=200, help="Orders moved per transaction (default 200)")
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help="Seconds to sleep between batches so other writers can take the lock (default 0.05)",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Only count the orders that would be archived")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        if options['dry_run']:
+            count = archivable_orders(cutoff).count()
+            self.stdout.write(self.style.SUCCESS(f"Would archive {count} order(s) unchanged since {cutoff:%Y-%m-%d}"))
+            return
+
+        archived = 0
+        while True:
+            moved = archive_batch(cutoff, options['batch_size'])
+            if not moved:
+                break
+            archived += moved
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} order(s) unchanged since {cutoff:%Y-%m-%d}"))
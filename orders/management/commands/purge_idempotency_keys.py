@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Keys deleted per query (default 1000)")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                # Claims of requests that are still running are locked and skipped
+                key_ids = list(
+                    IdempotencyKey.objects.select_for_update(skip_locked=True)
+                    .filter(expires_at__lte=now).values_list('id', flat=True)[:options['batch_size']]
+                )
+                if not key_ids:
+                    break
+                IdempotencyKey.objects.filter(id__in=key_ids).delete()
+            deleted += len(key_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency key(s)"))
@@ -0,0 +1,108 @@
+from collections import Counter
+from itertools import permutations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from orders.models import ArchivedOrder, OrderItem
+from products.models import CoPurchase, Product
+
+
+class Command(BaseCommand):
+    help = "Rebuild the frequently-bought-together table from all live and archived orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Archived orders read per query (default 1000)")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows written per INSERT (default 1000)")
+        parser.add_argument(
+            '--products-per-batch', type=int, default=200,
+            help="Products whose pairs are rebuilt per transaction (default 200)",
+        )
+
+    def handle(self, *args, **options):
+        # Rebuild a few products at a time so only their rows are locked, and
+        # only while their counts are replaced; checkouts keep recording
+        # orders for every other product in the meantime.
+        pairs = last_id = 0
+        while True:
+            product_ids = list(
+                Product.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:options['products_per_batch']]
+            )
+            if not product_ids:
+                break
+            last_id = product_ids[-1]
+            pairs += self.rebuild(product_ids, options)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {pairs} co-purchase pair(s)"))
+
+    def rebuild(self, product_ids, options):
+        archived_counts = self.known_products(self.count_archived(set(product_ids), options['chunk_size']))
+
+        with transaction.atomic():
+            # Make sure every pair already known has a row, then lock the
+            # batch's rows before counting. A checkout that commits after the
+            # count has to wait for these locks in record_order, so its +1
+            # lands on top of the rebuilt value instead of being overwritten.
+            CoPurchase.objects.bulk_create(
+                [CoPurchase(product_id=a, related_id=b) for a, b in archived_counts],
+                batch_size=options['batch_size'], ignore_conflicts=True,
+            )
+            rows = self.lock_rows(product_ids)
+
+            counts = archived_counts + self.count_live(product_ids)
+
+            missing = [pair for pair in counts if pair not in rows]
+            CoPurchase.objects.bulk_create(
+                [CoPurchase(product_id=a, related_id=b) for a, b in missing],
+                batch_size=options['batch_size'], ignore_conflicts=True,
+            )
+            if missing:
+                rows = self.lock_rows(product_ids)
+
+            stale = [row.pk for pair, row in rows.items() if not counts[pair]]
+            CoPurchase.objects.filter(pk__in=stale).delete()
+            changed = []
+            for pair, row in rows.items():
+                if counts[pair] and row.count != counts[pair]:
+                    row.count = counts[pair]
+                    changed.append(row)
+            CoPurchase.objects.bulk_update(changed, ['count'], batch_size=options['batch_size'])
+        return len(counts)
+
+    def lock_rows(self, product_ids):
+        rows = (
+            CoPurchase.objects.select_for_update().filter(product_id__in=product_ids)
+            .only('id', 'product', 'related', 'count')
+        )
+        return {(row.product_id, row.related_id): row for row in rows}
+
+    def known_products(self, counts):
+        # Archived items can name products that have since been deleted
+        existing = set(Product.objects.filter(id__in={b for _, b in counts}).values_list('id', flat=True))
+        return Counter({(a, b): count for (a, b), count in counts.items() if b in existing})
+
+    def count_live(self, product_ids):
+        """Number of live orders containing each (batch product, other product) pair."""
+        counts = Counter()
+        rows = (
+            OrderItem.objects.filter(product_id__in=product_ids)
+            .values_list('product_id', 'order__items__product_id')
+            .annotate(orders=Count('order_id', distinct=True))
+        )
+        for product_id, related_id, orders in rows:
+            if related_id is not None and related_id != product_id:
+                counts[product_id, related_id] += orders
+        return counts
+
+    def count_archived(self, product_ids, chunk_size):
+        # Archived orders keep their items only inside the compressed representation
+        counts = Counter()
+        for archived in ArchivedOrder.objects.only('id', 'data').iterator(chunk_size=chunk_size):
+            ordered = {
+                item['product']['id'] for item in archived.get_representation().get('items', [])
+                if (item.get('product') or {}).get('id')
+            }
+            counts.update(pair for pair in permutations(sorted(ordered), 2) if pair[0] in product_ids)
+        return counts
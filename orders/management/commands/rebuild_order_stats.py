@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.stats import totals_for
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's order_count and lifetime_spend from live and archived orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Users updated per transaction (default 500)")
+
+    def handle(self, *args, **options):
+        changed = last_id = 0
+        while True:
+            with transaction.atomic():
+                # Locking the users holds back checkouts for them until their totals are written
+                users = list(
+                    User.objects.select_for_update().filter(pk__gt=last_id).order_by('pk')
+                    .only('id', 'order_count', 'lifetime_spend')[:options['batch_size']]
+                )
+                if not users:
+                    break
+                totals = totals_for([user.pk for user in users])
+                stale = []
+                for user in users:
+                    order_count, lifetime_spend = totals.get(user.pk, (0, 0))
+                    if (user.order_count, user.lifetime_spend) != (order_count, lifetime_spend):
+                        user.order_count, user.lifetime_spend = order_count, lifetime_spend
+                        stale.append(user)
+                User.objects.bulk_update(stale, ['order_count', 'lifetime_spend'])
+            changed += len(stale)
+            last_id = users[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f"Corrected order stats for {changed} user(s)"))
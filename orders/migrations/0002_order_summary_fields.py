@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+def backfill_order_summaries(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    for order in Order.objects.only('id').iterator(chunk_size=500):
+        items = list(
+            OrderItem.objects.filter(order_id=order.id)
+            .select_related('product')
+            .order_by('id')
+        )
+        Order.objects.filter(pk=order.id).update(
+            item_count=sum(item.quantity for item in items),
+            thumbnail=next((item.product.image.name for item in items if item.product.image), None),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('products', '0002_category_updated_at_alter_category_image_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='thumbnail',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to='products/'),
+        ),
+        migrations.RunPython(backfill_order_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def backfill_snapshots(apps, schema_editor):
+    # One short transaction per chunk of items, walking the primary key
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            items = list(
+                OrderItem.objects.filter(pk__gt=last_id, product__isnull=False).select_related('product__category')
+                .order_by('pk')[:BACKFILL_CHUNK_SIZE]
+            )
+            if not items:
+                break
+            for item in items:
+                item.product_name = item.product.name
+                item.product_image = item.product.image.name or None
+                item.category_name = item.product.category.name
+            OrderItem.objects.bulk_update(items, ['product_name', 'product_image', 'category_name'])
+        last_id = items[-1].pk
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('orders', '0006_admin_order_filter_indexes'),
+        ('products', '0006_recently_viewed_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='category_name',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_image',
+            field=models.ImageField(blank=True, max_length=255, null=True, upload_to='products/'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='product_name',
+            field=models.CharField(default='', max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='orderitem',
+            name='product',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='products.product'),
+        ),
+        migrations.RunPython(backfill_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:30
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def archived_image_names(data):
+    """Storage names of the item images in an archived order's stored JSON."""
+    names = set()
+    for item in json.loads(zlib.decompress(data)).get('items', []):
+        url = (item.get('product') or {}).get('image')
+        if url and url.startswith(settings.MEDIA_URL):
+            names.add(url[len(settings.MEDIA_URL):])
+    return sorted(names)
+
+
+def backfill_images(apps, schema_editor):
+    ArchivedOrder = apps.get_model('orders', 'ArchivedOrder')
+    ArchivedOrderImage = apps.get_model('orders', 'ArchivedOrderImage')
+    rows = ArchivedOrder.objects.order_by('id').values_list('id', 'data')
+    batch = []
+    for archived_id, data in rows.iterator(chunk_size=500):
+        batch.extend(ArchivedOrderImage(archived_order_id=archived_id, image=name)
+                     for name in archived_image_names(bytes(data)))
+        if len(batch) >= 1000:
+            ArchivedOrderImage.objects.bulk_create(batch)
+            batch = []
+    ArchivedOrderImage.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_item_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrderImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(max_length=255, upload_to='products/')),
+                ('archived_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='orders.archivedorder')),
+            ],
+        ),
+        migrations.RunPython(backfill_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+import json
+import zlib
+
+from django.db import migrations
+
+# Order items render their product from the checkout snapshot since 0007
+PRODUCT_FIELDS = ('id', 'name', 'image', 'category_name')
+
+
+def snapshot_shape(data):
+    """Rewrite archived items' full product representations to the snapshot fields; None if unchanged."""
+    representation = json.loads(zlib.decompress(data))
+    changed = False
+    for item in representation.get('items', []):
+        product = item.get('product') or {}
+        if set(product) != set(PRODUCT_FIELDS):
+            item['product'] = {name: product.get(name) for name in PRODUCT_FIELDS}
+            changed = True
+    if not changed:
+        return None
+    return zlib.compress(json.dumps(representation, separators=(',', ':')).encode('utf-8'), 9)
+
+
+def backfill_product_shape(apps, schema_editor):
+    ArchivedOrder = apps.get_model('orders', 'ArchivedOrder')
+    last_id = 0
+    while True:
+        # Read a chunk at a time by key, so no cursor is open while rows are rewritten
+        rows = list(ArchivedOrder.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'data')[:500])
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        batch = []
+        for archived_id, data in rows:
+            rewritten = snapshot_shape(bytes(data))
+            if rewritten is not None:
+                batch.append(ArchivedOrder(id=archived_id, data=rewritten))
+        ArchivedOrder.objects.bulk_update(batch, ['data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_archived_order_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_product_shape, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,36 @@
+import json
+import zlib
+
+from rest_framework.utils.encoders import JSONEncoder
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.utils import timezone
 from django.conf import settings
 
 from products.models import Product
 
 # orders/models.py
+class OrderQuerySet(models.QuerySet):
+    def matching(self, status=None, created_after=None, created_before=None, city=None, state=None,
+                 email=None, min_total=None, max_total=None, payment_method=None):
+        """Orders matching every filter given; text filters ignore case.
+
+        City, state and email compare lower(column) so the expression
+        indexes in Order.Meta answer them.
+        """
+        queryset = self
+        for alias, field, value in (('city_lower', 'city', city), ('state_lower', 'state', state),
+                                    ('email_lower', 'email', email)):
+            if value:
+                queryset = queryset.alias(**{alias: Lower(field)}).filter(**{alias: value.strip().lower()})
+        lookups = {
+            'order_status': status, 'payment_method': payment_method,
+            'created_at__gte': created_after, 'created_at__lt': created_before,
+            'total__gte': min_total, 'total__lte': max_total,
+        }
+        return queryset.filter(**{lookup: value for lookup, value in lookups.items() if value is not None})
+
 class Order(models.Model):
     STATUS_CHOICES = (
         ('PENDING', 'Pending'),
@@ -13,6 +39,15 @@ class Order(models.Model):
         ('DELIVERED', 'Delivered'),
         ('CANCELLED', 'Cancelled'),
     )
+
+    # Statuses an order may move to from each current status
+    STATUS_TRANSITIONS = {
+        'PENDING': ('PROCESSING', 'SHIPPED', 'CANCELLED'),
+        'PROCESSING': ('SHIPPED', 'CANCELLED'),
+        'SHIPPED': ('DELIVERED',),
+        'DELIVERED': (),
+        'CANCELLED': (),
+    }
     
     PAYMENT_CHOICES = (
         ('COD', 'Cash On Delivery'),
@@ -29,17 +64,123 @@ class Order(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_CHOICES, default='COD')
     order_status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    # Summary fields filled in at checkout so order history lists never touch OrderItem
+    item_count = models.PositiveIntegerField(default=0)
+    thumbnail = models.ImageField(upload_to='products/', max_length=255, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Admin order list filters; each also serves the newest-first ordering
+            models.Index(fields=['created_at'], name='order_created_at_idx'),
+            models.Index(fields=['order_status', 'created_at'], name='order_status_created_idx'),
+            models.Index(Lower('email'), F('created_at'), name='order_email_lower_idx'),
+            models.Index(Lower('state'), Lower('city'), F('created_at'), name='order_state_city_idx'),
+            models.Index(Lower('city'), F('created_at'), name='order_city_lower_idx'),
+            models.Index(fields=['total'], name='order_total_idx'),
+            models.Index(fields=['payment_method', 'created_at'], name='order_payment_created_idx'),
+            # Finds finished orders old enough to move to ArchivedOrder
+            models.Index(fields=['order_status', 'updated_at'], name='order_status_updated_idx'),
+            # Read by the order status event feed on every poll
+            models.Index(fields=['updated_at'], name='order_updated_at_idx'),
+        ]
     
     def __str__(self):
         return f"Order {self.id} - {self.user.email}"
 
+    @classmethod
+    def statuses_allowed_into(cls, target_status):
+        """Return the statuses from which an order may move to ``target_status``."""
+        return [source for source, targets in cls.STATUS_TRANSITIONS.items() if target_status in targets]
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # Cleared if the product is deleted; the snapshot below keeps the order readable
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(default=1)
+    # The product as it was at checkout, so order reads never join products or categories
+    product_name = models.CharField(max_length=200, default='')
+    product_image = models.ImageField(upload_to='products/', max_length=255, null=True, blank=True)
+    category_name = models.CharField(max_length=100, default='')
     
     def __str__(self):
-        return f"{self.quantity} x {self.product.name} in Order {self.order.id}"
\ No newline at end of file
+        return f"{self.quantity} x {self.product_name} in Order {self.order_id}"
+
+
+class ArchivedOrder(models.Model):
+    """An old finished order moved out of Order/OrderItem.
+
+    The summary columns are kept for order history lists; the full rendered
+    order, items included, is stored once as zlib-compressed JSON.
+    """
+    id = models.BigIntegerField(primary_key=True)  # Same id the order had while live
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_orders')
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    order_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    item_count = models.PositiveIntegerField(default=0)
+    thumbnail = models.ImageField(upload_to='products/', max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.BinaryField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archived_order_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id}"
+
+    def set_representation(self, representation):
+        self.data = zlib.compress(json.dumps(representation, separators=(',', ':')).encode('utf-8'), 9)
+
+    def get_representation(self):
+        return json.loads(zlib.decompress(self.data))
+
+    def as_order(self):
+        """An unsaved Order carrying the summary columns, for OrderSummarySerializer."""
+        return Order(
+            id=self.id, user_id=self.user_id, total=self.total, order_status=self.order_status,
+            item_count=self.item_count, thumbnail=self.thumbnail.name, created_at=self.created_at,
+            updated_at=self.updated_at,
+        )
+
+
+class ArchivedOrderImage(models.Model):
+    """A product image an archived order's items show.
+
+    The archived items live only in ``ArchivedOrder.data``; these rows keep
+    their images referenced so media cleanup never deletes them.
+    """
+    archived_order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='images')
+    image = models.ImageField(upload_to='products/', max_length=255)
+
+    def __str__(self):
+        return f"{self.image.name} for archived order {self.archived_order_id}"
+
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a request sent with an ``Idempotency-Key`` header.
+
+    ``status_code`` stays empty while the first request is still running.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"Idempotency key {self.key} for user {self.user_id}"
@@ -0,0 +1,40 @@
+# orders/notifications.py
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+
+
+def build_status_update_email(order):
+    subject = f"Order Status Update - Order #{order.id}"
+    message = f"""
+        Dear {order.full_name},
+
+        Your order #{order.id} status has been updated to: {order.get_order_status_display()}
+
+        Thank you for shopping with us!
+        """
+    return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [order.email])
+
+
+def queue_status_update_emails(orders):
+    """Send status update emails for ``orders`` in one batch after the transaction commits.
+
+    The messages are built immediately, then delivered over a single SMTP
+    connection on a background thread so the request never waits on the mail server.
+    """
+    messages = [build_status_update_email(order) for order in orders]
+    if messages:
+        transaction.on_commit(lambda: _dispatch(messages))
+
+
+def _dispatch(messages):
+    threading.Thread(target=_send_batch, args=(messages,), daemon=True).start()
+
+
+def _send_batch(messages):
+    try:
+        get_connection(fail_silently=False).send_messages(messages)
+    except Exception as email_error:
+        print(f"Email error: {email_error}")
@@ -1,16 +1,23 @@
 # orders/serializers.py
 from rest_framework import serializers
 from .models import Order, OrderItem
-from products.serializers import ProductSerializer
+from ppg_backend.fieldsets import SparseFieldsetMixin
 
-class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+class OrderedProductSerializer(SparseFieldsetMixin, serializers.Serializer):
+    """The product as it was at checkout, read from the snapshot columns on OrderItem"""
+    id = serializers.IntegerField(source='product_id', read_only=True)
+    name = serializers.CharField(source='product_name', read_only=True)
+    image = serializers.ImageField(source='product_image', read_only=True)
+    category_name = serializers.CharField(read_only=True)
+
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    product = OrderedProductSerializer(source='*', read_only=True)
     
     class Meta:
         model = OrderItem
         fields = ('id', 'product', 'price', 'quantity')
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     
     class Meta:
@@ -18,4 +25,12 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ('id', 'full_name', 'email', 'phone_number', 'address', 'city', 
                  'state', 'zip_code', 'total', 'payment_method', 'order_status', 
                  'created_at', 'items')
-        read_only_fields = ('order_status',)
\ No newline at end of file
+        read_only_fields = ('order_status',)
+
+class OrderSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Order history row built only from columns stored on Order"""
+
+    class Meta:
+        model = Order
+        fields = ('id', 'total', 'order_status', 'created_at', 'item_count', 'thumbnail')
+        read_only_fields = fields
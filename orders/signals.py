@@ -0,0 +1,12 @@
+# orders/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from . import stats
+
+
+@receiver(pre_delete, sender=get_user_model())
+def uncount_deleted_users_orders(sender, instance, **kwargs):
+    # Orders cascade with the user and never pass through the order views
+    stats.user_deleted(instance.pk)
@@ -0,0 +1,99 @@
+# orders/stats.py
+"""
+Order statistics kept up to date as orders change.
+
+The user's ``order_count`` and ``lifetime_spend`` cover every order that was not
+cancelled, including archived ones, so archiving leaves them alone. They
+move with F() expressions in the same transaction as the order change,
+which keeps concurrent checkouts from losing each other's update.
+``manage.py rebuild_order_stats`` recomputes them from the orders.
+
+The same hooks move the dashboard counters in ppg_backend.counters.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from ppg_backend import counters
+from .models import ArchivedOrder, Order
+
+User = get_user_model()
+
+UNCOUNTED_STATUSES = ('CANCELLED',)
+
+
+def counts(order_status):
+    return order_status not in UNCOUNTED_STATUSES
+
+
+def adjust(user_id, orders, spend):
+    # Orders made outside these hooks (a shell, a fixture) let the totals drift;
+    # clamping at zero keeps a later cancel or delete from failing the CHECK
+    # constraint, and rebuild_order_stats corrects the drift itself.
+    User.objects.filter(pk=user_id).update(
+        order_count=Greatest(F('order_count') + orders, 0),
+        lifetime_spend=Greatest(F('lifetime_spend') + spend, 0),
+    )
+
+
+def order_created(order):
+    if counts(order.order_status):
+        adjust(order.user_id, 1, order.total)
+    counters.adjust(counters.order_deltas(order.order_status, 1, order.total))
+
+
+def order_deleted(order):
+    if counts(order.order_status):
+        adjust(order.user_id, -1, -order.total)
+    counters.adjust(counters.order_deltas(order.order_status, -1, -order.total))
+
+
+def order_status_changed(order, previous_status):
+    if counts(previous_status) != counts(order.order_status):
+        sign = 1 if counts(order.order_status) else -1
+        adjust(order.user_id, sign, sign * order.total)
+    deltas = counters.order_deltas(previous_status, -1, -order.total)
+    counters.adjust(counters.order_deltas(order.order_status, 1, order.total, deltas))
+
+
+def orders_moved(orders, target_status):
+    """Account for moving ``orders`` to ``target_status``; call before their status is updated."""
+    rows = (
+        orders.exclude(order_status=target_status).order_by()
+        .values('user_id', 'order_status').annotate(orders=Count('id'), spend=Sum('total'))
+    )
+    deltas = {}
+    for row in rows:
+        if counts(row['order_status']) != counts(target_status):
+            sign = 1 if counts(target_status) else -1
+            adjust(row['user_id'], sign * row['orders'], sign * row['spend'])
+        counters.order_deltas(row['order_status'], -row['orders'], -row['spend'], deltas)
+        counters.order_deltas(target_status, row['orders'], row['spend'], deltas)
+    counters.adjust(deltas)
+
+
+def user_deleted(user_id):
+    """Take a deleted user's live and archived orders, which go with them, out of the dashboard counters."""
+    deltas = {}
+    for model in (Order, ArchivedOrder):
+        rows = (
+            model.objects.filter(user_id=user_id).order_by()
+            .values('order_status').annotate(orders=Count('pk'), spend=Sum('total'))
+        )
+        for row in rows:
+            counters.order_deltas(row['order_status'], -row['orders'], -row['spend'], deltas)
+    counters.adjust(deltas)
+
+
+def totals_for(user_ids):
+    """Return ``{user_id: (order_count, lifetime_spend)}`` recomputed from live and archived orders."""
+    totals = {}
+    for model in (Order, ArchivedOrder):
+        rows = (
+            model.objects.filter(user_id__in=user_ids).exclude(order_status__in=UNCOUNTED_STATUSES)
+            .order_by().values('user_id').annotate(orders=Count('pk'), spend=Sum('total'))
+        )
+        for row in rows:
+            orders, spend = totals.get(row['user_id'], (0, 0))
+            totals[row['user_id']] = (orders + row['orders'], spend + row['spend'])
+    return totals
@@ -1,3 +1,462 @@
-from django.test import TestCase
+import importlib
+import io
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.apps import apps
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from cart.models import Cart, CartItem
+from products.models import Category, CoPurchase, Product
+from . import stats
+from .archive import archive_batch
+from .events import OrderStatusFeed
+from .models import ArchivedOrder, IdempotencyKey, Order, OrderItem
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AdminOrderListViewTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(
+            'admin@example.com', 'pw', first_name='Ada', last_name='Admin', role='ADMIN'
+        )
+        customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        now = timezone.now()
+        for email, city, state, total, status, days in [
+            ('alice@example.com', 'Springfield', 'IL', '40.00', 'PENDING', 30),
+            ('bob@example.com', 'Chicago', 'IL', '120.00', 'SHIPPED', 20),
+            ('Alice@Example.com', 'Springfield', 'MO', '75.50', 'PENDING', 10),
+            ('carol@example.com', 'springfield', 'IL', '300.00', 'DELIVERED', 1),
+        ]:
+            order = Order.objects.create(
+                user=customer, full_name="Cu Stomer", email=email, phone_number='5550100', address="1 Main St",
+                city=city, state=state, zip_code='62701', total=Decimal(total), order_status=status,
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(days=days))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def totals(self, params):
+        response = self.client.get('/api/orders/admin/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(response.data['orders']))
+        return [order['total'] for order in response.data['orders']]
+
+    def test_filters_combine(self):
+        self.assertEqual(self.totals({'state': 'il', 'city': 'SPRINGFIELD'}), ['300.00', '40.00'])
+        self.assertEqual(self.totals({'email': 'alice@example.com', 'status': 'PENDING'}), ['75.50', '40.00'])
+        self.assertEqual(self.totals({'min_total': '50', 'max_total': '150'}), ['75.50', '120.00'])
+        self.assertEqual(self.totals({
+            'created_after': (timezone.now() - timedelta(days=25)).date().isoformat(),
+            'payment_method': 'COD',
+            'state': 'IL',
+        }), ['300.00', '120.00'])
+
+    def test_rejects_malformed_values(self):
+        for params in ({'created_after': 'yesterday'}, {'min_total': 'cheap'}):
+            self.assertEqual(self.client.get('/api/orders/admin/', params).status_code, 400)
+
+    def test_common_filter_combinations_are_served_by_indexes(self):
+        since = timezone.now() - timedelta(days=7)
+        for filters, index in [
+            ({}, 'order_created_at_idx'),
+            ({'created_after': since, 'created_before': timezone.now()}, 'order_created_at_idx'),
+            ({'status': 'PENDING'}, 'order_status_created_idx'),
+            ({'status': 'PENDING', 'created_after': since}, 'order_status_created_idx'),
+            ({'email': 'alice@example.com'}, 'order_email_lower_idx'),
+            ({'email': 'alice@example.com', 'status': 'PENDING'}, 'order_email_lower_idx'),
+            ({'state': 'IL', 'city': 'Springfield'}, 'order_state_city_idx'),
+            ({'city': 'Springfield'}, 'order_city_lower_idx'),
+            ({'min_total': Decimal('50'), 'max_total': Decimal('150')}, 'order_total_idx'),
+            ({'payment_method': 'COD'}, 'order_payment_created_idx'),
+        ]:
+            with self.subTest(filters=filters):
+                plan = Order.objects.matching(**filters).order_by('-created_at').explain()
+                self.assertIn(index, plan)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AdminOrderBulkStatusViewTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(
+            'admin@example.com', 'pw', first_name='Ada', last_name='Admin', role='ADMIN'
+        )
+        self.customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        self.orders = {
+            order_status: Order.objects.create(
+                user=self.customer, full_name="Cu Stomer", email='cust@example.com', phone_number='5550100',
+                address="1 Main St", city="Springfield", state="IL", zip_code='62701',
+                total=Decimal('10.00'), order_status=order_status,
+            )
+            for order_status in ('PENDING', 'PROCESSING', 'DELIVERED')
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def post(self, data):
+        return self.client.post('/api/orders/admin/bulk-status/', data, format='json')
+
+    def statuses(self):
+        return dict(Order.objects.values_list('id', 'order_status'))
+
+    def test_moves_only_orders_allowed_into_the_target(self):
+        ids = [order.id for order in self.orders.values()]
+        response = self.post({'ids': ids, 'order_status': 'SHIPPED'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(response.data['skipped'], [self.orders['DELIVERED'].id])
+        self.assertEqual(sorted(self.statuses().values()), ['DELIVERED', 'SHIPPED', 'SHIPPED'])
+
+    def test_filter_selects_orders(self):
+        response = self.post({'filter': {'status': 'PENDING'}, 'order_status': 'CANCELLED'})
+        self.assertEqual(response.data['order_ids'], [self.orders['PENDING'].id])
+        self.assertEqual(self.statuses()[self.orders['PROCESSING'].id], 'PROCESSING')
+
+    def test_unknown_filter_key_is_rejected_without_changes(self):
+        before = self.statuses()
+        response = self.post({'filter': {'stauts': 'PENDING'}, 'order_status': 'CANCELLED'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.statuses(), before)
+
+    def test_empty_filter_is_rejected(self):
+        for data in ({'filter': {}}, {'filter': {'status': ''}}, {'filter': 'PENDING'}, {}):
+            with self.subTest(data=data):
+                response = self.post({**data, 'order_status': 'CANCELLED'})
+                self.assertEqual(response.status_code, 400)
+        self.assertNotIn('CANCELLED', self.statuses().values())
+
+    def test_ids_must_be_a_list(self):
+        pending = self.orders['PENDING'].id
+        for ids in (str(pending), pending, [], ['x']):
+            with self.subTest(ids=ids):
+                response = self.post({'ids': ids, 'order_status': 'CANCELLED'})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.statuses()[pending], 'PENDING')
+
+    def test_malformed_filter_value_is_rejected(self):
+        response = self.post({'filter': {'created_after': 'last week'}, 'order_status': 'CANCELLED'})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderStatsTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+
+    def test_drifted_totals_are_clamped_at_zero(self):
+        # Created straight through the ORM, so the user's totals never counted it
+        order = Order.objects.create(
+            user=self.user, full_name="Cu Stomer", email='cust@example.com', phone_number='5550100',
+            address="1 Main St", city="Springfield", state="IL", zip_code='62701', total=Decimal('25.00'),
+        )
+        stats.order_deleted(order)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.order_count, self.user.lifetime_spend), (0, 0))
+
+
+
+class OrderStatusFeedTests(TestCase):
+    def setUp(self):
+        self.customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        self.start = timezone.now() - timedelta(hours=1)
+        self.orders = [
+            Order.objects.create(
+                user=self.customer, full_name='Cu Stomer', email='cust@example.com', phone_number='555-0100',
+                address='1 Main St', city='Springfield', state='IL', zip_code='62701',
+                total=Decimal('10.00'), order_status='PENDING',
+            )
+            for _ in range(2)
+        ]
+        Order.objects.update(updated_at=self.start)
+        self.feed = OrderStatusFeed()
+        self.feed.watermark = self.feed.floor = self.feed.latest_change()
+
+    def change(self, order, order_status, updated_at):
+        Order.objects.filter(pk=order.pk).update(order_status=order_status, updated_at=updated_at)
+
+    def fetch(self):
+        return [(change['id'], change['order_status']) for change in self.feed.fetch_changes([self.customer.pk])]
+
+    def test_nothing_from_before_the_feed_started_is_sent(self):
+        self.assertEqual(self.fetch(), [])
+
+    def test_late_committing_change_is_still_sent_once(self):
+        now = timezone.now()
+        first, second = self.orders
+        self.change(first, 'SHIPPED', now)
+        self.assertEqual(self.fetch(), [(first.pk, 'SHIPPED')])
+
+        # Stamped before the change above but committed after it was read
+        self.change(second, 'CANCELLED', now - timedelta(seconds=2))
+        self.assertEqual(self.fetch(), [(second.pk, 'CANCELLED')])
+        self.assertEqual(self.fetch(), [])
+
+        self.change(first, 'DELIVERED', now + timedelta(seconds=1))
+        self.assertEqual(self.fetch(), [(first.pk, 'DELIVERED')])
+
+
+CHECKOUT = {
+    'full_name': 'Cu Stomer', 'email': 'cust@example.com', 'phone_number': '555-0100',
+    'address': '1 Main St', 'city': 'Springfield', 'state': 'IL', 'zip_code': '62701',
+}
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], IDEMPOTENCY_WAIT_TIMEOUT=0)
+class IdempotentCheckoutTests(TestCase):
+    def setUp(self):
+        self.customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        category = Category.objects.create(name='Footwear')
+        product = Product.objects.create(
+            category=category, name='Shoe', description="Test product", price=Decimal('10.00')
+        )
+        cart = Cart.objects.create(user=self.customer)
+        CartItem.objects.create(cart=cart, product=product, quantity=2)
+
+    def checkout(self, key, data=CHECKOUT):
+        return self.client.post('/api/orders/create/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.checkout('abc')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(len(mail.outbox), 1)
+
+        retry = self.checkout('abc')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_response_is_stored_with_the_order(self):
+        self.checkout('abc')
+        record = IdempotencyKey.objects.get(user=self.customer, key='abc')
+        self.assertEqual(record.status_code, 201)
+        self.assertEqual(record.response_body['order']['id'], Order.objects.get().id)
+
+    def test_key_reused_for_a_different_request_is_rejected(self):
+        self.checkout('abc')
+        response = self.checkout('abc', {**CHECKOUT, 'city': 'Shelbyville'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def mark_in_progress(self, expires_at):
+        IdempotencyKey.objects.filter(user=self.customer, key='abc').update(
+            status_code=None, response_body=None, expires_at=expires_at
+        )
+
+    def test_retry_while_first_request_is_running_gets_conflict(self):
+        self.checkout('abc')
+        self.mark_in_progress(timezone.now() + timedelta(minutes=1))
+        response = self.checkout('abc')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_expired_claim_without_a_running_request_is_taken_over(self):
+        self.checkout('abc')
+        self.mark_in_progress(timezone.now() - timedelta(minutes=1))
+        # Nothing holds the claim's row lock, so the retry runs for real (and finds the cart empty)
+        response = self.checkout('abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(IdempotencyKey.objects.get(user=self.customer, key='abc').status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], ALLOWED_HOSTS=['testserver'])
+class OrderItemSnapshotTests(TestCase):
+    def setUp(self):
+        self.customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.category = Category.objects.create(name='Footwear')
+        self.product = Product.objects.create(
+            category=self.category, name='Shoe', description="Test product", price=Decimal('10.00'),
+            image='products/ab/shoe.png',
+        )
+        cart = Cart.objects.create(user=self.customer)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        response = self.client.post('/api/orders/create/', CHECKOUT, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.order_id = response.data['order']['id']
+
+    def ordered_product(self):
+        response = self.client.get(f'/api/orders/{self.order_id}/')
+        self.assertEqual(response.status_code, 200)
+        [item] = response.data['items']
+        return item['product']
+
+    def test_checkout_snapshots_the_product(self):
+        item = Order.objects.get(pk=self.order_id).items.get()
+        self.assertEqual(
+            (item.product_name, item.product_image.name, item.category_name, item.price),
+            ('Shoe', 'products/ab/shoe.png', 'Footwear', Decimal('10.00')),
+        )
+
+    def test_order_shows_the_product_as_it_was_at_checkout(self):
+        Product.objects.filter(pk=self.product.pk).update(name='Boot', image='products/cd/boot.png')
+        Category.objects.filter(pk=self.category.pk).update(name='Boots')
+        product = self.ordered_product()
+        self.assertEqual(product['id'], self.product.pk)
+        self.assertEqual(product['name'], 'Shoe')
+        self.assertEqual(product['category_name'], 'Footwear')
+        self.assertTrue(product['image'].endswith('/products/ab/shoe.png'))
+
+    def test_deleted_product_keeps_the_order_readable(self):
+        self.product.delete()
+        product = self.ordered_product()
+        self.assertIsNone(product['id'])
+        self.assertEqual(product['name'], 'Shoe')
+
+    def test_order_detail_does_not_join_products(self):
+        with self.assertNumQueries(2):
+            self.ordered_product()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RebuildCoPurchasesTests(TestCase):
+    def setUp(self):
+        self.customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        category = Category.objects.create(name='Footwear')
+        self.products = [
+            Product.objects.create(
+                category=category, name=f'Shoe {index}', description="Test product", price=Decimal('10.00')
+            )
+            for index in range(5)
+        ]
+        self.cart = Cart.objects.create(user=self.customer)
+
+    def checkout(self, *indexes):
+        for index in indexes:
+            CartItem.objects.create(cart=self.cart, product=self.products[index], quantity=1)
+        response = self.client.post('/api/orders/create/', CHECKOUT, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['order']['id']
+
+    def counts(self):
+        return {(a, b): count for a, b, count in CoPurchase.objects.values_list('product_id', 'related_id', 'count')}
+
+    def rebuild(self):
+        call_command('rebuild_copurchases', '--products-per-batch', '2', stdout=io.StringIO())
+
+    def test_rebuild_matches_incremental_counts(self):
+        archived = self.checkout(0, 1, 2)
+        self.checkout(0, 1)
+        self.checkout(1, 3)
+        self.checkout(2, 4)
+        Order.objects.filter(pk=archived).update(order_status='DELIVERED')
+        self.assertEqual(archive_batch(timezone.now() + timedelta(minutes=1), 10), 1)
+        self.checkout(0, 2, 3)
+        incremental = self.counts()
+        self.assertEqual(incremental[self.products[0].pk, self.products[1].pk], 2)
+
+        # Drift the table: a wrong count, a stale pair and a missing pair
+        CoPurchase.objects.filter(product=self.products[0], related=self.products[1]).update(count=99)
+        CoPurchase.objects.create(product=self.products[3], related=self.products[4], count=5)
+        CoPurchase.objects.filter(product=self.products[2], related=self.products[4]).delete()
+
+        self.rebuild()
+        self.assertEqual(self.counts(), incremental)
+
+    def test_archived_items_of_deleted_products_are_skipped(self):
+        archived = self.checkout(0, 1, 4)
+        Order.objects.filter(pk=archived).update(order_status='DELIVERED')
+        archive_batch(timezone.now() + timedelta(minutes=1), 10)
+        self.products[4].delete()
+
+        self.rebuild()
+        self.assertEqual(self.counts(), {
+            (self.products[0].pk, self.products[1].pk): 1, (self.products[1].pk, self.products[0].pk): 1,
+        })
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        self.customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        category = Category.objects.create(name='Footwear')
+        self.product = Product.objects.create(
+            category=category, name='Shoe', description="Test product", price=Decimal('10.00')
+        )
+        self.cart = Cart.objects.create(user=self.customer)
+
+    def checkout(self, order_status):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+        response = self.client.post('/api/orders/create/', CHECKOUT, format='json')
+        self.assertEqual(response.status_code, 201)
+        order_id = response.data['order']['id']
+        Order.objects.filter(pk=order_id).update(order_status=order_status)
+        return order_id
+
+    def archive(self):
+        return archive_batch(timezone.now() + timedelta(minutes=1), 10)
+
+    def test_moves_only_finished_orders(self):
+        delivered = self.checkout('DELIVERED')
+        cancelled = self.checkout('CANCELLED')
+        pending = self.checkout('PENDING')
+        before = self.client.get(f'/api/orders/{delivered}/').data
+
+        self.assertEqual(self.archive(), 2)
+        self.assertEqual(list(Order.objects.values_list('pk', flat=True)), [pending])
+        self.assertEqual(sorted(ArchivedOrder.objects.values_list('pk', flat=True)), [delivered, cancelled])
+        self.assertFalse(OrderItem.objects.filter(order_id__in=[delivered, cancelled]).exists())
+        self.assertEqual(ArchivedOrder.objects.get(pk=delivered).get_representation(), before)
+        self.assertEqual(self.archive(), 0)
+
+    def test_recently_changed_orders_stay(self):
+        self.checkout('DELIVERED')
+        self.assertEqual(archive_batch(timezone.now() - timedelta(days=1), 10), 0)
+
+    def test_history_falls_back_to_the_archive(self):
+        archived = self.checkout('DELIVERED')
+        live = self.checkout('PENDING')
+        before = self.client.get(f'/api/orders/{archived}/').data
+        self.archive()
+
+        response = self.client.get(f'/api/orders/{archived}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, before)
+        response = self.client.get(f'/api/orders/{archived}/?fields=id,items.quantity')
+        self.assertEqual(response.data, {'id': archived, 'items': [{'quantity': 2}]})
+
+        response = self.client.get('/api/orders/')
+        self.assertEqual([order['id'] for order in response.data], [live, archived])
+        self.assertEqual(response.data[1]['item_count'], 2)
+        response = self.client.get('/api/orders/?expand=items')
+        self.assertEqual(response.data[1], before)
+
+        # Other customers cannot read it
+        other = CustomUser.objects.create_user('other@example.com', 'pw', first_name='Ot', last_name='Her')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/orders/{archived}/').status_code, 404)
+
+    def test_archives_in_the_old_product_shape_are_backfilled(self):
+        order_id = self.checkout('DELIVERED')
+        self.archive()
+        archived = ArchivedOrder.objects.get(pk=order_id)
+        representation = archived.get_representation()
+        # Before order items kept a product snapshot, they embedded the full product
+        representation['items'][0]['product'] = {
+            'id': self.product.pk, 'name': 'Shoe', 'description': "Test product", 'price': '10.00', 'image': None,
+            'category': self.product.category_id, 'category_name': 'Footwear', 'product_type': 'TOP',
+            'is_active': True, 'created_at': '2024-01-01T00:00:00Z',
+        }
+        archived.set_representation(representation)
+        archived.save()
+
+        migration = importlib.import_module('orders.migrations.0009_archived_item_product_shape')
+        migration.backfill_product_shape(apps, None)
+        response = self.client.get(f'/api/orders/{order_id}/')
+        self.assertEqual(response.data['items'][0]['product'], {
+            'id': self.product.pk, 'name': 'Shoe', 'image': None, 'category_name': 'Footwear',
+        })
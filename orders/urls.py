@@ -7,8 +7,10 @@ urlpatterns = [
     path('', views.OrderListView.as_view(), name='order-list'),
     path('create/', views.CreateOrderView.as_view(), name='create-order'),
     path('<int:pk>/', views.OrderDetailView.as_view(), name='order-detail'),
+    path('events/', views.order_status_events, name='order-events'),
     
     # Admin routes
     path('admin/', views.AdminOrderListView.as_view(), name='admin-order-list'),
+    path('admin/bulk-status/', views.AdminOrderBulkStatusView.as_view(), name='admin-order-bulk-status'),
     path('admin/<int:pk>/', views.AdminOrderDetailView.as_view(), name='admin-order-detail'),
 ]
\ No newline at end of file
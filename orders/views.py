@@ -1,12 +1,28 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 from django.utils import timezone
-from .models import Order, OrderItem
-from .serializers import OrderSerializer
+from ppg_backend.fieldsets import SparseFieldsetViewMixin
+from ppg_backend.filters import parse_datetime_param, parse_decimal_param
+from ppg_backend.idempotency import idempotent
+from .archive import render_archived
+from .events import order_status_feed
+from .models import ArchivedOrder, Order, OrderItem
+from .notifications import build_status_update_email, queue_status_update_emails
+from .serializers import OrderSerializer, OrderSummarySerializer
+from . import stats
 from cart.models import Cart
+from products.models import CoPurchase
 
 # Custom permission for admin users only
 class IsAdminUser(permissions.BasePermission):
@@ -14,32 +30,68 @@ class IsAdminUser(permissions.BasePermission):
         return request.user and request.user.is_authenticated and request.user.role == 'ADMIN'
 
 
-class OrderListView(generics.ListAPIView):
-    serializer_class = OrderSerializer
+class OrderListView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """Order history - summaries by default, full items with ?expand=items; includes archived orders"""
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 4
+
+    def expand_items(self):
+        return 'items' in self.request.query_params.get('expand', '').split(',')
+
+    def get_serializer_class(self):
+        if self.expand_items():
+            return OrderSerializer
+        return OrderSummarySerializer
 
     def get_queryset(self):
+        # SparseFieldsetViewMixin narrows the columns and prefetches items only when expanded
         return Order.objects.filter(user=self.request.user).order_by('-created_at')
 
+    def list(self, request, *args, **kwargs):
+        orders = list(self.filter_queryset(self.get_queryset()))
+        archived = ArchivedOrder.objects.filter(user=request.user).order_by('-created_at')
+        if not self.expand_items():
+            # Summaries come straight from the archive columns
+            archived = [archived_order.as_order() for archived_order in archived.defer('data')]
+            orders = sorted(orders + archived, key=lambda order: order.created_at, reverse=True)
+            return Response(self.get_serializer(orders, many=True).data)
+
+        rows = list(zip(orders, self.get_serializer(orders, many=True).data))
+        rows += [(archived_order, render_archived(archived_order, request)) for archived_order in archived]
+        rows.sort(key=lambda row: row[0].created_at, reverse=True)
+        return Response([data for _, data in rows])
+
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(SparseFieldsetViewMixin, generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 4
 
     def get_queryset(self):
         return Order.objects.filter(user=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            archived = ArchivedOrder.objects.filter(pk=kwargs['pk'], user=request.user).first()
+            if archived is None:
+                raise
+            return Response(render_archived(archived, request))
+
 
 class CreateOrderView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def post(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
+        cart = Cart.objects.filter(user=request.user).order_by('id').first()
 
-        if not cart.items.exists():
+        if cart is None or not cart.items.exists():
             return Response({"error": "Your cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
+            cart_items = list(cart.items.select_related('product__category').order_by('id'))
             order_data = {
                 'user': request.user,
                 'full_name': request.data.get('full_name'),
@@ -50,7 +102,7 @@ class CreateOrderView(APIView):
                 'state': request.data.get('state'),
                 'zip_code': request.data.get('zip_code'),
                 'payment_method': 'COD',
-                'total': cart.get_total_price()
+                'total': sum(cart_item.get_subtotal() for cart_item in cart_items)
             }
 
             required_fields = ['full_name', 'email', 'phone_number', 'address', 'city', 'state', 'zip_code']
@@ -58,22 +110,31 @@ class CreateOrderView(APIView):
                 if not order_data.get(field):
                     return Response({"error": f"{field} is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-            order = Order.objects.create(**order_data)
-
-            for cart_item in cart.items.all():
-                OrderItem.objects.create(
-                    order=order,
-                    product=cart_item.product,
-                    price=cart_item.product.price,
-                    quantity=cart_item.quantity
-                )
-
-            cart.items.all().delete()
-
-            try:
-                self.send_order_confirmation_email(order)
-            except Exception as email_error:
-                print(f"Email error: {email_error}")
+            order_data['item_count'] = sum(cart_item.quantity for cart_item in cart_items)
+            order_data['thumbnail'] = next(
+                (cart_item.product.image.name for cart_item in cart_items if cart_item.product.image), None
+            )
+            with transaction.atomic():
+                order = Order.objects.create(**order_data)
+                stats.order_created(order)
+
+                OrderItem.objects.bulk_create([
+                    OrderItem(
+                        order=order,
+                        product=cart_item.product,
+                        price=cart_item.product.price,
+                        quantity=cart_item.quantity,
+                        product_name=cart_item.product.name,
+                        product_image=cart_item.product.image.name or None,
+                        category_name=cart_item.product.category.name,
+                    )
+                    for cart_item in cart_items
+                ])
+                CoPurchase.objects.record_order([cart_item.product_id for cart_item in cart_items])
+
+                cart.items.all().delete()
+                # Sent once the order (and its Idempotency-Key result) is committed
+                transaction.on_commit(lambda: self.send_confirmation(order))
 
             return Response({
                 "order": OrderSerializer(order).data,
@@ -83,6 +144,12 @@ class CreateOrderView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    def send_confirmation(self, order):
+        try:
+            self.send_order_confirmation_email(order)
+        except Exception as email_error:
+            print(f"Email error: {email_error}")
+
     def send_order_confirmation_email(self, order):
         subject = f"Order Confirmation - Order #{order.id}"
 
@@ -126,7 +193,7 @@ class CreateOrderView(APIView):
                             <th>Quantity</th>
                             <th>Price</th>
                         </tr>
-                        {''.join(f"<tr><td>{item.product.name}</td><td>{item.quantity}</td><td>${item.price}</td></tr>" for item in order.items.all())}
+                        {''.join(f"<tr><td>{item.product_name}</td><td>{item.quantity}</td><td>${item.price}</td></tr>" for item in order.items.all())}
                     </table>
                     
                     <p>We will notify you when your order has been shipped.</p>
@@ -169,16 +236,46 @@ class CreateOrderView(APIView):
 
 # Admin Views
 
-class AdminOrderListView(generics.ListAPIView):
+# Filters shared by the admin order list and bulk status moves, see Order.objects.matching()
+ORDER_FILTERS = (
+    'status', 'created_after', 'created_before', 'city', 'state', 'email',
+    'min_total', 'max_total', 'payment_method',
+)
+
+
+def parse_order_filters(params):
+    """Turn admin order filter values into keyword arguments for ``Order.objects.matching()``."""
+    filters = {}
+    for name in ORDER_FILTERS:
+        value = params.get(name)
+        if value is None or str(value).strip() == '':
+            continue
+        value = str(value)
+        if name in ('created_after', 'created_before'):
+            value = parse_datetime_param(name, value)
+        elif name in ('min_total', 'max_total'):
+            value = parse_decimal_param(name, value)
+        filters[name] = value
+    return filters
+
+
+class AdminOrderListView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """All orders, newest first - admin only
+
+    Query params, combinable: status, created_after, created_before, city,
+    state, email (case-insensitive exact matches), min_total, max_total and
+    payment_method.
+    """
     queryset = Order.objects.all().order_by('-created_at')
     serializer_class = OrderSerializer
     permission_classes = [IsAdminUser]
 
+    def filter_queryset(self, queryset):
+        filters = parse_order_filters(self.request.query_params)
+        return super().filter_queryset(queryset.matching(**filters))
+
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        status_filter = request.query_params.get('status')
-        if status_filter:
-            queryset = queryset.filter(order_status=status_filter)
+        queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response({
             "orders": serializer.data,
@@ -186,7 +283,7 @@ class AdminOrderListView(generics.ListAPIView):
         })
 
 
-class AdminOrderDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AdminOrderDetailView(SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAdminUser]
@@ -194,8 +291,11 @@ class AdminOrderDetailView(generics.RetrieveUpdateDestroyAPIView):
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         if 'order_status' in request.data:
+            previous_status = instance.order_status
             instance.order_status = request.data.get('order_status')
-            instance.save()
+            with transaction.atomic():
+                instance.save()
+                stats.order_status_changed(instance, previous_status)
 
             if request.data.get('send_notification', False):
                 self.send_status_update_email(instance)
@@ -211,25 +311,124 @@ class AdminOrderDetailView(generics.RetrieveUpdateDestroyAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         order_id = instance.id
-        instance.delete()
+        with transaction.atomic():
+            instance.delete()
+            stats.order_deleted(instance)
         return Response(
             {"message": f"Order #{order_id} has been deleted successfully"},
             status=status.HTTP_200_OK
         )
 
     def send_status_update_email(self, order):
-        subject = f"Order Status Update - Order #{order.id}"
-        message = f"""
-        Dear {order.full_name},
+        build_status_update_email(order).send(fail_silently=False)
 
-        Your order #{order.id} status has been updated to: {order.get_order_status_display()}
 
-        Thank you for shopping with us!
-        """
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [order.email],
-            fail_silently=False,
-        )
+class AdminOrderBulkStatusView(APIView):
+    """Move many orders to a new status in one request - admin only"""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        target_status = request.data.get('order_status')
+        if target_status not in dict(Order.STATUS_CHOICES):
+            return Response({"error": "A valid order_status is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        order_ids = request.data.get('ids')
+        filters = request.data.get('filter')
+        if order_ids is not None:
+            # A string is iterable too: "12" must not become orders 1 and 2
+            try:
+                if not isinstance(order_ids, list) or not order_ids:
+                    raise TypeError
+                order_ids = [int(order_id) for order_id in order_ids]
+            except (TypeError, ValueError):
+                return Response({"error": "ids must be a list of order IDs"}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = Order.objects.filter(id__in=order_ids)
+        elif filters is not None:
+            # An unknown or empty filter must never widen the move to every order
+            if not isinstance(filters, dict):
+                return Response({"error": "filter must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+            unknown = sorted(set(filters) - set(ORDER_FILTERS))
+            if unknown:
+                return Response(
+                    {"error": f"Unknown filter(s): {', '.join(unknown)}. Choose from {', '.join(ORDER_FILTERS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            filters = parse_order_filters(filters)
+            if not filters:
+                return Response({"error": "filter must set at least one value"}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = Order.objects.matching(**filters)
+        else:
+            return Response({"error": "Either ids or filter is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only orders whose current status may move to the target are touched;
+        # the check lives in the WHERE clause of the single UPDATE below.
+        allowed_sources = Order.statuses_allowed_into(target_status)
+        with transaction.atomic():
+            eligible = queryset.filter(order_status__in=allowed_sources).select_for_update()
+            updated_ids = list(eligible.values_list('id', flat=True))
+            stats.orders_moved(Order.objects.filter(id__in=updated_ids), target_status)
+            updated = Order.objects.filter(id__in=updated_ids, order_status__in=allowed_sources).update(
+                order_status=target_status, updated_at=timezone.now()
+            )
+
+            if request.data.get('send_notification', False):
+                queue_status_update_emails(
+                    Order.objects.filter(id__in=updated_ids).only('id', 'full_name', 'email', 'order_status')
+                )
+
+        response = {
+            "updated": updated,
+            "order_ids": updated_ids,
+            "message": f"{updated} order(s) moved to {target_status}"
+        }
+        if order_ids:
+            response["skipped"] = sorted(set(order_ids) - set(updated_ids))
+        return Response(response, status=status.HTTP_200_OK)
+
+
+async def order_status_events(request):
+    """Server-Sent Events stream of status changes for the user's orders - serve under ASGI
+
+    EventSource cannot send an Authorization header, so the access token may
+    be passed as ``?token=``. That puts it in proxy and server access logs:
+    strip the query string from logged URLs for this path, and keep access
+    tokens short-lived.
+    """
+    user = await authenticate_event_stream(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication credentials were not provided or are invalid"}, status=401)
+
+    response = StreamingHttpResponse(stream_order_events(user.id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def authenticate_event_stream(request):
+    # EventSource cannot send headers, so the access token may also come as ?token=
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else request.GET.get('token')
+    if not raw_token:
+        return None
+    try:
+        validated_token = authentication.get_validated_token(raw_token)
+        return await sync_to_async(authentication.get_user)(validated_token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def stream_order_events(user_id):
+    queue = order_status_feed.subscribe(user_id)
+    try:
+        yield f"retry: {settings.ORDER_EVENTS_RETRY_MS}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.ORDER_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: order_status\ndata: {json.dumps(event)}\n\n"
+    finally:
+        order_status_feed.unsubscribe(user_id, queue)
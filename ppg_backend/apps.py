@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class PpgBackendConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'ppg_backend'
+
+    def ready(self):
+        from . import signals
+        signals.connect()
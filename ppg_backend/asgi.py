@@ -1,7 +1,8 @@
 """
 ASGI config for ppg_backend project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``,
+warmed up by ppg_backend.warmup before the server hands it any requests.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -14,3 +15,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ppg_backend.settings')
 
 application = get_asgi_application()
+
+from ppg_backend.warmup import warm_up  # noqa: E402 (needs the app set up)
+
+warm_up()
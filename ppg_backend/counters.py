@@ -0,0 +1,67 @@
+# ppg_backend/counters.py
+"""
+Running totals for the admin dashboard, one DashboardCounter row each.
+
+Changes to orders, products and users move the affected counters with a
+single F() UPDATE in the same transaction as the change, so the dashboard
+reads every total with one query instead of counting whole tables.
+Archived orders stay counted under their final status. ``manage.py
+rebuild_dashboard_counters`` recomputes everything from the tables.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, F, Sum, Value, When
+
+from .models import DashboardCounter
+
+ORDER_STATUSES = ('PENDING', 'PROCESSING', 'SHIPPED', 'DELIVERED', 'CANCELLED')
+
+COUNTER_NAMES = (
+    [f"orders.{order_status}" for order_status in ORDER_STATUSES]
+    + [f"revenue.{order_status}" for order_status in ORDER_STATUSES]
+    + ['products.total', 'products.active', 'users.total', 'users.active']
+)
+
+
+def adjust(deltas):
+    """Add each ``{name: delta}`` to its counter in one UPDATE."""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    DashboardCounter.objects.filter(name__in=deltas).update(value=F('value') + Case(
+        *[When(name=name, then=Value(Decimal(delta))) for name, delta in deltas.items()],
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    ))
+
+
+def order_deltas(order_status, orders, revenue, deltas=None):
+    """Add ``orders`` and ``revenue`` under ``order_status`` to ``deltas``."""
+    deltas = {} if deltas is None else deltas
+    for name, delta in ((f"orders.{order_status}", orders), (f"revenue.{order_status}", revenue)):
+        deltas[name] = deltas.get(name, 0) + delta
+    return deltas
+
+
+def active_deltas(prefix, created, deleted, was_active, is_active):
+    """Deltas for ``<prefix>.total`` and ``<prefix>.active`` after a save or delete."""
+    if deleted:
+        return {f"{prefix}.total": -1, f"{prefix}.active": -int(was_active)}
+    return {f"{prefix}.total": int(created), f"{prefix}.active": int(is_active) - int(was_active)}
+
+
+def compute_all(order_models, product_model, user_model):
+    """Every counter recomputed from the tables of the given models."""
+    values = dict.fromkeys(COUNTER_NAMES, Decimal(0))
+    for model in order_models:
+        for row in model.objects.order_by().values('order_status').annotate(orders=Count('pk'), revenue=Sum('total')):
+            values[f"orders.{row['order_status']}"] += row['orders']
+            values[f"revenue.{row['order_status']}"] += row['revenue']
+    for prefix, model in (('products', product_model), ('users', user_model)):
+        values[f"{prefix}.total"] = model.objects.count()
+        values[f"{prefix}.active"] = model.objects.filter(is_active=True).count()
+    return values
+
+
+def read_all():
+    """Every counter by name, in one query."""
+    return dict(DashboardCounter.objects.values_list('name', 'value'))
@@ -0,0 +1,182 @@
+# ppg_backend/fieldsets.py
+"""
+Sparse fieldsets for every API serializer.
+
+``?fields=id,name,items.product.name`` keeps only the listed fields and
+``?exclude=description,items.product`` drops them. Dotted paths reach into
+nested serializers. Views using ``SparseFieldsetViewMixin`` also shape their
+queryset from the trimmed serializer, so unused columns are deferred and
+only the relations that are actually rendered get joined or prefetched.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import permissions, serializers
+
+
+def parse_fieldset(value):
+    """Turn ``"id,items.product.name"`` into ``{'id': {}, 'items': {'product': {'name': {}}}}``."""
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for part in path.strip().split('.'):
+            if part:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def apply_fieldset(data, include, exclude):
+    """Trim already rendered ``data`` the same way ``SparseFieldsetMixin`` trims serializer fields."""
+    if isinstance(data, list):
+        return [apply_fieldset(row, include, exclude) for row in data]
+    if not isinstance(data, dict):
+        return data
+    trimmed = {}
+    for name, value in data.items():
+        if (include and name not in include) or (name in exclude and not exclude[name]):
+            continue
+        trimmed[name] = apply_fieldset(value, include.get(name, {}), exclude.get(name, {}))
+    return trimmed
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin that trims its fields from ``?fields=`` / ``?exclude=``.
+
+    The top-level serializer reads the query string; nested serializers are
+    handed the matching sub-tree by their parent. Fieldsets only apply to
+    safe methods so writes always validate against the full field set.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        include, exclude = self.get_fieldset()
+
+        if include:
+            fields = {name: field for name, field in fields.items() if name in include}
+        for name, subtree in exclude.items():
+            if not subtree:
+                fields.pop(name, None)
+
+        for name, field in fields.items():
+            nested = getattr(field, 'child', field)
+            if isinstance(nested, SparseFieldsetMixin):
+                nested._fieldset = (include.get(name, {}), exclude.get(name, {}))
+        return fields
+
+    def get_fieldset(self):
+        if hasattr(self, '_fieldset'):
+            return self._fieldset
+
+        parent = self.parent
+        is_root = parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+        request = self.context.get('request')
+        if not is_root or request is None or request.method not in permissions.SAFE_METHODS:
+            return {}, {}
+        return (
+            parse_fieldset(request.query_params.get('fields')),
+            parse_fieldset(request.query_params.get('exclude')),
+        )
+
+
+def optimize_queryset(queryset, serializer):
+    """Apply ``only()``, ``select_related()`` and ``prefetch_related()`` for what ``serializer`` renders."""
+    only, select_related, prefetches = [], [], []
+    _collect(getattr(serializer, 'child', serializer), queryset.model, [], only, select_related, prefetches)
+    if only:
+        queryset = queryset.only(*only)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+def _collect(serializer, model, prefix, only, select_related, prefetches, restricted=True):
+    """Walk the rendered fields of ``serializer`` and record what ``model`` rows need.
+
+    Method fields and ``source='*'`` can read anything from the instance, so
+    they switch the current level and everything below it to loading all
+    columns; joins and prefetches are still planned for nested serializers.
+    """
+    fields = [field for field in serializer.fields.values() if not field.write_only]
+    if any(isinstance(field, serializers.SerializerMethodField) or field.source == '*' for field in fields):
+        restricted = False
+
+    columns = {model._meta.pk.name, *getattr(serializer, 'required_columns', ())}
+    for column in columns:
+        if '__' in column:
+            # A required column of a related row, such as category__updated_at
+            select_related.append('__'.join(prefix + column.split('__')[:-1]))
+    for field in fields:
+        nested = getattr(field, 'child', field)
+        nested = nested if isinstance(nested, serializers.BaseSerializer) else None
+        current, path = model, []
+
+        for index, attr in enumerate(field.source_attrs):
+            try:
+                model_field = current._meta.get_field(current._meta.pk.name if attr == 'pk' else attr)
+            except FieldDoesNotExist:
+                # A property or method - it may read any column
+                restricted = False
+                break
+
+            path.append(model_field.name)
+            is_last = index == len(field.source_attrs) - 1
+
+            if not model_field.is_relation or (is_last and nested is None and model_field.concrete):
+                columns.add('__'.join(path))
+                break
+
+            lookup = '__'.join(prefix + path)
+            if model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+                columns.add('__'.join(path))
+                select_related.append(lookup)
+                if is_last and nested is not None:
+                    _collect(nested, model_field.related_model, prefix + path,
+                             only, select_related, prefetches, restricted)
+                current = model_field.related_model
+                continue
+
+            # Reverse or many-to-many relation: fetch it in one extra query
+            if is_last and nested is not None and not prefix:
+                prefetches.append(Prefetch(lookup, queryset=_related_queryset(model_field, nested, restricted)))
+            else:
+                prefetches.append(lookup)
+            break
+
+    if restricted:
+        only.extend('__'.join(prefix + [column]) for column in columns)
+    else:
+        only.extend('__'.join(prefix + [f.name]) for f in model._meta.concrete_fields)
+
+
+def _related_queryset(relation, serializer, restricted):
+    related_model = relation.related_model
+    only, select_related, prefetches = [], [], []
+    _collect(serializer, related_model, [], only, select_related, prefetches, restricted)
+
+    # The prefetch has to read the column that links back to the parent rows
+    remote_field = getattr(relation, 'field', None)
+    if remote_field is not None and remote_field.model is related_model:
+        only.append(remote_field.name)
+
+    queryset = related_model._default_manager.all()
+    if relation.many_to_many:
+        # Prefetching through a join table needs the full default select
+        only = []
+    if only:
+        queryset = queryset.only(*only)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+class SparseFieldsetViewMixin:
+    """View mixin that shapes the filtered queryset from the sparse serializer on reads."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in permissions.SAFE_METHODS:
+            queryset = optimize_queryset(queryset, self.get_serializer())
+        return queryset
@@ -0,0 +1,37 @@
+# ppg_backend/filters.py
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def parse_datetime_param(name, value):
+    """Parse an ISO 8601 date or datetime query parameter into an aware datetime.
+
+    A bare date means midnight at the start of that day in the current time zone.
+    """
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Use an ISO 8601 date or datetime"})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_decimal_param(name, value):
+    """Parse a numeric query parameter into a Decimal."""
+    try:
+        parsed = Decimal(value)
+    except InvalidOperation:
+        parsed = None
+    if parsed is None or not parsed.is_finite():
+        raise ValidationError({name: "Use a number"})
+    return parsed
@@ -0,0 +1,130 @@
+# ppg_backend/idempotency.py
+"""
+``Idempotency-Key`` support for checkout and cart writes.
+
+The first request with a given key runs normally and its response is
+stored in the same transaction as the handler's writes; a retry with the
+same key and body gets that response replayed instead of running the work
+again. The first request holds a row lock on its key until it commits, so
+a retry that arrives while it is still running waits for its result and
+then gets a 409, however long the handler takes. Server errors are not
+stored, so those requests can be retried for real.
+"""
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from orders.models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def idempotent(handler):
+    """Decorator for APIView handler methods such as ``post`` or ``put``."""
+
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return handler(view, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"error": f"{IDEMPOTENCY_HEADER} must be at most 255 characters"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = fingerprint(request)
+        record, created = claim(request.user, key, request_hash)
+        if not created:
+            return replay(record, request_hash)
+
+        try:
+            with transaction.atomic():
+                # Held until commit; claim() never takes over a key whose lock is held
+                if not IdempotencyKey.objects.select_for_update().filter(pk=record.pk).exists():
+                    return Response({"error": "A request with this Idempotency-Key is still being processed"},
+                                    status=status.HTTP_409_CONFLICT)
+                response = handler(view, request, *args, **kwargs)
+                if response.status_code < 500:
+                    record.status_code = response.status_code
+                    record.response_body = response.data
+                    record.expires_at = timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+                    record.save(update_fields=['status_code', 'response_body', 'expires_at'])
+        except Exception:
+            record.delete()
+            raise
+        if response.status_code >= 500:
+            record.delete()
+        return response
+
+    return wrapper
+
+
+def fingerprint(request):
+    payload = json.dumps(
+        [request.method, request.get_full_path(), request.data], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def claim(user, key, request_hash):
+    """Create the in-progress record for ``key``, or return the one that already exists."""
+    while True:
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=user, key=key, request_hash=request_hash,
+                    expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+                ), True
+        except IntegrityError:
+            pass
+
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            continue
+        if record.expires_at <= timezone.now() and release(record):
+            continue
+        return record, False
+
+
+def release(record):
+    """Delete an expired ``record`` unless the request that claimed it is still running."""
+    with transaction.atomic():
+        # A running first request holds the row lock, so skip_locked finds nothing to release
+        unlocked = IdempotencyKey.objects.select_for_update(skip_locked=True).filter(
+            pk=record.pk, expires_at=record.expires_at
+        )
+        if not unlocked.exists():
+            return False
+        # expires_at changes when a result is stored, so a finished record is never deleted here
+        IdempotencyKey.objects.filter(pk=record.pk, expires_at=record.expires_at).delete()
+    return True
+
+
+def replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return Response({"error": f"{IDEMPOTENCY_HEADER} was already used for a different request"},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    while record is not None and record.status_code is None and time.monotonic() < deadline:
+        time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+        record = IdempotencyKey.objects.filter(pk=record.pk).first()
+
+    if record is None:
+        # The first request failed and released the key
+        return Response({"error": "The original request failed, retry it"}, status=status.HTTP_409_CONFLICT)
+    if record.status_code is None:
+        return Response({"error": "A request with this Idempotency-Key is still being processed"},
+                        status=status.HTTP_409_CONFLICT)
+
+    response = Response(record.response_body, status=record.status_code)
+    response[REPLAYED_HEADER] = 'true'
+    return response
@@ -0,0 +1,100 @@
+import gzip
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from orders.models import Order, OrderItem
+from orders.views import AdminOrderListView
+from ppg_backend.middleware import brotli
+from ppg_backend.renderers import FastJSONRenderer
+from products.models import Category, Product
+from products.views import AdminProductListView
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Compare JSON render time and bytes on the wire for the admin order and product lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=300, help="Orders to seed (default 300)")
+        parser.add_argument('--products', type=int, default=200, help="Products to seed (default 200)")
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=20, help="Render passes per measurement")
+
+    def handle(self, *args, **options):
+        # Seed inside a transaction that is always rolled back
+        with transaction.atomic():
+            admin = self.seed(options)
+            for view_class in (AdminOrderListView, AdminProductListView):
+                self.benchmark(view_class, admin, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        admin = User.objects.create_user(
+            'benchmark-admin@example.com', 'benchmark', first_name='Bench', last_name='Admin', role='ADMIN'
+        )
+        category = Category.objects.create(name='Benchmark')
+        products = Product.objects.bulk_create(
+            Product(
+                category=category, name=f"Benchmark product {i}", price=Decimal('19.99'),
+                description="Lightweight breathable training shirt with moisture-wicking fabric. " * 4,
+                image=f"products/benchmark-{i}.jpg",
+            )
+            for i in range(options['products'])
+        )
+        orders = Order.objects.bulk_create(
+            Order(
+                user=admin, full_name="Bench Admin", email='benchmark-admin@example.com',
+                phone_number='5550100', address="1 Benchmark Way", city="Springfield", state="IL",
+                zip_code='62701', total=Decimal('59.97'), item_count=options['items_per_order'],
+            )
+            for _ in range(options['orders'])
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(
+                order=order, product=product, price=Decimal('19.99'),
+                product_name=product.name, product_image=product.image.name, category_name=category.name,
+            )
+            for order in orders
+            for product in (products[(order.id + n) % len(products)] for n in range(options['items_per_order']))
+        )
+        return admin
+
+    def benchmark(self, view_class, admin, repeat):
+        request = APIRequestFactory().get('/', HTTP_HOST='localhost')
+        force_authenticate(request, user=admin)
+        data = view_class.as_view()(request).data
+
+        self.stdout.write(self.style.MIGRATE_HEADING(view_class.__name__))
+        baseline, baseline_ms = self.time_render(JSONRenderer(), data, repeat)
+        fast, fast_ms = self.time_render(FastJSONRenderer(), data, repeat)
+        self.stdout.write(f"  JSONRenderer      {baseline_ms:8.2f} ms/render")
+        self.stdout.write(f"  FastJSONRenderer  {fast_ms:8.2f} ms/render  ({baseline_ms / fast_ms:.1f}x)")
+        if fast != baseline:
+            self.stdout.write(self.style.ERROR("  Rendered output differs from JSONRenderer"))
+
+        self.stdout.write(f"  identity          {len(fast):8d} bytes")
+        codecs = [('gzip', lambda content: gzip.compress(content, compresslevel=6))]
+        if brotli is not None:
+            codecs.append(('br', lambda content: brotli.compress(content, quality=5)))
+        for name, compress in codecs:
+            start = time.perf_counter()
+            compressed = compress(fast)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stdout.write(
+                f"  {name:<16}  {len(compressed):8d} bytes  "
+                f"({len(compressed) / len(fast):.1%}, {elapsed:.2f} ms)"
+            )
+
+    def time_render(self, renderer, data, repeat):
+        rendered = renderer.render(data)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            renderer.render(data)
+        return rendered, (time.perf_counter() - start) * 1000 / repeat
@@ -0,0 +1,75 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ppg_backend.models import PendingMediaDeletion
+from ppg_backend.storage import count_references
+
+
+class Command(BaseCommand):
+    help = "Delete queued media files that no row references any more, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Queue entries handled per batch (default 200)")
+        parser.add_argument(
+            '--grace-minutes', type=float, default=10,
+            help="Leave files written or reused this recently alone; a new row may not have committed yet (default 10)",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help="Keep running and poll the queue every N seconds instead of exiting when it is empty",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = kept = 0
+            # Entries put back during this pass get higher ids and wait for the next one
+            last_id = PendingMediaDeletion.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            while True:
+                batch_deleted, batch_kept = self.process_batch(
+                    last_id, options['batch_size'], options['grace_minutes'] * 60
+                )
+                if not batch_deleted and not batch_kept:
+                    break
+                deleted += batch_deleted
+                kept += batch_kept
+            if deleted or kept or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Deleted {deleted} file(s), kept {kept} still referenced or recently written"
+                ))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def process_batch(self, last_id, batch_size, grace_seconds):
+        cutoff = time.time() - grace_seconds
+        with transaction.atomic():
+            entries = list(PendingMediaDeletion.objects.select_for_update().filter(id__lte=last_id).order_by('id')[:batch_size])
+            if not entries:
+                return 0, 0
+            names = {entry.name for entry in entries}
+            references = count_references(names)
+
+            deleted = kept = 0
+            retry = []
+            for name in names:
+                if references[name]:
+                    kept += 1
+                elif self.recently_written(name, cutoff):
+                    retry.append(name)
+                else:
+                    default_storage.delete(name)
+                    deleted += 1
+            PendingMediaDeletion.objects.filter(id__in=[entry.id for entry in entries]).delete()
+            # Recently reused files go to the back of the queue for a later pass
+            PendingMediaDeletion.objects.bulk_create([PendingMediaDeletion(name=name) for name in retry])
+        return deleted, kept + len(retry)
+
+    def recently_written(self, name, cutoff):
+        try:
+            return os.path.getmtime(default_storage.path(name)) >= cutoff
+        except (FileNotFoundError, NotImplementedError):
+            return False
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.models import ArchivedOrder, Order
+from ppg_backend.counters import compute_all
+from ppg_backend.models import DashboardCounter
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recompute every dashboard counter from the order, product and user tables"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # Locking the counter rows holds back writers until the new values are in
+            list(DashboardCounter.objects.select_for_update())
+            values = compute_all([Order, ArchivedOrder], Product, get_user_model())
+            current = DashboardCounter.objects.in_bulk(field_name='name')
+            DashboardCounter.objects.bulk_create(
+                [DashboardCounter(name=name, value=value) for name, value in values.items()],
+                update_conflicts=True, unique_fields=['name'], update_fields=['value'],
+            )
+
+        for name, value in values.items():
+            if name not in current or current[name].value != value:
+                previous = current[name].value if name in current else 'missing'
+                self.stdout.write(f"  {name}: {previous} -> {value}")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(values)} dashboard counters"))
@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter so nothing is already imported
+PROBE = """
+import os, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings_module!r})
+start = time.perf_counter()
+import {application_module}
+from ppg_backend import warmup
+total = time.perf_counter() - start
+print('startup', total, warmup.last_duration or 0.0)
+"""
+
+
+class Command(BaseCommand):
+    help = "Start the app in a fresh interpreter with -X importtime and fail if startup exceeds the budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget-ms', type=float, default=settings.STARTUP_BUDGET_MS,
+            help=f"Maximum import plus warm-up time in milliseconds (default {settings.STARTUP_BUDGET_MS})",
+        )
+        parser.add_argument('--asgi', action='store_true', help="Load ppg_backend.asgi instead of ppg_backend.wsgi")
+        parser.add_argument('--top', type=int, default=15, help="Slowest imports to list (default 15)")
+
+    def handle(self, *args, **options):
+        application_module = 'ppg_backend.asgi' if options['asgi'] else 'ppg_backend.wsgi'
+        probe = PROBE.format(
+            settings_module=os.environ.get('DJANGO_SETTINGS_MODULE', 'ppg_backend.settings'),
+            application_module=application_module,
+        )
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', probe],
+            capture_output=True, text=True, cwd=settings.BASE_DIR,
+        )
+        imports, errors = self.parse_importtime(result.stderr)
+        summary = [line for line in result.stdout.splitlines() if line.startswith('startup ')]
+        if result.returncode or not summary:
+            raise CommandError(f"Loading {application_module} failed:\n" + '\n'.join(errors))
+
+        total_ms, warmup_ms = (float(value) * 1000 for value in summary[-1].split()[1:])
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Slowest imports of {application_module} (cumulative)"))
+        # Only modules imported at the top level, so nested imports are not counted twice
+        top_level = sorted((entry for entry in imports if entry[2] == 0), key=lambda entry: entry[1], reverse=True)
+        for name, cumulative_us, _ in top_level[:options['top']]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+        self.stdout.write(f"Imports  {total_ms - warmup_ms:8.1f} ms")
+        self.stdout.write(f"Warm-up  {warmup_ms:8.1f} ms")
+        self.stdout.write(f"Total    {total_ms:8.1f} ms (budget {options['budget_ms']:.0f} ms)")
+
+        if total_ms > options['budget_ms']:
+            raise CommandError(f"Startup took {total_ms:.0f} ms, over the {options['budget_ms']:.0f} ms budget")
+        self.stdout.write(self.style.SUCCESS("Startup is within budget"))
+
+    def parse_importtime(self, stderr):
+        """Return ``([(module, cumulative_us, depth)], other_lines)`` from ``-X importtime`` output."""
+        imports, other = [], []
+        for line in stderr.splitlines():
+            if not line.startswith('import time:'):
+                other.append(line)
+                continue
+            fields = line[len('import time:'):].split('|')
+            if len(fields) != 3 or not fields[1].strip().isdigit():
+                continue  # The column header
+            name = fields[2].rstrip()
+            # One space after the separator, then two more per nesting level
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            imports.append((name.strip(), int(fields[1]), depth))
+        return imports, other
@@ -0,0 +1,90 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from ppg_backend.storage import TEMP_PREFIX, count_references, file_fields, is_content_addressed
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcile media/ with the database: delete stored files no row references "
+        "and report rows that point at missing files"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help="Leave files younger than this alone; their rows may not be committed yet (default 24)",
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be deleted")
+        parser.add_argument(
+            '--include-legacy', action='store_true',
+            help="Also consider files saved under their upload name, from before content addressing",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options['grace_hours'] * 3600
+        deleted = kept = 0
+        batch = []
+
+        for name, path in self.candidates(cutoff, options['include_legacy']):
+            if os.path.basename(name).startswith(TEMP_PREFIX):
+                # Left behind by an interrupted upload
+                deleted += self.delete(name, options['dry_run'])
+                continue
+            batch.append(name)
+            if len(batch) >= options['batch_size']:
+                swept = self.sweep(batch, options['dry_run'])
+                deleted += swept
+                kept += len(batch) - swept
+                batch = []
+        if batch:
+            swept = self.sweep(batch, options['dry_run'])
+            deleted += swept
+            kept += len(batch) - swept
+
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} file(s), {kept} still referenced"))
+        self.report_missing()
+
+    def candidates(self, cutoff, include_legacy=False):
+        root = settings.MEDIA_ROOT
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                if not (include_legacy or is_content_addressed(name) or filename.startswith(TEMP_PREFIX)):
+                    continue
+                if os.path.getmtime(path) < cutoff:
+                    yield name, path
+
+    def sweep(self, names, dry_run):
+        references = count_references(names)
+        return sum(self.delete(name, dry_run) for name in names if not references[name])
+
+    def delete(self, name, dry_run):
+        if dry_run:
+            self.stdout.write(f"  {name}")
+        else:
+            default_storage.delete(name)
+        return 1
+
+    def report_missing(self):
+        missing = 0
+        for model, field in file_fields():
+            rows = (
+                model._base_manager.exclude(**{field.name: ''}).exclude(**{f"{field.name}__isnull": True})
+                .values_list('pk', field.name)
+            )
+            for pk, name in rows.iterator(chunk_size=2000):
+                if not default_storage.exists(name):
+                    missing += 1
+                    self.stdout.write(self.style.WARNING(
+                        f"  {model._meta.label} {pk} {field.name}: {name} is missing"
+                    ))
+        if missing:
+            self.stdout.write(self.style.WARNING(f"{missing} row(s) reference missing files"))
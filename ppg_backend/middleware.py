@@ -0,0 +1,79 @@
+# ppg_backend/middleware.py
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - Brotli is optional, gzip is always available
+    brotli = None
+
+
+def parse_accept_encoding(header):
+    """Return ``{coding: q}`` from an Accept-Encoding header."""
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding.strip().lower()] = q
+    return codings
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress responses with Brotli or gzip, whichever the client prefers.
+
+    Responses under COMPRESSION_MIN_SIZE bytes, streaming responses and
+    responses that are already encoded are passed through untouched.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        coding = self.choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        compressed = self.compress(response.content, coding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
+
+    def choose_encoding(self, header):
+        accepted = parse_accept_encoding(header)
+        available = ['br', 'gzip'] if brotli is not None else ['gzip']
+        candidates = [
+            coding for coding in available
+            if accepted.get(coding, accepted.get('*', 0)) > 0
+        ]
+        if not candidates:
+            return None
+        # Highest q-value wins; ties go to the better compressor
+        return max(candidates, key=lambda coding: accepted.get(coding, accepted.get('*', 0)))
+
+    def compress(self, content, coding):
+        if coding == 'br':
+            return brotli.compress(content, quality=getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5))
+        return gzip.compress(content, compresslevel=getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6), mtime=0)
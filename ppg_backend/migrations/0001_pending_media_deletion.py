@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingMediaDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('requested_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
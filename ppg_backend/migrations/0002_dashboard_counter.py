@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:02
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+# Frozen copy of ppg_backend.counters as of this migration
+ORDER_STATUSES = ('PENDING', 'PROCESSING', 'SHIPPED', 'DELIVERED', 'CANCELLED')
+
+
+def create_counters(apps, schema_editor):
+    values = {}
+    for order_status in ORDER_STATUSES:
+        values[f"orders.{order_status}"] = values[f"revenue.{order_status}"] = Decimal(0)
+    for model_name in ('Order', 'ArchivedOrder'):
+        orders = apps.get_model('orders', model_name).objects.order_by()
+        for row in orders.values('order_status').annotate(orders=Count('pk'), revenue=Sum('total')):
+            values[f"orders.{row['order_status']}"] += row['orders']
+            values[f"revenue.{row['order_status']}"] += row['revenue']
+    for prefix, model in (('products', apps.get_model('products', 'Product')),
+                          ('users', apps.get_model('accounts', 'CustomUser'))):
+        values[f"{prefix}.total"] = model.objects.count()
+        values[f"{prefix}.active"] = model.objects.filter(is_active=True).count()
+
+    DashboardCounter = apps.get_model('ppg_backend', 'DashboardCounter')
+    DashboardCounter.objects.bulk_create([DashboardCounter(name=name, value=value) for name, value in values.items()])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ppg_backend', '0001_pending_media_deletion'),
+        ('accounts', '0004_user_order_stats'),
+        ('orders', '0005_idempotency_key'),
+        ('products', '0006_recently_viewed_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.RunPython(create_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# ppg_backend/models.py
+from django.db import models
+
+
+class PendingMediaDeletion(models.Model):
+    """A stored file that lost a reference; process_media_deletions deletes it if nothing else uses it."""
+    name = models.CharField(max_length=255)
+    requested_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+
+class DashboardCounter(models.Model):
+    """One running total shown on the admin dashboard; see ppg_backend/counters.py."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -0,0 +1,64 @@
+# ppg_backend/pagination.py
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+
+class KeysetPaginator:
+    """
+    Keyset (seek) pagination over one sort field with the primary key as tie-breaker.
+
+    Instead of OFFSET, the next page starts after the last row returned, so
+    every page costs one index range scan however deep the client pages.
+    The cursor is an opaque base64 token holding that row's sort value and pk.
+    """
+
+    def __init__(self, ordering, max_limit=200):
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        self.max_limit = max_limit
+
+    def paginate(self, queryset, limit, cursor=None):
+        """Return ``(rows, next_cursor)``; ``next_cursor`` is None on the last page."""
+        limit = self.parse_limit(limit)
+        prefix = '-' if self.descending else ''
+        queryset = queryset.order_by(f"{prefix}{self.field}", f"{prefix}pk")
+
+        if cursor:
+            value, pk = self.decode(cursor, queryset.model)
+            direction = 'lt' if self.descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f"{self.field}__{direction}": value})
+                | Q(**{self.field: value, f"pk__{direction}": pk})
+            )
+
+        rows = list(queryset[:limit + 1])
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode(rows[-1])
+        return rows, next_cursor
+
+    def parse_limit(self, limit):
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValidationError({"limit": "limit must be a positive integer"})
+        if limit < 1:
+            raise ValidationError({"limit": "limit must be a positive integer"})
+        return min(limit, self.max_limit)
+
+    def encode(self, row):
+        payload = json.dumps([getattr(row, self.field), row.pk], cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode(self, cursor, model):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return model._meta.get_field(self.field).to_python(value), int(pk)
+        except (ValueError, TypeError, DjangoValidationError):
+            raise ValidationError({"cursor": "Invalid cursor"})
@@ -0,0 +1,113 @@
+# ppg_backend/query_budget.py
+"""
+Per-request SQL accounting for catching N+1 regressions in development.
+
+``QueryBudgetMiddleware`` records every query a request runs, groups them
+by shape (the SQL with literals and IN-lists collapsed) and reports shapes
+that repeat, naming the serializer field that was rendering when they ran.
+Views can declare ``query_budget = <max queries>``; going over it, or
+repeating a shape, is logged or raised depending on QUERY_BUDGET_MODE.
+"""
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_SERIALIZER_CODE = serializers.Serializer.to_representation.__code__
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """Reduce ``sql`` to its shape so queries that differ only in values compare equal."""
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def rendering_field():
+    """``"Serializer.field"`` for the innermost serializer field being rendered, if any."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code is _SERIALIZER_CODE:
+            serializer, field = frame.f_locals.get('self'), frame.f_locals.get('field')
+            if field is not None:
+                return f"{type(serializer).__name__}.{field.field_name}"
+        frame = frame.f_back
+    return None
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+        self.sources = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = fingerprint(sql)
+        self.count += 1
+        self.shapes[shape] += 1
+        source = rendering_field()
+        if source:
+            self.sources[shape] = source
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class QueryBudgetMiddleware:
+    """Count and fingerprint the queries of each request; enabled by QUERY_BUDGET_ENABLED, or DEBUG if that is None."""
+
+    def __init__(self, get_response):
+        enabled = settings.QUERY_BUDGET_ENABLED
+        if not (settings.DEBUG if enabled is None else enabled):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        response['X-Query-Count'] = str(recorder.count)
+        problems = self.check(request, recorder)
+        if problems:
+            message = f"{request.method} {request.get_full_path()} ran {recorder.count} queries: " + '; '.join(problems)
+            if settings.QUERY_BUDGET_MODE == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', view_func)
+        request.query_budget = getattr(view_class, 'query_budget', settings.QUERY_BUDGET_DEFAULT)
+
+    def check(self, request, recorder):
+        problems = []
+        budget = getattr(request, 'query_budget', settings.QUERY_BUDGET_DEFAULT)
+        if budget is not None and recorder.count > budget:
+            problems.append(f"over budget of {budget}")
+        for shape, count in recorder.repeated(settings.QUERY_BUDGET_REPEAT_THRESHOLD):
+            source = recorder.sources.get(shape)
+            problems.append(f"{count}x {shape}" + (f" (from {source})" if source else ""))
+        return problems
@@ -0,0 +1,36 @@
+# ppg_backend/renderers.py
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speed-up
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer that encodes with orjson when it is installed.
+
+    Anything orjson does not handle natively (Decimal, dates, lazy strings...)
+    goes through DRF's own encoder, so the bytes on the wire are the same as
+    JSONRenderer's compact output. Indented output and anything orjson
+    refuses fall back to the stock renderer.
+    """
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (orjson is None or not self.compact or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except (orjson.JSONEncodeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same strict-javascript escaping as JSONRenderer
+        if b'\xe2\x80' in ret:
+            ret = ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret
@@ -0,0 +1,135 @@
+# ppg_backend/serializer_cache.py
+"""
+Shared cache of rendered objects for serializers that many endpoints embed.
+
+Entries are keyed by serializer, primary key and the row's ``updated_at``
+(plus that of any related row the serializer lists), so saving an object
+moves it to a new key and the old entry simply expires.
+Lists look their entries up with one ``get_many`` and store the misses with
+one ``set_many``; item lists that nest a cached serializer (cart and order
+items) prime that field the same way before rendering.
+
+Sparse fieldsets change the shape of the output, so trimmed serializers and
+rows loaded without their version columns bypass the cache.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import serializers
+
+from .fieldsets import SparseFieldsetMixin
+
+_MISSING = object()
+
+
+def serializer_cache():
+    return caches[settings.SERIALIZER_CACHE_ALIAS]
+
+
+class CachedListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        instances = list(data.all() if hasattr(data, 'all') else data)
+        self.child.prime(instances)
+        return [self.child.to_representation(instance) for instance in instances]
+
+
+class PrimingListSerializer(serializers.ListSerializer):
+    """List serializer that batch-loads the cached serializers nested in each item."""
+
+    def to_representation(self, data):
+        instances = list(data.all() if hasattr(data, 'all') else data)
+        for field in self.child.fields.values():
+            if isinstance(field, CachedRepresentationMixin) and not field.write_only:
+                field.prime([_related(instance, field.source_attrs) for instance in instances])
+        return [self.child.to_representation(instance) for instance in instances]
+
+
+def _related(instance, source_attrs):
+    for attr in source_attrs:
+        instance = getattr(instance, attr, None) if instance is not None else None
+    return instance
+
+
+class CachedRepresentationMixin:
+    """Serializer mixin that caches ``to_representation`` per object version.
+
+    Goes before ``SparseFieldsetMixin`` in the bases; set
+    ``list_serializer_class = CachedListSerializer`` in ``Meta`` to batch lists.
+    ``updated_at`` must be bumped whenever anything the representation shows
+    changes; values read through a relation are covered by listing the
+    related row's version, e.g. ``category__updated_at``, in ``required_columns``.
+    """
+    # Columns optimize_queryset must load so the cache key can be built
+    required_columns = ('updated_at',)
+
+    def cache_version(self, instance):
+        """Join the ``required_columns`` values of ``instance``, or None if any was not loaded."""
+        parts = []
+        for column in self.required_columns:
+            *relations, name = column.split('__')
+            row = instance
+            for relation in relations:
+                if not row._meta.get_field(relation).is_cached(row):
+                    return None  # Reading it would cost a query per row
+                row = getattr(row, relation)
+                if row is None:
+                    break
+            if row is None:
+                parts.append('')
+                continue
+            if name in row.get_deferred_fields():
+                return None
+            value = getattr(row, name)
+            parts.append(str(value.timestamp() if hasattr(value, 'timestamp') else value))
+        return ':'.join(parts)
+
+    def cache_key(self, instance):
+        if instance is None or instance.pk is None:
+            return None
+        if isinstance(self, SparseFieldsetMixin) and any(self.get_fieldset()):
+            return None
+        version = self.cache_version(instance)
+        if version is None:
+            return None
+        request = self.context.get('request')
+        # Image URLs are absolute when there is a request, so the host is part of the key
+        origin = request.build_absolute_uri('/') if request is not None else ''
+        variant = hashlib.md5(origin.encode('utf-8')).hexdigest()[:12]
+        cls = type(self)
+        return (
+            f"serialized:{cls.__module__}.{cls.__qualname__}:{instance.pk}:{version}:{variant}"
+        )
+
+    def prime(self, instances):
+        """Fetch the entries for ``instances`` in one round trip and fill in the misses."""
+        keys = {}
+        for instance in instances:
+            key = self.cache_key(instance)
+            if key is not None:
+                keys[key] = instance
+        if not keys:
+            return
+        cache = serializer_cache()
+        primed = cache.get_many(list(keys))
+        missing = {key: super(CachedRepresentationMixin, self).to_representation(instance)
+                   for key, instance in keys.items() if key not in primed}
+        if missing:
+            cache.set_many(missing, settings.SERIALIZER_CACHE_TIMEOUT)
+            primed.update(missing)
+        self._primed = primed
+
+    def to_representation(self, instance):
+        key = self.cache_key(instance)
+        if key is None:
+            return super().to_representation(instance)
+        primed = getattr(self, '_primed', None)
+        if primed is not None and key in primed:
+            return primed[key]
+
+        cache = serializer_cache()
+        data = cache.get(key, _MISSING)
+        if data is _MISSING:
+            data = super().to_representation(instance)
+            cache.set(key, data, settings.SERIALIZER_CACHE_TIMEOUT)
+        return data
@@ -43,12 +43,16 @@ INSTALLED_APPS = [
     'products',
     'cart',
     'corsheaders',
+    'rest_framework_simplejwt.token_blacklist',
+    'ppg_backend',
     
 ]
 
 MIDDLEWARE = [
+    'ppg_backend.query_budget.QueryBudgetMiddleware',
     'corsheaders.middleware.CorsMiddleware', 
     'django.middleware.security.SecurityMiddleware',
+    'ppg_backend.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -89,6 +93,29 @@ DATABASES = {
 }
 
 
+# Password hashing
+# PASSWORD_HASHER_PROFILE picks the PBKDF2 work factor; see `manage.py benchmark_login`
+PASSWORD_HASHER_PROFILES = {
+    'strong': 1_000_000,  # Django's default
+    'standard': 600_000,
+    'fast': 300_000,
+}
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', 'strong')
+
+PASSWORD_HASHERS = [
+    'accounts.hashers.ProfiledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Password hashes allowed to run at once per worker process, and how long a
+# login waits for a free slot before getting a 503
+PASSWORD_HASHING_CONCURRENCY = 2
+PASSWORD_HASHING_QUEUE_TIMEOUT = 2  # seconds
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -139,6 +166,29 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'ppg_backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# Response compression (Brotli when installed, otherwise gzip)
+COMPRESSION_MIN_SIZE = 1024  # bytes
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_GZIP_LEVEL = 6
+
+# Token-bucket throttles on the auth endpoints ("<burst>/<refill period>")
+AUTH_THROTTLE_RATES = {
+    'login_ip': '20/min',
+    'login_account': '5/min',
+    'register_ip': '5/hour',
+}
+
+# Cache used by the throttles; use a shared backend (e.g. Redis) with several workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
 }
 
 # Simple JWT settings
@@ -147,8 +197,9 @@ from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
-    'ROTATE_REFRESH_TOKENS': False,
+    'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.RotatingTokenRefreshSerializer',
 
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
@@ -170,6 +221,14 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=7),
 }
 
+# In-process Bloom filter of revoked refresh tokens (see accounts/revocation.py)
+REVOCATION_FILTER = {
+    'CAPACITY': 100_000,
+    'ERROR_RATE': 0.001,
+    'SYNC_INTERVAL': 5,  # seconds between incremental syncs from the blacklist table
+    'REBUILD_INTERVAL': 3600,  # seconds between full rebuilds that drop expired tokens
+}
+
 # Email Settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -198,12 +257,21 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
 ]
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Admin image uploads stream to disk (ppg_backend/uploads.py). Larger images can
+# use the resumable protocol under /api/products/admin/uploads/, whose part
+# files live in IMAGE_UPLOAD_SESSION_DIR until they complete or expire.
+IMAGE_UPLOAD_MAX_SIZE = 25 * 1024 * 1024  # 25MB
+IMAGE_UPLOAD_CHUNK_MAX_SIZE = 5 * 1024 * 1024  # 5MB
+IMAGE_UPLOAD_SESSION_DIR = os.path.join(BASE_DIR, 'upload_sessions')
+IMAGE_UPLOAD_SESSION_TTL_HOURS = 24
+
 # Static and media files for production
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -215,3 +283,78 @@ SECURE_BROWSER_XSS_FILTER = True
 # Media files configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Delivered and cancelled orders untouched for this long are moved to ArchivedOrder by archive_orders
+ORDER_ARCHIVE_AFTER_DAYS = 365
+
+# Pre-rendered catalog JSON for the reverse proxy, see products/snapshots.py.
+# The base URL is used for absolute image links; auto-publish republishes
+# affected files whenever a product or category is saved or deleted.
+CATALOG_SNAPSHOT_ROOT = os.environ.get('CATALOG_SNAPSHOT_ROOT', os.path.join(BASE_DIR, 'catalog_snapshots'))
+CATALOG_SNAPSHOT_BASE_URL = os.environ.get('CATALOG_SNAPSHOT_BASE_URL', 'http://localhost:8000')
+CATALOG_SNAPSHOT_AUTO_PUBLISH = os.environ.get('CATALOG_SNAPSHOT_AUTO_PUBLISH', '') == '1'
+# Auto-publish renders on a background thread; tests turn this off to publish inside on_commit
+CATALOG_SNAPSHOT_BACKGROUND_PUBLISH = True
+
+# Server-Sent Events for order status changes (orders/events.py). One poller per
+# process reads the change feed every POLL_INTERVAL seconds while clients are connected,
+# re-reading LOOKBACK seconds back to catch transactions that committed late.
+ORDER_EVENTS_POLL_INTERVAL = 1.0
+ORDER_EVENTS_LOOKBACK = 30
+ORDER_EVENTS_HEARTBEAT = 15
+ORDER_EVENTS_RETRY_MS = 5000
+ORDER_EVENTS_QUEUE_SIZE = 100
+
+# Idempotency-Key handling for checkout and cart writes (ppg_backend/idempotency.py).
+# Results are kept for KEY_TTL seconds; a claim older than LOCK_TIMEOUT seconds
+# is only taken over once the request holding it has died, and retries wait up
+# to WAIT_TIMEOUT for it.
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+IDEMPOTENCY_WAIT_TIMEOUT = 10
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+
+# Cache for rendered products and categories, see ppg_backend/serializer_cache.py.
+# Keys include updated_at, so entries for changed rows are never read again and just expire.
+SERIALIZER_CACHE_ALIAS = 'default'
+SERIALIZER_CACHE_TIMEOUT = 60 * 60
+
+# N+1 detection (ppg_backend/query_budget.py), on by default in development.
+# Views may set query_budget = <max queries>; QUERY_BUDGET_MODE is 'warn' or 'raise'.
+# None follows DEBUG when the middleware loads, so it stays off under the test
+# runner, which turns DEBUG off; QUERY_BUDGET_ENABLED=1 or 0 forces it.
+QUERY_BUDGET_ENABLED = {'1': True, '0': False}.get(os.environ.get('QUERY_BUDGET_ENABLED'))
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'warn')
+QUERY_BUDGET_DEFAULT = None
+QUERY_BUDGET_REPEAT_THRESHOLD = 3
+
+# Number of "frequently bought together" products on the product detail endpoint
+RECOMMENDATIONS_TOP_K = 4
+
+# Uploads are stored under the hash of their content and never change,
+# so their URLs can be cached for a year
+STORAGES = {
+    'default': {
+        'BACKEND': 'ppg_backend.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60  # seconds
+
+# Recently viewed products (products/recently_viewed.py). Views go to a per-user
+# list in the cache at once and reach the database in batched upserts every
+# FLUSH_INTERVAL seconds, or sooner once FLUSH_SIZE views are waiting, and at
+# exit. An interval of 0 writes each view through at once; tests that record
+# views set it so nothing is left for the exit flush.
+RECENTLY_VIEWED_CACHE_ALIAS = 'default'
+RECENTLY_VIEWED_CACHE_TIMEOUT = 24 * 60 * 60
+RECENTLY_VIEWED_LIMIT = 20
+RECENTLY_VIEWED_FLUSH_INTERVAL = 30
+RECENTLY_VIEWED_FLUSH_SIZE = 500
+
+# Worker warm-up (ppg_backend/warmup.py), run by wsgi.py and asgi.py before serving.
+# manage.py startup_report fails when imports plus warm-up exceed STARTUP_BUDGET_MS.
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1') == '1'
+STARTUP_BUDGET_MS = 3000
@@ -0,0 +1,68 @@
+# ppg_backend/signals.py
+"""
+Queue media files for deletion when a row stops pointing at them.
+
+The file names each row was loaded with are remembered on the instance.
+When a save replaces one, or the row is deleted, the old name is queued in
+PendingMediaDeletion once the transaction commits, so a rolled back change
+never loses its file. ``process_media_deletions`` does the actual deleting.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .models import PendingMediaDeletion
+from .storage import file_fields
+
+# model -> attnames of its file fields, filled in by connect()
+_file_field_names = {}
+
+
+def connect():
+    """Hook the receivers up to every model with a file field, and only to those."""
+    for model, field in file_fields():
+        _file_field_names.setdefault(model, []).append(field.attname)
+    for model in _file_field_names:
+        post_init.connect(remember_file_names, sender=model)
+        post_save.connect(queue_replaced_files, sender=model)
+        post_delete.connect(queue_deleted_files, sender=model)
+
+
+def file_field_names(model):
+    return _file_field_names.get(model, ())
+
+
+def loaded_file_names(instance):
+    # Deferred fields are not in __dict__; their old value is unknown, so they are skipped
+    return {
+        attname: instance.__dict__[attname].name if hasattr(instance.__dict__[attname], 'name')
+        else instance.__dict__[attname]
+        for attname in file_field_names(type(instance)) if attname in instance.__dict__
+    }
+
+
+def queue_deletions(names):
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(
+            lambda: PendingMediaDeletion.objects.bulk_create([PendingMediaDeletion(name=name) for name in names])
+        )
+
+
+def remember_file_names(sender, instance, **kwargs):
+    if file_field_names(sender):
+        instance._loaded_file_names = loaded_file_names(instance)
+
+
+def queue_replaced_files(sender, instance, created, **kwargs):
+    if not file_field_names(sender):
+        return
+    previous = getattr(instance, '_loaded_file_names', {})
+    current = loaded_file_names(instance)
+    if not created:
+        queue_deletions(name for attname, name in previous.items() if current.get(attname, name) != name)
+    instance._loaded_file_names = current
+
+
+def queue_deleted_files(sender, instance, **kwargs):
+    if file_field_names(sender):
+        queue_deletions(loaded_file_names(instance).values())
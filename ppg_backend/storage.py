@@ -0,0 +1,124 @@
+# ppg_backend/storage.py
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+from .uploads import IMAGE_HEADER_SIZE, sniff_image
+
+# <upload_to>/<first two hex digits>/<sha256><ext>
+CONTENT_ADDRESSED_NAME = re.compile(r'^(?:[\w-]+/)*[0-9a-f]{2}/[0-9a-f]{64}(?:\.\w{1,10})?$')
+TEMP_PREFIX = '.upload-'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage that names every upload after the SHA-256 of its content.
+
+    ``products/shoe.jpg`` is saved as ``products/3f/3fa9...c1.jpg``. The
+    extension comes from the image header, never from the client's filename,
+    so a polyglot named ``x.html`` is still served as an image. The digest
+    is computed while the upload is streamed to a temporary file next to its
+    destination, so the content is read exactly once. Uploads that were
+    already hashed into a temporary file (``content.sha256``) are moved into
+    place without being read again. Uploading the same
+    image twice reuses the existing file, and because a name can never point
+    at different bytes the URLs can be cached forever.
+
+    Files may be shared by several rows, so nothing deletes them inline;
+    ``manage.py process_media_deletions`` removes them once no row references
+    them, and ``manage.py sweep_media`` catches anything the queue missed.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content in _save(), never from probing the disk
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name.replace('\\', '/'))
+
+        digest = getattr(content, 'sha256', None)
+        if digest and hasattr(content, 'temporary_file_path'):
+            with open(content.temporary_file_path(), 'rb') as temp_file:
+                extension = sniff_image(temp_file.read(IMAGE_HEADER_SIZE)) or ''
+            final_name = posixpath.join(directory, digest[:2], digest + extension)
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                self.touch(final_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                file_move_safe(content.temporary_file_path(), final_path)
+                os.chmod(final_path, self.file_permissions_mode or 0o644)
+            return final_name
+
+        os.makedirs(self.path(directory or '.'), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=self.path(directory or '.'))
+        try:
+            hasher = hashlib.sha256()
+            header = b''
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    if len(header) < IMAGE_HEADER_SIZE:
+                        header += chunk[:IMAGE_HEADER_SIZE - len(header)]
+                    hasher.update(chunk)
+                    temp_file.write(chunk)
+
+            digest = hasher.hexdigest()
+            extension = sniff_image(header) or ''
+            final_name = posixpath.join(directory, digest[:2], digest + extension)
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                # Identical content is already stored
+                os.remove(temp_path)
+                self.touch(final_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.chmod(temp_path, self.file_permissions_mode or 0o644)
+                os.replace(temp_path, final_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return final_name
+
+    def touch(self, path):
+        # A reused file counts as freshly written, so sweepers leave it alone
+        # until the row that now points at it has had time to commit
+        os.utime(path)
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_ADDRESSED_NAME.match(name or ''))
+
+
+def file_fields():
+    """Yield ``(model, field)`` for every FileField/ImageField on installed models."""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def count_references(names=None):
+    """Return a Counter of how many rows reference each stored file name.
+
+    Every FileField on every installed model counts, so a file shared by a
+    product, a category and an order thumbnail has three references. Pass
+    ``names`` to only count those files.
+    """
+    references = Counter()
+    for model, field in file_fields():
+        queryset = model._base_manager.exclude(**{field.name: ''}).exclude(**{f"{field.name}__isnull": True})
+        if names is not None:
+            queryset = queryset.filter(**{f"{field.name}__in": list(names)})
+        references.update(queryset.values_list(field.name, flat=True).iterator(chunk_size=2000))
+    return references
@@ -0,0 +1,471 @@
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from accounts.models import CustomUser
+from cart.models import Cart, CartItem
+from orders.archive import archive_batch
+from orders.models import ArchivedOrder, Order, OrderItem
+from orders.serializers import OrderSerializer
+from products import snapshots
+from products.views import ProductDetailView
+from products.models import Category, Product
+from . import counters, warmup
+from .fieldsets import SparseFieldsetMixin, optimize_queryset
+from .management.commands import startup_report
+from .query_budget import QueryBudgetExceeded, fingerprint
+from .models import PendingMediaDeletion
+from .renderers import FastJSONRenderer
+
+CHECKOUT = {
+    'full_name': 'Cu Stomer', 'email': 'cust@example.com', 'phone_number': '555-0100',
+    'address': '1 Main St', 'city': 'Springfield', 'state': 'IL', 'zip_code': '62701',
+}
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(
+            'admin@example.com', 'pw', first_name='Ada', last_name='Admin', role='ADMIN'
+        )
+        self.customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        self.client = APIClient()
+        category = Category.objects.create(name='Footwear')
+        self.product = Product.objects.create(
+            category=category, name='Shoe', description="Test product", price=Decimal('10.00')
+        )
+
+    def checkout(self, quantity):
+        cart, _ = Cart.objects.get_or_create(user=self.customer)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=quantity)
+        self.client.force_authenticate(self.customer)
+        response = self.client.post('/api/orders/create/', CHECKOUT, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(self.admin)
+        return response.data['order']['id']
+
+    def assertCounters(self, **expected):
+        values = counters.read_all()
+        # The running totals always agree with a full recount
+        self.assertEqual(values, counters.compute_all([Order, ArchivedOrder], Product, CustomUser))
+        for name, value in expected.items():
+            self.assertEqual(values[name.replace('__', '.')], Decimal(value), name)
+
+    def test_checkout_counts_the_order_under_pending(self):
+        self.checkout(2)
+        self.assertCounters(orders__PENDING=1, revenue__PENDING='20.00', users__total=2, products__active=1)
+
+    def test_status_change_moves_the_order(self):
+        order_id = self.checkout(2)
+        response = self.client.patch(f'/api/orders/admin/{order_id}/', {'order_status': 'SHIPPED'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertCounters(orders__PENDING=0, revenue__PENDING=0, orders__SHIPPED=1, revenue__SHIPPED='20.00')
+
+    def test_bulk_move_moves_every_order(self):
+        order_ids = [self.checkout(1), self.checkout(3)]
+        response = self.client.post('/api/orders/admin/bulk-status/', {
+            'ids': order_ids, 'order_status': 'PROCESSING',
+        }, format='json')
+        self.assertEqual(response.data['updated'], 2)
+        self.assertCounters(orders__PENDING=0, orders__PROCESSING=2, revenue__PROCESSING='40.00')
+
+    def test_deleting_a_user_uncounts_their_orders(self):
+        self.checkout(2)
+        response = self.client.delete(f'/api/auth/admin/users/{self.customer.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertCounters(orders__PENDING=0, revenue__PENDING=0, users__total=1, users__active=1)
+
+    def test_dashboard_reads_the_counters(self):
+        self.checkout(2)
+        response = self.client.get('/api/admin/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['orders']['PENDING'], 1)
+        self.assertEqual(response.data['orders']['total'], 1)
+        self.assertEqual(response.data['revenue']['pending'], Decimal('20.00'))
+        self.assertEqual(response.data['users'], {'total': 2, 'active': 2})
+
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/admin/dashboard/').status_code, 403)
+
+
+def store_image(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), color).save(buffer, format='PNG')
+    return default_storage.save('products/upload.png', ContentFile(buffer.getvalue()))
+
+
+class MediaDeletionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.category = Category.objects.create(name='Footwear')
+        self.red = store_image('red')
+        self.product = self.make_product(self.red)
+
+    def make_product(self, image):
+        return Product.objects.create(
+            category=self.category, name='Shoe', description="Test product", price=Decimal('10.00'), image=image
+        )
+
+    def queued(self):
+        return list(PendingMediaDeletion.objects.values_list('name', flat=True))
+
+    def process(self, grace_minutes=0):
+        call_command('process_media_deletions', '--grace-minutes', str(grace_minutes), stdout=io.StringIO())
+
+    def test_identical_content_is_stored_once(self):
+        self.assertEqual(store_image('red'), self.red)
+        self.assertNotEqual(store_image('blue'), self.red)
+
+    def test_replaced_file_is_queued_after_commit(self):
+        blue = store_image('blue')
+        product = Product.objects.get(pk=self.product.pk)
+        product.image = blue
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(self.queued(), [self.red])
+        self.assertTrue(default_storage.exists(self.red))
+
+    def test_rolled_back_change_queues_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Product.objects.get(pk=self.product.pk).delete()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self.queued(), [])
+
+    def test_unreferenced_file_is_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(pk=self.product.pk).delete()
+        self.assertEqual(self.queued(), [self.red])
+
+        self.process()
+        self.assertFalse(default_storage.exists(self.red))
+        self.assertEqual(self.queued(), [])
+
+    def test_file_still_referenced_elsewhere_is_kept(self):
+        self.make_product(self.red)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(pk=self.product.pk).delete()
+
+        self.process()
+        self.assertTrue(default_storage.exists(self.red))
+        self.assertEqual(self.queued(), [])
+
+    def test_recently_written_file_waits_for_a_later_pass(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(pk=self.product.pk).delete()
+
+        self.process(grace_minutes=10)
+        self.assertTrue(default_storage.exists(self.red))
+        self.assertEqual(self.queued(), [self.red])
+
+        past = os.path.getmtime(default_storage.path(self.red)) - 3600
+        os.utime(default_storage.path(self.red), (past, past))
+        self.process(grace_minutes=10)
+        self.assertFalse(default_storage.exists(self.red))
+
+    def test_archived_order_keeps_its_item_images(self):
+        green = store_image('green')
+        other = self.make_product(green)
+        customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        order = Order.objects.create(user=customer, total=Decimal('20.00'), order_status='DELIVERED', **CHECKOUT)
+        for product in (self.product, other):
+            OrderItem.objects.create(
+                order=order, product=product, price=product.price, quantity=1,
+                product_name=product.name, product_image=product.image.name, category_name='Footwear',
+            )
+        self.assertEqual(archive_batch(timezone.now(), 10), 1)
+        self.assertEqual(
+            sorted(ArchivedOrder.objects.get().images.values_list('image', flat=True)), sorted([self.red, green])
+        )
+
+        product = Product.objects.get(pk=self.product.pk)
+        product.image = store_image('blue')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(self.queued(), [self.red])
+
+        self.process()
+        self.assertTrue(default_storage.exists(self.red))
+        self.assertEqual(self.queued(), [])
+
+
+class FastJSONRendererTests(TestCase):
+    def test_output_matches_json_renderer(self):
+        samples = {
+            'decimal': {'price': Decimal('10.50'), 'zero': Decimal('0.00')},
+            'datetime': {'at': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc)},
+            'naive datetime': {'at': datetime(2024, 5, 1, 12, 30)},
+            'date': {'on': datetime(2024, 5, 1).date()},
+            'uuid': {'id': uuid.UUID('12345678-1234-5678-1234-567812345678')},
+            'lazy string': {'label': gettext_lazy('Footwear')},
+            'nested': [{'price': Decimal('1.5'), 'tags': ['a', gettext_lazy('b')], 'n': None, 'ok': True}],
+            'separators': {'line': 'a\u2028b\u2029c', 'unicode': 'caf\u00e9'},
+        }
+        for name, data in samples.items():
+            with self.subTest(name):
+                self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class SnapshotBrotliTests(TestCase):
+    def test_missing_brotli_is_logged_once(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with mock.patch.object(snapshots, 'brotli', None), mock.patch.object(snapshots, '_warned_no_brotli', False):
+            with self.assertLogs('products.snapshots', 'WARNING') as logs:
+                snapshots.publish([snapshots.category_list_path()], root)
+                snapshots.publish([snapshots.category_list_path()], root)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Brotli is not installed', logs.output[0])
+        directory = snapshots.snapshot_directory(root, snapshots.category_list_path())
+        self.assertEqual(sorted(os.listdir(directory)), ['index.json', 'index.json.gz'])
+
+
+def request_for(query='', method='get'):
+    return Request(getattr(APIRequestFactory(), method)('/' + query))
+
+
+class ProductWithMethodSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    label = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ('id', 'label')
+
+    def get_label(self, product):
+        return product.name
+
+
+class ProductAsWholeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    whole = serializers.CharField(source='*', read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ('id', 'whole')
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], ALLOWED_HOSTS=['testserver'])
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(
+            'admin@example.com', 'pw', first_name='Ada', last_name='Admin', role='ADMIN'
+        )
+        self.customer = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        self.client = APIClient()
+        category = Category.objects.create(name='Footwear')
+        self.product = Product.objects.create(
+            category=category, name='Shoe', description="Test product", price=Decimal('10.00')
+        )
+        self.orders = []
+        for _ in range(3):
+            order = Order.objects.create(user=self.customer, total=Decimal('20.00'), **CHECKOUT)
+            for _ in range(2):
+                OrderItem.objects.create(
+                    order=order, product=self.product, price=Decimal('10.00'), quantity=1,
+                    product_name='Shoe', category_name='Footwear',
+                )
+            self.orders.append(order)
+
+    def serialize_orders(self, query):
+        serializer = OrderSerializer(many=True, context={'request': request_for(query)})
+        return optimize_queryset(Order.objects.order_by('pk'), serializer), serializer
+
+    def test_nested_fields_and_exclude_paths(self):
+        self.client.force_authenticate(self.customer)
+        order_id = self.orders[0].pk
+        response = self.client.get(f'/api/orders/{order_id}/?fields=id,items.quantity,items.product.name')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'id': order_id, 'items': [{'quantity': 1, 'product': {'name': 'Shoe'}}] * 2,
+        })
+
+        response = self.client.get(f'/api/orders/{order_id}/?exclude=email,items.product.image,items.price')
+        self.assertNotIn('email', response.data)
+        self.assertIn('full_name', response.data)
+        item = response.data['items'][0]
+        self.assertEqual(set(item), {'id', 'product', 'quantity'})
+        self.assertEqual(set(item['product']), {'id', 'name', 'category_name'})
+
+    def test_writes_ignore_fieldsets(self):
+        self.client.force_authenticate(self.admin)
+        url = f'/api/products/admin/products/{self.product.pk}/?fields=id'
+        response = self.client.patch(url, {'name': 'Boot'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Boot')
+        self.assertIn('description', response.data)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).name, 'Boot')
+
+    def test_only_defers_unrendered_columns(self):
+        serializer = OrderSerializer(many=True, context={'request': request_for('?fields=id,total')})
+        order = optimize_queryset(Order.objects.all(), serializer).first()
+        deferred = order.get_deferred_fields()
+        self.assertNotIn('total', deferred)
+        self.assertTrue({'full_name', 'email', 'address'} <= deferred)
+
+    def test_prefetch_pushes_the_fieldset_down(self):
+        with self.assertNumQueries(1 + len(self.orders)):
+            for order in Order.objects.order_by('pk'):
+                list(order.items.all())
+
+        queryset, _ = self.serialize_orders('?fields=id,items.quantity')
+        with CaptureQueriesContext(connection) as queries:
+            orders = list(queryset)
+            items = [item for order in orders for item in order.items.all()]
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(len(items), 6)
+        # The prefetch only reads what the items render plus the link back to the order
+        self.assertNotIn('product_name', queries[1]['sql'])
+        self.assertIn('product_name', items[0].get_deferred_fields())
+
+        queryset, serializer = self.serialize_orders('?fields=id,items.product.name')
+        with self.assertNumQueries(2):
+            data = serializer.to_representation(queryset)
+        self.assertEqual(data[0]['items'][0]['product'], {'name': 'Shoe'})
+
+    def test_method_field_and_whole_source_load_every_column(self):
+        for serializer_class in (ProductWithMethodSerializer, ProductAsWholeSerializer):
+            with self.subTest(serializer_class.__name__):
+                serializer = serializer_class(many=True, context={'request': request_for()})
+                product = optimize_queryset(Product.objects.all(), serializer).get()
+                self.assertEqual(product.get_deferred_fields(), set())
+
+        serializer = ProductWithMethodSerializer(many=True, context={'request': request_for('?fields=id')})
+        product = optimize_queryset(Product.objects.all(), serializer).get()
+        self.assertIn('description', product.get_deferred_fields())
+
+
+class WarmUpTests(TestCase):
+    def setUp(self):
+        duration = mock.patch.object(warmup, 'last_duration', None)
+        duration.start()
+        self.addCleanup(duration.stop)
+
+    @override_settings(WARMUP_ENABLED=True)
+    def test_failing_step_does_not_stop_the_rest(self):
+        ran = []
+
+        def build_serializers():
+            raise RuntimeError("no database")
+
+        with mock.patch.object(warmup, 'build_serializers', build_serializers), \
+                mock.patch.object(warmup, 'render_hot_catalog', lambda: ran.append('render_hot_catalog')), \
+                mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            warmup.warm_up()
+        self.assertIn("Warm-up error in build_serializers: no database", stdout.getvalue())
+        self.assertEqual(ran, ['render_hot_catalog'])
+        self.assertIsNotNone(warmup.last_duration)
+
+    @override_settings(WARMUP_ENABLED=False)
+    def test_disabled_warm_up_does_nothing(self):
+        with mock.patch.object(warmup, 'load_api_settings') as load_api_settings:
+            warmup.warm_up()
+        load_api_settings.assert_not_called()
+        self.assertIsNone(warmup.last_duration)
+
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   encodings.aliases
+import time:       300 |        420 | encodings
+import time:      2000 |      95000 | django
+import time:       500 |        800 |   django.utils
+import time:       900 |      40000 | ppg_backend.wsgi
+Traceback line that is not an import
+"""
+
+
+class StartupReportTests(TestCase):
+    def run_report(self, stdout, *args, returncode=0):
+        completed = subprocess.CompletedProcess([], returncode, stdout=stdout, stderr=IMPORTTIME)
+        output = io.StringIO()
+        with mock.patch.object(startup_report.subprocess, 'run', return_value=completed):
+            call_command('startup_report', *args, stdout=output)
+        return output.getvalue()
+
+    def test_parses_importtime_output(self):
+        imports, other = startup_report.Command().parse_importtime(IMPORTTIME)
+        self.assertEqual(imports, [
+            ('encodings.aliases', 120, 1), ('encodings', 420, 0), ('django', 95000, 0),
+            ('django.utils', 800, 1), ('ppg_backend.wsgi', 40000, 0),
+        ])
+        self.assertEqual(other, ['Traceback line that is not an import'])
+
+    def test_reports_top_level_imports_and_timings(self):
+        output = self.run_report('startup 0.5 0.125\n', '--budget-ms', '1000', '--top', '2')
+        lines = output.splitlines()
+        self.assertEqual([line.split()[-1] for line in lines[1:3]], ['django', 'ppg_backend.wsgi'])
+        self.assertIn("Imports     375.0 ms", output)
+        self.assertIn("Warm-up     125.0 ms", output)
+        self.assertIn("Startup is within budget", output)
+
+    def test_over_budget_or_failed_start_is_an_error(self):
+        with self.assertRaisesMessage(CommandError, "over the 100 ms budget"):
+            self.run_report('startup 0.5 0.125\n', '--budget-ms', '100')
+        with self.assertRaisesMessage(CommandError, "Traceback line that is not an import"):
+            self.run_report('', returncode=1)
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Footwear')
+        self.product = Product.objects.create(
+            category=category, name='Shoe', description="Test product", price=Decimal('10.00')
+        )
+        self.url = f'/api/products/products/{self.product.pk}/'
+
+    def test_off_under_the_test_runner(self):
+        self.assertNotIn('X-Query-Count', APIClient().get(self.url))
+
+    @override_settings(QUERY_BUDGET_ENABLED=True)
+    def test_over_budget_request_is_logged(self):
+        client = APIClient()
+        with self.assertNoLogs('ppg_backend.query_budget'):
+            response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        count = int(response['X-Query-Count'])
+
+        with mock.patch.object(ProductDetailView, 'query_budget', count - 1), \
+                self.assertLogs('ppg_backend.query_budget', 'WARNING') as logs:
+            client.get(self.url)
+        [message] = logs.output
+        self.assertIn(f"GET {self.url} ran {count} queries: over budget of {count - 1}", message)
+
+    @override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_MODE='raise')
+    def test_raise_mode_fails_the_request(self):
+        with mock.patch.object(ProductDetailView, 'query_budget', 0):
+            with self.assertRaisesMessage(QueryBudgetExceeded, "over budget of 0"):
+                APIClient().get(self.url)
+
+    def test_fingerprint_collapses_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x''y' AND n > 10"),
+            fingerprint("SELECT *  FROM t WHERE id IN (%s, %s) AND name = 'z' AND n > 2"),
+        )
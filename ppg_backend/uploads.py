@@ -0,0 +1,86 @@
+# ppg_backend/uploads.py
+"""
+Image uploads that go straight to disk.
+
+``StreamingImageUploadHandler`` writes multipart file data to a temporary
+file chunk by chunk, hashing it on the way, so no upload is ever held in
+worker memory. The first bytes must look like a JPEG, PNG, GIF or WebP
+image and the total is capped at IMAGE_UPLOAD_MAX_SIZE; either failure
+aborts the parse with a 400 before the rest of the body is read.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+# Bytes needed to recognise every supported format
+IMAGE_HEADER_SIZE = 12
+
+
+def sniff_image(header):
+    """Return the file extension for an image ``header``, or None if it is not a supported image."""
+    if header.startswith(b'\xff\xd8\xff'):
+        return '.jpg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return '.png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return '.gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return '.webp'
+    return None
+
+
+def check_upload_size(size):
+    if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise MultiPartParserError(f"Image uploads are limited to {settings.IMAGE_UPLOAD_MAX_SIZE} bytes")
+
+
+class HashedTemporaryFile(File):
+    """A file on local disk whose SHA-256 is already known, so storage can move it into place."""
+
+    def __init__(self, path, name, sha256):
+        super().__init__(open(path, 'rb'), name=name)
+        self.path = path
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.path
+
+
+class StreamingImageUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.header = b''
+        self.received = 0
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        check_upload_size(self.received)
+        if len(self.header) < IMAGE_HEADER_SIZE:
+            self.header += raw_data[:IMAGE_HEADER_SIZE - len(self.header)]
+            if len(self.header) >= IMAGE_HEADER_SIZE:
+                self.check_header()
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        self.check_header()
+        upload = super().file_complete(file_size)
+        # ContentAddressedStorage moves the temp file into place instead of hashing it again
+        upload.sha256 = self.hasher.hexdigest()
+        return upload
+
+    def check_header(self):
+        if sniff_image(self.header) is None:
+            raise MultiPartParserError(f"{self.file_name} is not a JPEG, PNG, GIF or WebP image")
+
+
+class StreamingUploadMixin:
+    """View mixin that parses multipart uploads with StreamingImageUploadHandler."""
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [StreamingImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from .views import DashboardView, serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,9 +11,10 @@ urlpatterns = [
     path('api/products/', include('products.urls')),
     path('api/cart/', include('cart.urls')),
     path('api/orders/', include('orders.urls')),
+    path('api/admin/dashboard/', DashboardView.as_view(), name='admin-dashboard'),
 ]
 
 # Serve media files during development
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
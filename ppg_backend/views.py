@@ -0,0 +1,43 @@
+# ppg_backend/views.py
+from django.conf import settings
+from django.views.static import serve
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from accounts.views import IsAdminUser
+from . import counters
+from .storage import is_content_addressed
+
+
+def serve_media(request, path):
+    """Serve a file from MEDIA_ROOT, marking content-addressed files as immutable.
+
+    Mirrors the header a reverse proxy should add for the same paths in production.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_content_addressed(path):
+        response.headers['Cache-Control'] = f"public, max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}, immutable"
+    return response
+
+
+class DashboardView(APIView):
+    """Admin dashboard totals, read from the counters table in one query - admin only"""
+    permission_classes = [IsAdminUser]
+    query_budget = 1
+
+    # Orders still to be delivered; their totals are revenue not yet collected
+    PENDING_STATUSES = ('PENDING', 'PROCESSING', 'SHIPPED')
+
+    def get(self, request):
+        values = counters.read_all()
+        orders = {status: int(values.get(f"orders.{status}", 0)) for status in counters.ORDER_STATUSES}
+        return Response({
+            "orders": {**orders, "total": sum(orders.values())},
+            "revenue": {
+                "pending": sum(values.get(f"revenue.{status}", 0) for status in self.PENDING_STATUSES),
+                "delivered": values.get('revenue.DELIVERED', 0),
+            },
+            "products": {"total": int(values.get('products.total', 0)),
+                         "active": int(values.get('products.active', 0))},
+            "users": {"total": int(values.get('users.total', 0)), "active": int(values.get('users.active', 0))},
+        })
@@ -0,0 +1,80 @@
+# ppg_backend/warmup.py
+"""
+Pay a new worker's one-off startup costs before it takes traffic.
+
+``wsgi.py`` and ``asgi.py`` call ``warm_up()`` once the application is built.
+It populates the URL resolvers, loads the DRF classes named in settings,
+builds the fields of every routed view's serializer (ModelSerializer field
+introspection is the slow part of a first request), and renders the
+category list and newest products so their rows land in the serializer
+cache. Database connections opened here are closed again, so a server that
+preloads the app before forking never shares one between workers.
+"""
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.settings import api_settings
+
+# DRF settings that name classes, imported on first use
+API_CLASS_SETTINGS = (
+    'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_AUTHENTICATION_CLASSES',
+    'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_THROTTLE_CLASSES', 'DEFAULT_CONTENT_NEGOTIATION_CLASS',
+    'DEFAULT_METADATA_CLASS', 'DEFAULT_VERSIONING_CLASS', 'EXCEPTION_HANDLER',
+)
+
+# Seconds the last warm_up() took, for startup_report
+last_duration = None
+
+
+def warm_up():
+    """Warm this process; failures are reported but never stop the worker from starting."""
+    global last_duration
+    if not settings.WARMUP_ENABLED:
+        return
+    start = time.perf_counter()
+    for step in (load_api_settings, build_serializers, render_hot_catalog):
+        try:
+            step()
+        except Exception as warmup_error:
+            print(f"Warm-up error in {step.__name__}: {warmup_error}")
+    connections.close_all()
+    last_duration = time.perf_counter() - start
+
+
+def load_api_settings():
+    for name in API_CLASS_SETTINGS:
+        getattr(api_settings, name)
+
+
+def routed_views(patterns=None):
+    """Yield the class of every class-based view in the URLconf."""
+    if patterns is None:
+        resolver = get_resolver()
+        resolver.reverse_dict  # Builds the reverse lookup tables of every include
+        patterns = resolver.url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from routed_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, 'view_class', None) or getattr(pattern.callback, 'cls', None)
+            if view_class is not None:
+                yield view_class
+
+
+def build_serializers():
+    built = set()
+    for view_class in routed_views():
+        serializer_class = getattr(view_class, 'serializer_class', None)
+        if serializer_class is not None and serializer_class not in built:
+            serializer_class().fields
+            built.add(serializer_class)
+
+
+def render_hot_catalog():
+    from products import snapshots
+
+    factory = snapshots.request_factory()
+    for path in (snapshots.category_list_path(), snapshots.newest_products_path()):
+        snapshots.render(path, factory)
@@ -1,7 +1,8 @@
 """
 WSGI config for ppg_backend project.
 
-It exposes the WSGI callable as a module-level variable named ``application``.
+It exposes the WSGI callable as a module-level variable named ``application``,
+warmed up by ppg_backend.warmup before the server hands it any requests.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
@@ -14,3 +15,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ppg_backend.settings')
 
 application = get_wsgi_application()
+
+from ppg_backend.warmup import warm_up  # noqa: E402 (needs the app set up)
+
+warm_up()
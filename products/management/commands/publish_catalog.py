@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ppg_backend.middleware import brotli
+from products.snapshots import publish_all
+
+
+class Command(BaseCommand):
+    help = "Render the public catalog endpoints into pre-compressed static JSON files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--root', default=settings.CATALOG_SNAPSHOT_ROOT,
+            help=f"Directory to publish into (default {settings.CATALOG_SNAPSHOT_ROOT})",
+        )
+
+    def handle(self, *args, **options):
+        if brotli is None:
+            self.stderr.write(self.style.WARNING(
+                "Brotli is not installed: no .br snapshots will be written (pip install Brotli)"
+            ))
+        written, removed = publish_all(options['root'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Published catalog to {options['root']}: {written} snapshot(s) updated, {removed} removed"
+        ))
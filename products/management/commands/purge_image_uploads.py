@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from products.models import ImageUpload
+
+
+class Command(BaseCommand):
+    help = "Delete resumable image uploads that were abandoned or never attached to a product or category"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=settings.IMAGE_UPLOAD_SESSION_TTL_HOURS,
+            help=f"Delete sessions idle for this many hours (default {settings.IMAGE_UPLOAD_SESSION_TTL_HOURS})",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        deleted = 0
+        for upload in ImageUpload.objects.filter(updated_at__lt=cutoff).iterator():
+            # A finished upload's image is queued for process_media_deletions when the row goes
+            upload.discard_part()
+            upload.delete()
+            deleted += 1
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} stale upload session(s)"))
@@ -0,0 +1,44 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from products.models import PATH_STEP_WIDTH, Category, Product, path_ids
+
+
+class Command(BaseCommand):
+    help = "Recompute category paths, depths and subtree product counts from scratch"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            categories = {category.pk: category for category in Category.objects.select_for_update()}
+            children = {}
+            for category in categories.values():
+                children.setdefault(category.parent_id, []).append(category)
+
+            # Walk down from the roots so every parent's path is set before its children
+            stack = [(root, '', 0) for root in children.get(None, [])]
+            while stack:
+                category, parent_path, depth = stack.pop()
+                category.path = f"{parent_path}{category.pk:0{PATH_STEP_WIDTH}d}/"
+                category.depth = depth
+                category.product_count = 0
+                stack.extend((child, category.path, depth + 1) for child in children.get(category.pk, []))
+
+            direct_counts = Counter(dict(
+                Product.objects.filter(is_active=True).values_list('category_id').annotate(count=Count('id'))
+            ))
+            for category_id, count in direct_counts.items():
+                for ancestor_id in path_ids(categories[category_id].path):
+                    categories[ancestor_id].product_count += count
+
+            now = timezone.now()
+            for category in categories.values():
+                category.updated_at = now
+            Category.objects.bulk_update(
+                categories.values(), ['path', 'depth', 'product_count', 'updated_at'], batch_size=500
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the tree for {len(categories)} categories"))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_category_updated_at_alter_category_image_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copurchases', to='products.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='copurchased_with', to='products.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-count'], name='copurchase_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'related'), name='unique_copurchase_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_paths(apps, schema_editor):
+    # Every existing category is a root; its subtree count is its own active products
+    Category = apps.get_model('products', 'Category')
+    categories = list(Category.objects.annotate(
+        active_products=Count('products', filter=Q(products__is_active=True))
+    ))
+    for category in categories:
+        category.path = f"{category.pk:06d}/"
+        category.depth = 0
+        category.product_count = category.active_products
+    Category.objects.bulk_update(categories, ['path', 'depth', 'product_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_copurchase'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='products.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-19 18:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_recently_viewed_product'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='products.category'),
+        ),
+    ]
@@ -1,13 +1,61 @@
 # products/models.py
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.utils import timezone
+from PIL import Image
+
+from ppg_backend.uploads import HashedTemporaryFile
+
+# Width of one zero-padded id in Category.path
+PATH_STEP_WIDTH = 6
+
+
+def path_ids(path):
+    """Category ids along ``path``, root first: ``"000001/000004/"`` -> ``[1, 4]``."""
+    return [int(step) for step in path.split('/') if step]
+
+
+def subtree_upper_bound(path):
+    # '0' sorts right after '/', so every path below ``path`` is less than this
+    return path[:-1] + '0'
+
+
+class CategoryQuerySet(models.QuerySet):
+    def subtree(self, path):
+        """The category at ``path`` and all of its descendants, as one indexed range scan."""
+        return self.filter(path__gte=path, path__lt=subtree_upper_bound(path))
+
+    def adjust_product_count(self, category_id, delta):
+        """Add ``delta`` to the product count of ``category_id`` and all of its ancestors."""
+        path = self.filter(pk=category_id).values_list('path', flat=True).first()
+        if path and delta:
+            self.filter(pk__in=path_ids(path)).update(
+                product_count=F('product_count') + delta, updated_at=timezone.now()
+            )
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     image = models.ImageField(upload_to='categories/', null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    # PROTECT: deleting a category must never take its subcategories and their products with it
+    parent = models.ForeignKey('self', on_delete=models.PROTECT, null=True, blank=True, related_name='children')
+    # Zero-padded ids from the root down to this category, e.g. "000001/000004/"
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Active products in this category and its subcategories, kept current by products/signals.py
+    product_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CategoryQuerySet.as_manager()
     
     def __str__(self):
         return self.name
@@ -15,6 +63,47 @@ class Category(models.Model):
     class Meta:
         verbose_name_plural = 'Categories'
 
+    def build_path(self):
+        step = f"{self.pk:0{PATH_STEP_WIDTH}d}/"
+        if self.parent_id is None:
+            return step, 0
+        parent = Category.objects.only('path', 'depth').get(pk=self.parent_id)
+        return parent.path + step, parent.depth + 1
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'parent' not in update_fields:
+            return super().save(*args, **kwargs)
+        if self.pk is None:
+            super().save(*args, **kwargs)
+            self.path, self.depth = self.build_path()
+            Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+            return
+
+        previous = Category.objects.filter(pk=self.pk).values('path', 'depth', 'product_count').first()
+        self.path, self.depth = self.build_path()
+        if previous is not None:
+            self.product_count = previous['product_count']
+        super().save(*args, **kwargs)
+        if previous is not None and previous['path'] and previous['path'] != self.path:
+            self.move_subtree(previous['path'], previous['depth'])
+
+    def move_subtree(self, old_path, old_depth):
+        """Rewrite descendant paths after a parent change and move the product count between ancestors."""
+        now = timezone.now()
+        Category.objects.subtree(old_path).exclude(pk=self.pk).update(
+            path=Concat(Value(self.path), Substr('path', len(old_path) + 1)),
+            depth=F('depth') + (self.depth - old_depth),
+            updated_at=now,
+        )
+        if self.product_count:
+            Category.objects.filter(pk__in=path_ids(old_path)[:-1]).update(
+                product_count=F('product_count') - self.product_count, updated_at=now
+            )
+            Category.objects.filter(pk__in=path_ids(self.path)[:-1]).update(
+                product_count=F('product_count') + self.product_count, updated_at=now
+            )
+
 class Product(models.Model):
     PRODUCT_TYPE_CHOICES = (
         ('CLOTHING', 'Clothing'),
@@ -33,4 +122,135 @@ class Product(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class CoPurchaseManager(models.Manager):
+    def record_order(self, product_ids):
+        """Count one more order containing every pair of ``product_ids``."""
+        product_ids = sorted(set(product_ids))
+        if len(product_ids) < 2:
+            return
+        self.bulk_create(
+            [CoPurchase(product_id=a, related_id=b) for a in product_ids for b in product_ids if a != b],
+            ignore_conflicts=True,
+        )
+        # Every stored pair among these ids belongs to this order, so one UPDATE covers them all
+        self.filter(product_id__in=product_ids, related_id__in=product_ids).update(count=F('count') + 1)
+
+    def top_related(self, product_id, limit):
+        """The ``limit`` active products most often bought with ``product_id``, best first."""
+        return (
+            Product.objects.filter(copurchased_with__product_id=product_id, is_active=True)
+            .select_related('category')
+            .order_by('-copurchased_with__count')[:limit]
+        )
+
+
+class CoPurchase(models.Model):
+    """Number of orders that contained both products; each pair is stored in both directions."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='copurchases')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='copurchased_with')
+    count = models.PositiveIntegerField(default=0)
+
+    objects = CoPurchaseManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related'], name='unique_copurchase_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['product', '-count'], name='copurchase_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.related_id} x {self.count}"
+
+
+class ImageUpload(models.Model):
+    """A chunked, resumable image upload session for large product or category images.
+
+    Chunks are appended to a part file under IMAGE_UPLOAD_SESSION_DIR; once
+    ``received`` reaches ``size`` the file is moved into media storage and its
+    name is kept in ``image`` until a product or category picks it up.
+    """
+    FOLDER_CHOICES = (
+        ('products', 'Product image'),
+        ('categories', 'Category image'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='image_uploads')
+    folder = models.CharField(max_length=20, choices=FOLDER_CHOICES, default='products')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    image = models.ImageField(upload_to='products/', max_length=255, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.received}/{self.size} bytes)"
+
+    @property
+    def complete(self):
+        return bool(self.image)
+
+    @property
+    def part_path(self):
+        return os.path.join(settings.IMAGE_UPLOAD_SESSION_DIR, f"{self.id}.part")
+
+    def append(self, stream, length, prefix=b'', chunk_size=64 * 1024):
+        """Append ``prefix`` plus the rest of ``length`` bytes read from ``stream`` to the part file."""
+        os.makedirs(settings.IMAGE_UPLOAD_SESSION_DIR, exist_ok=True)
+        with open(self.part_path, 'ab') as part:
+            part.truncate(self.received)  # Drop the tail of a chunk that was cut off mid-write
+            part.write(prefix)
+            remaining = length - len(prefix)
+            while remaining:
+                data = stream.read(min(chunk_size, remaining))
+                if not data:
+                    break
+                part.write(data)
+                remaining -= len(data)
+        self.received += length - remaining
+        return remaining == 0
+
+    def finish(self):
+        """Verify the completed part file and move it into media storage under its content hash."""
+        with Image.open(self.part_path) as image:
+            image.verify()  # Raises on truncated or corrupt data
+        hasher = hashlib.sha256()
+        with open(self.part_path, 'rb') as part:
+            for block in iter(lambda: part.read(1024 * 1024), b''):
+                hasher.update(block)
+
+        upload = HashedTemporaryFile(self.part_path, self.filename, hasher.hexdigest())
+        try:
+            self.image.name = default_storage.save(f"{self.folder}/{self.filename}", upload)
+        finally:
+            upload.close()
+        self.discard_part()
+
+    def discard_part(self):
+        try:
+            os.remove(self.part_path)
+        except FileNotFoundError:
+            pass
+
+
+class RecentlyViewedProduct(models.Model):
+    """When a user last viewed a product; written in batches by products.recently_viewed."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='recently_viewed')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    viewed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='unique_recently_viewed_product'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-viewed_at'], name='recently_viewed_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} viewed {self.product_id}"
@@ -0,0 +1,133 @@
+# products/recently_viewed.py
+"""
+Write-behind recording of the products each user views.
+
+A view updates the user's bounded list in the cache straight away, which is
+what the recently viewed endpoint reads, and joins this process's pending
+batch. The batch is written with one upsert per flush, from a background
+thread every RECENTLY_VIEWED_FLUSH_INTERVAL seconds or as soon as
+RECENTLY_VIEWED_FLUSH_SIZE distinct views are waiting, and once more when the
+process exits. Repeat views of a product between flushes collapse into one row.
+An interval of 0 writes every view through at once; tests that record views
+use it, so nothing is left pending for the exit flush to write after the
+test database is gone.
+
+The database copy is trimmed to the same bound and refills the cache after
+it expires or is evicted. Views still pending when a process is killed are
+lost; this is a convenience list, not an audit trail.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from django.utils import timezone
+
+from .models import Product, RecentlyViewedProduct
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(user_id):
+    return f"recently-viewed:{user_id}"
+
+
+class RecentlyViewedBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}  # (user_id, product_id) -> viewed_at
+        self.flusher = None
+
+    @property
+    def cache(self):
+        return caches[settings.RECENTLY_VIEWED_CACHE_ALIAS]
+
+    def record(self, user_id, product_id):
+        viewed_at = timezone.now()
+        # Two requests from one user can race here and drop a view from the
+        # cached list; the database batch still gets it
+        product_ids = self.recent(user_id)
+        product_ids = [product_id] + [pk for pk in product_ids if pk != product_id]
+        self.cache.set(cache_key(user_id), product_ids[:settings.RECENTLY_VIEWED_LIMIT],
+                       settings.RECENTLY_VIEWED_CACHE_TIMEOUT)
+
+        if not settings.RECENTLY_VIEWED_FLUSH_INTERVAL:
+            with self.lock:
+                self.pending[(user_id, product_id)] = viewed_at
+            self.flush()
+            return
+
+        with self.lock:
+            self.pending[(user_id, product_id)] = viewed_at
+            full = len(self.pending) >= settings.RECENTLY_VIEWED_FLUSH_SIZE
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self.run_flusher, daemon=True)
+                self.flusher.start()
+        if full:
+            threading.Thread(target=self.flush_in_thread, daemon=True).start()
+
+    def recent(self, user_id):
+        """Product ids the user viewed most recently, newest first."""
+        product_ids = self.cache.get(cache_key(user_id))
+        if product_ids is None:
+            product_ids = list(
+                RecentlyViewedProduct.objects.filter(user_id=user_id).order_by('-viewed_at')
+                .values_list('product_id', flat=True)[:settings.RECENTLY_VIEWED_LIMIT]
+            )
+            self.cache.set(cache_key(user_id), product_ids, settings.RECENTLY_VIEWED_CACHE_TIMEOUT)
+        return product_ids
+
+    def flush(self):
+        """Upsert every pending view and trim the touched users to the list bound."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return 0
+        # A product or user deleted since the view would fail the whole upsert on its foreign key
+        user_ids = set(get_user_model().objects.filter(
+            pk__in={user_id for user_id, _ in pending}).values_list('pk', flat=True))
+        product_ids = set(Product.objects.filter(
+            pk__in={product_id for _, product_id in pending}).values_list('pk', flat=True))
+        pending = {
+            key: viewed_at for key, viewed_at in pending.items() if key[0] in user_ids and key[1] in product_ids
+        }
+        if not pending:
+            return 0
+        RecentlyViewedProduct.objects.bulk_create(
+            [
+                RecentlyViewedProduct(user_id=user_id, product_id=product_id, viewed_at=viewed_at)
+                for (user_id, product_id), viewed_at in pending.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['viewed_at'],
+        )
+        for user_id in {user_id for user_id, _ in pending}:
+            keep = (
+                RecentlyViewedProduct.objects.filter(user_id=user_id).order_by('-viewed_at')
+                .values_list('id', flat=True)[:settings.RECENTLY_VIEWED_LIMIT]
+            )
+            RecentlyViewedProduct.objects.filter(user_id=user_id).exclude(id__in=list(keep)).delete()
+        return len(pending)
+
+    def flush_in_thread(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Recently viewed flush failed")
+        finally:
+            connections.close_all()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(settings.RECENTLY_VIEWED_FLUSH_INTERVAL)
+            self.flush_in_thread()
+
+
+recently_viewed = RecentlyViewedBuffer()
+# Graceful restarts keep the views recorded since the last flush
+atexit.register(recently_viewed.flush_in_thread)
@@ -1,26 +1,63 @@
 # products/serializers.py - Updated with image handling
 from rest_framework import serializers
-from .models import Category, Product
+from ppg_backend.fieldsets import SparseFieldsetMixin
+from ppg_backend.serializer_cache import CachedListSerializer, CachedRepresentationMixin
+from .models import Category, ImageUpload, Product
 
-class ProductSerializer(serializers.ModelSerializer):
+
+def completed_uploads():
+    return ImageUpload.objects.exclude(image='').exclude(image__isnull=True)
+
+
+class ImageUploadField(serializers.PrimaryKeyRelatedField):
+    """ID of a completed resumable upload, used instead of sending the file inline.
+
+    Only the requesting admin's own uploads can be attached.
+    """
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return ImageUpload.objects.none()
+        return completed_uploads().filter(user=user)
+
+
+def take_image_upload(validated_data):
+    """Swap a finished resumable upload for the image name it produced."""
+    upload = validated_data.pop('image_upload', None)
+    if upload is not None:
+        validated_data['image'] = upload.image.name
+    return upload
+
+class ProductSerializer(CachedRepresentationMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     image = serializers.ImageField(required=False, allow_null=True)
+    image_upload = ImageUploadField(write_only=True, required=False)
+
+    # category_name is read through the relation, so the category's version is part of the cache key
+    required_columns = ('updated_at', 'category__updated_at')
     
     class Meta:
         model = Product
-        fields = ('id', 'name', 'description', 'price', 'image', 'category', 
+        fields = ('id', 'name', 'description', 'price', 'image', 'image_upload', 'category', 
                   'category_name', 'product_type', 'is_active', 'created_at')
+        list_serializer_class = CachedListSerializer
     
     def create(self, validated_data):
-        return Product.objects.create(**validated_data)
+        upload = take_image_upload(validated_data)
+        product = Product.objects.create(**validated_data)
+        if upload is not None:
+            upload.delete()
+        return product
     
     def update(self, instance, validated_data):
-        # Handle image update
+        upload = take_image_upload(validated_data)
+        # Handle image update. The old file is left in place: identical uploads
+        # share one content-addressed file, so the replaced name is queued for
+        # process_media_deletions, which removes it once unreferenced.
         image = validated_data.get('image', None)
         if image:
-            # Delete old image if it exists
-            if instance.image:
-                instance.image.delete(save=False)
             instance.image = image
         
         # Update other fields
@@ -29,30 +66,42 @@ class ProductSerializer(serializers.ModelSerializer):
                 setattr(instance, attr, value)
         
         instance.save()
+        if upload is not None:
+            upload.delete()
         return instance
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(CachedRepresentationMixin, SparseFieldsetMixin, serializers.ModelSerializer):
     image = serializers.ImageField(required=False, allow_null=True)
-    products_count = serializers.SerializerMethodField(read_only=True)
+    image_upload = ImageUploadField(write_only=True, required=False)
+    # Active products in the category and all of its subcategories
+    products_count = serializers.IntegerField(source='product_count', read_only=True)
     
     class Meta:
         model = Category
-        fields = ('id', 'name', 'image', 'is_active', 'created_at', 'updated_at', 'products_count')
-    
-    def get_products_count(self, obj):
-        return obj.products.filter(is_active=True).count()
+        fields = ('id', 'name', 'image', 'image_upload', 'parent', 'depth', 'is_active', 'created_at', 'updated_at', 'products_count')
+        read_only_fields = ('depth',)
+        list_serializer_class = CachedListSerializer
+
+    def validate_parent(self, parent):
+        if parent is not None and self.instance is not None and parent.path.startswith(self.instance.path):
+            raise serializers.ValidationError("A category cannot be moved under itself or its subcategories")
+        return parent
     
     def create(self, validated_data):
-        return Category.objects.create(**validated_data)
+        upload = take_image_upload(validated_data)
+        category = Category.objects.create(**validated_data)
+        if upload is not None:
+            upload.delete()
+        return category
     
     def update(self, instance, validated_data):
-        # Handle image update
+        upload = take_image_upload(validated_data)
+        # Handle image update. The old file is left in place: identical uploads
+        # share one content-addressed file, so the replaced name is queued for
+        # process_media_deletions, which removes it once unreferenced.
         image = validated_data.get('image', None)
         if image:
-            # Delete old image if it exists
-            if instance.image:
-                instance.image.delete(save=False)
             instance.image = image
         
         # Update other fields
@@ -61,4 +110,6 @@ class CategorySerializer(serializers.ModelSerializer):
                 setattr(instance, attr, value)
         
         instance.save()
+        if upload is not None:
+            upload.delete()
         return instance
\ No newline at end of file
@@ -0,0 +1,165 @@
+# products/signals.py
+"""
+Keep derived catalog data in step with product and category changes.
+
+Subtree product counts (which bump the category's ``updated_at``, moving
+it and its products to fresh serializer cache keys) and dashboard counters
+follow every product save, and the affected catalog snapshots are
+republished when auto-publish is on. Publishing renders every affected
+endpoint, so it runs on a background thread once the transaction commits
+rather than in the request that made the change; paths still waiting when
+the process exits are left for the next ``publish_catalog`` run.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Category, Product
+from ppg_backend import counters
+from . import snapshots
+
+logger = logging.getLogger(__name__)
+_local = threading.local()
+
+
+class SnapshotPublisher:
+    """Publishes queued snapshot paths on one background thread, merging queued batches."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.wakeup = threading.Event()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.worker = None
+
+    def submit(self, paths):
+        with self.lock:
+            self.pending.update(paths)
+            self.idle.clear()
+            if self.worker is None:
+                self.worker = threading.Thread(target=self.run, daemon=True)
+                self.worker.start()
+        self.wakeup.set()
+
+    def publish_pending(self):
+        with self.lock:
+            paths, self.pending = self.pending, set()
+        try:
+            if paths:
+                snapshots.publish(paths)
+        except Exception:
+            logger.exception("Catalog snapshot publish failed")
+        finally:
+            with self.lock:
+                if not self.pending:
+                    self.idle.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            try:
+                self.publish_pending()
+            finally:
+                connections.close_all()
+
+    def wait(self, timeout=None):
+        """Block until everything submitted so far is published; returns False on timeout."""
+        return self.idle.wait(timeout)
+
+
+publisher = SnapshotPublisher()
+
+
+def queue_paths(paths):
+    """Collect snapshot paths and publish them after the surrounding transaction commits.
+
+    Several saves in one transaction share a single publish: the first
+    callback to run takes every queued path and the rest find nothing left.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = set()
+    pending.update(paths)
+    transaction.on_commit(_publish_pending)
+
+
+def _publish_pending():
+    paths = getattr(_local, 'pending', None)
+    _local.pending = None
+    if not paths:
+        return
+    if settings.CATALOG_SNAPSHOT_BACKGROUND_PUBLISH:
+        publisher.submit(paths)
+        return
+    try:
+        snapshots.publish(paths)
+    except Exception:
+        logger.exception("Catalog snapshot publish failed")
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_category(sender, instance, **kwargs):
+    previous = None
+    if instance.pk:
+        previous = Product.objects.filter(pk=instance.pk).values_list('category_id', 'is_active').first()
+    instance._previous_category_id, instance._previous_is_active = previous or (None, False)
+
+
+@receiver(post_save, sender=Product)
+def update_category_counts(sender, instance, **kwargs):
+    # Subtree product counts change by one at a time, along the category's path
+    previous = (instance._previous_category_id, instance._previous_is_active)
+    current = (instance.category_id, instance.is_active)
+    if previous == current:
+        return
+    if instance._previous_is_active:
+        Category.objects.adjust_product_count(instance._previous_category_id, -1)
+    if instance.is_active:
+        Category.objects.adjust_product_count(instance.category_id, 1)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_category_counts(sender, instance, **kwargs):
+    if instance.is_active:
+        Category.objects.adjust_product_count(instance.category_id, -1)
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created, **kwargs):
+    counters.adjust(counters.active_deltas(
+        'products', created, False, instance._previous_is_active, instance.is_active
+    ))
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    counters.adjust(counters.active_deltas('products', False, True, instance.is_active, False))
+
+
+# Deletes are handled before the rows go, while their related rows can still be read
+@receiver(post_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    if settings.CATALOG_SNAPSHOT_AUTO_PUBLISH:
+        category_ids = {instance.category_id, getattr(instance, '_previous_category_id', None)}
+        queue_paths(snapshots.paths_for_product(instance.pk, category_ids))
+
+
+@receiver(pre_save, sender=Category)
+def remember_previous_path(sender, instance, **kwargs):
+    instance._previous_path = None
+    if instance.pk and settings.CATALOG_SNAPSHOT_AUTO_PUBLISH:
+        instance._previous_path = Category.objects.filter(pk=instance.pk).values_list('path', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    if settings.CATALOG_SNAPSHOT_AUTO_PUBLISH:
+        queue_paths(snapshots.paths_for_category(instance.pk, getattr(instance, '_previous_path', None)))
@@ -0,0 +1,177 @@
+# products/snapshots.py
+"""
+Static snapshots of the public catalog endpoints.
+
+Each public catalog URL is rendered through its normal view and written to
+``CATALOG_SNAPSHOT_ROOT/<url path>/index.json`` together with pre-compressed
+``.gz`` and ``.br`` copies, so a reverse proxy can answer catalog reads
+straight from disk. Files are replaced atomically and only rewritten when
+their content changed. URLs that stop existing (a deactivated product, say)
+have their files removed so the proxy falls through to Django.
+
+The related-product list on product detail also moves with new orders; those
+changes are picked up by the next full ``publish_catalog`` run.
+"""
+import gzip
+import logging
+import os
+import tempfile
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from ppg_backend.middleware import brotli
+from .models import Category, CoPurchase, Product, path_ids
+
+INDEX_FILE = 'index.json'
+
+logger = logging.getLogger(__name__)
+_warned_no_brotli = False
+
+
+def category_list_path():
+    return reverse('category-list')
+
+
+def newest_products_path():
+    return reverse('newest-products')
+
+
+def category_products_path(category_id):
+    return reverse('category-products', kwargs={'category_id': category_id})
+
+
+def product_detail_path(product_id):
+    return reverse('product-detail', kwargs={'pk': product_id})
+
+
+def all_paths():
+    paths = [category_list_path(), newest_products_path()]
+    paths += [category_products_path(pk) for pk in Category.objects.filter(is_active=True).values_list('pk', flat=True)]
+    paths += [product_detail_path(pk) for pk in Product.objects.filter(is_active=True).values_list('pk', flat=True)]
+    return paths
+
+
+def with_ancestors(category_ids):
+    paths = Category.objects.filter(pk__in=category_ids).values_list('path', flat=True)
+    return {category_id for path in paths for category_id in path_ids(path)}
+
+
+def paths_for_product(product_id, category_ids):
+    """Snapshot URLs whose content depends on the product and the categories it was or is in."""
+    paths = {category_list_path(), newest_products_path(), product_detail_path(product_id)}
+    # Category product lists include subcategories, so every ancestor lists the product too
+    paths.update(category_products_path(category_id) for category_id in with_ancestors(category_ids))
+    # Products that list this one as frequently bought together
+    related_to = CoPurchase.objects.filter(related_id=product_id).values_list('product_id', flat=True)
+    paths.update(product_detail_path(pk) for pk in related_to)
+    return paths
+
+
+def paths_for_category(category_id, previous_path=None):
+    """Snapshot URLs that show the category or its name.
+
+    Pass the category's ``previous_path`` after a move: the ancestors it left
+    still list its products until their snapshots are republished.
+    """
+    paths = {category_list_path(), newest_products_path()}
+    ancestor_ids = with_ancestors([category_id]) | set(path_ids(previous_path or ''))
+    paths.update(category_products_path(pk) for pk in ancestor_ids)
+    product_ids = Product.objects.filter(category_id=category_id).values_list('pk', flat=True)
+    paths.update(product_detail_path(pk) for pk in product_ids)
+    return paths
+
+
+def render(path, factory):
+    """Render ``path`` through its view; returns the body, or None when it is not a 200."""
+    match = resolve(path)
+    response = match.func(factory.get(path), *match.args, **match.kwargs)
+    if hasattr(response, 'render'):
+        response.render()
+    return response.content if response.status_code == 200 else None
+
+
+def request_factory():
+    base_url = urlsplit(settings.CATALOG_SNAPSHOT_BASE_URL)
+    return RequestFactory(HTTP_HOST=base_url.netloc, secure=base_url.scheme == 'https')
+
+
+def publish(paths, root=None):
+    """Render and write the snapshots for ``paths``; returns ``(written, removed)`` counts."""
+    global _warned_no_brotli
+    root = root or settings.CATALOG_SNAPSHOT_ROOT
+    if brotli is None and not _warned_no_brotli:
+        # Say so once per process rather than leave the proxy quietly without .br copies
+        logger.warning("Brotli is not installed; catalog snapshots are published without .br copies")
+        _warned_no_brotli = True
+    factory = request_factory()
+    written = removed = 0
+    for path in sorted(set(paths)):
+        directory = snapshot_directory(root, path)
+        content = render(path, factory)
+        if content is None:
+            removed += remove_snapshot(directory)
+        else:
+            written += write_snapshot(directory, content)
+    return written, removed
+
+
+def publish_all(root=None):
+    """Publish every catalog URL and remove snapshots for URLs that no longer exist."""
+    root = root or settings.CATALOG_SNAPSHOT_ROOT
+    paths = all_paths()
+    written, removed = publish(paths, root)
+    keep = {snapshot_directory(root, path) for path in paths}
+    for directory, _, filenames in os.walk(root):
+        if INDEX_FILE in filenames and directory not in keep:
+            removed += remove_snapshot(directory)
+    return written, removed
+
+
+def snapshot_directory(root, path):
+    return os.path.join(root, *[part for part in path.split('/') if part])
+
+
+def write_snapshot(directory, content):
+    """Write ``content`` and its compressed variants; returns 1 if anything changed."""
+    target = os.path.join(directory, INDEX_FILE)
+    try:
+        with open(target, 'rb') as existing:
+            if existing.read() == content:
+                return 0
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(directory, exist_ok=True)
+    # Compressed copies first, so index.json never points a proxy at stale siblings
+    _write_atomic(target + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(target + '.br', brotli.compress(content, quality=11))
+    _write_atomic(target, content)
+    return 1
+
+
+def remove_snapshot(directory):
+    target = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(target):
+        return 0
+    for name in (target, target + '.gz', target + '.br'):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+    return 1
+
+
+def _write_atomic(target, content):
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.tmp-')
+    try:
+        with os.fdopen(descriptor, 'wb') as temp_file:
+            temp_file.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, target)
+    except BaseException:
+        os.remove(temp_path)
+        raise
@@ -1,3 +1,407 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from . import snapshots
+from .models import Category, ImageUpload, Product, RecentlyViewedProduct
+from .recently_viewed import RecentlyViewedBuffer
+from .signals import publisher
+
+
+def make_product(category, name='Shoe', is_active=True):
+    return Product.objects.create(
+        category=category, name=name, description="Test product", price=Decimal('10.00'), is_active=is_active
+    )
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), 'red').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        self.footwear = Category.objects.create(name='Footwear')
+        self.boots = Category.objects.create(name='Boots', parent=self.footwear)
+        self.hiking = Category.objects.create(name='Hiking', parent=self.boots)
+        self.bags = Category.objects.create(name='Bags')
+
+    def counts(self):
+        return dict(Category.objects.values_list('name', 'product_count'))
+
+    def test_paths_and_depths_follow_the_tree(self):
+        self.hiking.refresh_from_db()
+        self.assertEqual(self.hiking.depth, 2)
+        self.assertEqual(
+            self.hiking.path, f"{self.footwear.pk:06d}/{self.boots.pk:06d}/{self.hiking.pk:06d}/"
+        )
+        subtree = Category.objects.subtree(self.footwear.path).values_list('name', flat=True)
+        self.assertEqual(sorted(subtree), ['Boots', 'Footwear', 'Hiking'])
+
+    def test_product_counts_cover_the_subtree(self):
+        product = make_product(self.hiking)
+        make_product(self.boots, is_active=False)
+        self.assertEqual(self.counts(), {'Footwear': 1, 'Boots': 1, 'Hiking': 1, 'Bags': 0})
+
+        product.category = self.bags
+        product.save()
+        self.assertEqual(self.counts(), {'Footwear': 0, 'Boots': 0, 'Hiking': 0, 'Bags': 1})
+
+        product.is_active = False
+        product.save()
+        self.assertEqual(self.counts()['Bags'], 0)
+
+        product.is_active = True
+        product.save()
+        product.delete()
+        self.assertEqual(self.counts()['Bags'], 0)
+
+    def test_moving_a_subtree_rewrites_paths_and_counts(self):
+        make_product(self.hiking)
+        self.boots.parent = self.bags
+        self.boots.save()
+        self.hiking.refresh_from_db()
+        self.assertTrue(self.hiking.path.startswith(f"{self.bags.pk:06d}/"))
+        self.assertEqual(self.hiking.depth, 2)
+        self.assertEqual(self.counts(), {'Footwear': 0, 'Boots': 1, 'Hiking': 1, 'Bags': 1})
+
+    def test_products_by_category_includes_subcategories(self):
+        make_product(self.hiking, name='Trail boot')
+        make_product(self.bags, name='Tote')
+        response = APIClient().get(f'/api/products/categories/{self.footwear.pk}/products/')
+        self.assertEqual([product['name'] for product in response.data], ['Trail boot'])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AdminCategoryDetailViewTests(TestCase):
+    def setUp(self):
+        admin = CustomUser.objects.create_user(
+            'admin@example.com', 'pw', first_name='Ada', last_name='Admin', role='ADMIN'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.footwear = Category.objects.create(name='Footwear')
+        self.boots = Category.objects.create(name='Boots', parent=self.footwear)
+
+    def delete(self, category):
+        return self.client.delete(f'/api/products/admin/categories/{category.pk}/')
+
+    def test_refuses_to_delete_category_with_products_in_a_subcategory(self):
+        make_product(self.boots)
+        self.assertEqual(self.delete(self.footwear).status_code, 400)
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_refuses_to_delete_category_with_subcategories(self):
+        self.assertEqual(self.delete(self.footwear).status_code, 400)
+        self.assertTrue(Category.objects.filter(pk=self.boots.pk).exists())
+
+    def test_deletes_empty_leaf_category(self):
+        self.assertEqual(self.delete(self.boots).status_code, 204)
+        self.assertEqual(self.delete(self.footwear).status_code, 204)
+
+
+class ProductCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.category = Category.objects.create(name='Footwear')
+        self.product = make_product(self.category)
+
+    def category_names(self):
+        response = self.client.get(f'/api/products/categories/{self.category.pk}/products/')
+        return [product['category_name'] for product in response.data]
+
+    def test_renaming_a_category_refreshes_its_cached_products(self):
+        self.assertEqual(self.category_names(), ['Footwear'])
+        updated_at = Product.objects.get().updated_at
+
+        self.category.name = 'Shoes'
+        with CaptureQueriesContext(connection) as queries:
+            self.category.save()
+        self.assertFalse([q for q in queries if 'products_product' in q['sql']])
+        self.assertEqual(Product.objects.get().updated_at, updated_at)
+        self.assertEqual(self.category_names(), ['Shoes'])
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'], RECENTLY_VIEWED_FLUSH_INTERVAL=0
+)
+class RecentlyViewedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = CustomUser.objects.create_user('cust@example.com', 'pw', first_name='Cu', last_name='Stomer')
+        category = Category.objects.create(name='Footwear')
+        self.products = [make_product(category, name=f"Shoe {n}") for n in range(4)]
+
+    def stored(self):
+        return list(
+            RecentlyViewedProduct.objects.filter(user=self.user).order_by('-viewed_at')
+            .values_list('product_id', flat=True)
+        )
+
+    def test_views_are_written_through_with_no_flush_interval(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for product in (self.products[0], self.products[1], self.products[0]):
+            self.assertEqual(client.get(f'/api/products/products/{product.pk}/').status_code, 200)
+        expected = [self.products[0].pk, self.products[1].pk]
+        self.assertEqual(self.stored(), expected)
+        response = client.get('/api/products/recently-viewed/')
+        self.assertEqual([product['id'] for product in response.data], expected)
+
+    @override_settings(RECENTLY_VIEWED_FLUSH_INTERVAL=3600, RECENTLY_VIEWED_LIMIT=2)
+    def test_buffered_views_reach_the_database_on_flush_trimmed_to_the_limit(self):
+        buffer = RecentlyViewedBuffer()
+        buffer.flusher = object()  # No background flusher; the test flushes by hand
+        for product in (*self.products[:3], self.products[0]):
+            buffer.record(self.user.pk, product.pk)
+
+        # The cached list is current at once, the database only after a flush
+        self.assertEqual(buffer.recent(self.user.pk), [self.products[0].pk, self.products[2].pk])
+        self.assertEqual(self.stored(), [])
+        # Repeat views collapse into one pending row
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(self.stored(), [self.products[0].pk, self.products[2].pk])
+        self.assertEqual(buffer.flush(), 0)
+
+        cache.clear()
+        self.assertEqual(buffer.recent(self.user.pk), [self.products[0].pk, self.products[2].pk])
+
+    @override_settings(RECENTLY_VIEWED_FLUSH_INTERVAL=3600)
+    def test_flush_skips_views_of_deleted_products_and_users(self):
+        other = CustomUser.objects.create_user('other@example.com', 'pw', first_name='Ot', last_name='Her')
+        buffer = RecentlyViewedBuffer()
+        buffer.flusher = object()
+        buffer.record(self.user.pk, self.products[0].pk)
+        buffer.record(self.user.pk, self.products[1].pk)
+        buffer.record(other.pk, self.products[0].pk)
+        self.products[1].delete()
+        other.delete()
+
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(self.stored(), [self.products[0].pk])
+
+
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        paths = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_UPLOAD_SESSION_DIR=f"{media_root}/sessions", ALLOWED_HOSTS=['testserver']
+        )
+        paths.enable()
+        self.addCleanup(paths.disable)
+
+        self.admin = CustomUser.objects.create_user(
+            'admin@example.com', 'pw', first_name='Ada', last_name='Admin', role='ADMIN'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.category = Category.objects.create(name='Footwear')
+        self.image = png_bytes()
+
+    def start(self, filename='x.html', size=None):
+        response = self.client.post('/api/products/admin/uploads/', {
+            'filename': filename, 'size': size or len(self.image),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def put(self, upload_id, start, data, total=None):
+        end = start + len(data) - 1
+        return self.client.put(
+            f'/api/products/admin/uploads/{upload_id}/', data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{total or len(self.image)}',
+        )
+
+    def test_multipart_upload_is_named_after_its_content(self):
+        response = self.client.post('/api/products/admin/products/', {
+            'name': 'Shoe', 'description': 'Test product', 'price': '10.00', 'category': self.category.pk,
+            'image': SimpleUploadedFile('photo.jpg', self.image, content_type='image/jpeg'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        name = Product.objects.get().image.name
+        self.assertRegex(name, r'^products/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+
+    def test_multipart_upload_rejects_non_images(self):
+        response = self.client.post('/api/products/admin/products/', {
+            'name': 'Shoe', 'description': 'Test product', 'price': '10.00', 'category': self.category.pk,
+            'image': SimpleUploadedFile('x.png', b'<html><script></script></html>', content_type='image/png'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Product.objects.exists())
+
+    def test_resumable_upload_in_chunks(self):
+        upload_id = self.start()
+        self.assertEqual(self.put(upload_id, 0, self.image[:20]).data['received'], 20)
+
+        # A chunk that skips ahead is refused and the client resumes from "received"
+        response = self.put(upload_id, 30, self.image[30:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['received'], 20)
+
+        response = self.put(upload_id, 20, self.image[20:])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['complete'])
+        self.assertRegex(response.data['image'], r'^products/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+
+        response = self.client.post('/api/products/admin/products/', {
+            'name': 'Shoe', 'description': 'Test product', 'price': '10.00', 'category': self.category.pk,
+            'image_upload': upload_id,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Product.objects.get().image.name, response.data['image'].split('/media/')[-1])
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_resumable_upload_rejects_non_images(self):
+        body = b'<html><script></script></html>'
+        upload_id = self.start(size=len(body))
+        self.assertEqual(self.put(upload_id, 0, body, total=len(body)).status_code, 400)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_put_without_body_is_rejected(self):
+        upload_id = self.start()
+        response = self.client.put(
+            f'/api/products/admin/uploads/{upload_id}/', HTTP_CONTENT_RANGE=f'bytes 0-9/{len(self.image)}'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ImageUpload.objects.get().received, 0)
+
+    def test_uploads_are_private_to_their_owner(self):
+        upload_id = self.start()
+        other = CustomUser.objects.create_user(
+            'other@example.com', 'pw', first_name='Otto', last_name='Admin', role='ADMIN'
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/products/admin/uploads/{upload_id}/').status_code, 404)
+        self.assertEqual(self.put(upload_id, 0, self.image).status_code, 404)
+        self.assertEqual(ImageUpload.objects.get().received, 0)
+
+    def test_only_own_completed_upload_can_be_attached(self):
+        upload_id = self.start()
+        self.assertEqual(self.put(upload_id, 0, self.image).status_code, 200)
+        other = CustomUser.objects.create_user(
+            'other@example.com', 'pw', first_name='Otto', last_name='Admin', role='ADMIN'
+        )
+        self.client.force_authenticate(other)
+        response = self.client.post('/api/products/admin/products/', {
+            'name': 'Shoe', 'description': 'Test product', 'price': '10.00', 'category': self.category.pk,
+            'image_upload': upload_id,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image_upload', response.data)
+        self.assertTrue(ImageUpload.objects.filter(pk=upload_id).exists())
+
+
+class SnapshotTestMixin:
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        root = override_settings(
+            CATALOG_SNAPSHOT_ROOT=self.root, CATALOG_SNAPSHOT_BASE_URL='http://testserver', ALLOWED_HOSTS=['testserver'],
+        )
+        root.enable()
+        self.addCleanup(root.disable)
+
+    def read_snapshot(self, path):
+        target = os.path.join(snapshots.snapshot_directory(self.root, path), snapshots.INDEX_FILE)
+        if not os.path.exists(target):
+            return None
+        with open(target, 'rb') as snapshot:
+            return json.loads(snapshot.read())
+
+    def listed_names(self, category):
+        return sorted(product['name'] for product in self.read_snapshot(snapshots.category_products_path(category.pk)))
+
+
+class CatalogSnapshotTests(SnapshotTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.footwear = Category.objects.create(name='Footwear')
+        self.boots = Category.objects.create(name='Boots', parent=self.footwear)
+        self.bags = Category.objects.create(name='Bags')
+        self.hiking = Category.objects.create(name='Hiking', parent=self.boots)
+        self.product = make_product(self.hiking, 'Trail boot')
+
+    def test_publish_all_writes_every_catalog_url(self):
+        written, removed = snapshots.publish_all()
+        self.assertEqual((written, removed), (7, 0))
+        self.assertEqual(self.read_snapshot(snapshots.product_detail_path(self.product.pk))['name'], 'Trail boot')
+        self.assertEqual(self.listed_names(self.footwear), ['Trail boot'])
+        directory = snapshots.snapshot_directory(self.root, snapshots.category_list_path())
+        self.assertTrue(os.path.exists(os.path.join(directory, 'index.json.gz')))
+
+        # Unchanged content is not rewritten; a deactivated product's file goes away
+        self.assertEqual(snapshots.publish_all(), (0, 0))
+        Product.objects.filter(pk=self.product.pk).update(is_active=False)
+        snapshots.publish_all()
+        self.assertIsNone(self.read_snapshot(snapshots.product_detail_path(self.product.pk)))
+
+    @override_settings(CATALOG_SNAPSHOT_AUTO_PUBLISH=True, CATALOG_SNAPSHOT_BACKGROUND_PUBLISH=False)
+    def test_product_save_republishes_after_commit(self):
+        snapshots.publish_all()
+        product = Product.objects.get(pk=self.product.pk)
+        product.name = 'Summit boot'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(self.read_snapshot(snapshots.product_detail_path(product.pk))['name'], 'Summit boot')
+        self.assertEqual(self.listed_names(self.footwear), ['Summit boot'])
+
+    @override_settings(CATALOG_SNAPSHOT_AUTO_PUBLISH=True, CATALOG_SNAPSHOT_BACKGROUND_PUBLISH=False)
+    def test_moved_category_republishes_old_and_new_ancestors(self):
+        snapshots.publish_all()
+        self.assertEqual(self.listed_names(self.boots), ['Trail boot'])
+        self.assertEqual(self.listed_names(self.bags), [])
+
+        hiking = Category.objects.get(pk=self.hiking.pk)
+        hiking.parent = self.bags
+        with self.captureOnCommitCallbacks(execute=True):
+            hiking.save()
+        self.assertEqual(self.listed_names(self.boots), [])
+        self.assertEqual(self.listed_names(self.footwear), [])
+        self.assertEqual(self.listed_names(self.bags), ['Trail boot'])
+
+    def test_paths_for_category_include_previous_ancestors(self):
+        previous_path = self.hiking.path
+        Category.objects.filter(pk=self.hiking.pk).update(path=self.bags.path + f'{self.hiking.pk:06d}/')
+        paths = snapshots.paths_for_category(self.hiking.pk, previous_path)
+        for category in (self.footwear, self.boots, self.bags, self.hiking):
+            self.assertIn(snapshots.category_products_path(category.pk), paths)
+        self.assertNotIn(snapshots.category_products_path(self.footwear.pk), snapshots.paths_for_category(self.hiking.pk))
+
+
+@override_settings(CATALOG_SNAPSHOT_AUTO_PUBLISH=True, CATALOG_SNAPSHOT_BACKGROUND_PUBLISH=True)
+class BackgroundSnapshotPublishTests(SnapshotTestMixin, TransactionTestCase):
+    def test_publishing_happens_off_the_request_thread(self):
+        category = Category.objects.create(name='Footwear')
+        self.assertTrue(publisher.wait(10))
+        threads = []
+        publish = snapshots.publish
+
+        def recording_publish(paths, root=None):
+            threads.append(threading.current_thread())
+            return publish(paths, root)
+
+        with mock.patch.object(snapshots, 'publish', recording_publish):
+            product = make_product(category, 'Trail boot')
+            self.assertTrue(publisher.wait(10))
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+        self.assertEqual(self.read_snapshot(snapshots.product_detail_path(product.pk))['name'], 'Trail boot')
@@ -8,10 +8,13 @@ urlpatterns = [
     path('categories/<int:category_id>/products/', views.ProductsByCategoryView.as_view(), name='category-products'),
     path('newest/', views.NewestProductsView.as_view(), name='newest-products'),
     path('products/<int:pk>/', views.ProductDetailView.as_view(), name='product-detail'),
+    path('recently-viewed/', views.RecentlyViewedProductsView.as_view(), name='recently-viewed-products'),
     
     # Admin routes
     path('admin/products/', views.AdminProductListView.as_view(), name='admin-product-list'),
     path('admin/products/<int:pk>/', views.AdminProductDetailView.as_view(), name='admin-product-detail'),
     path('admin/categories/', views.AdminCategoryListView.as_view(), name='admin-category-list'),
     path('admin/categories/<int:pk>/', views.AdminCategoryDetailView.as_view(), name='admin-category-detail'),
+    path('admin/uploads/', views.AdminImageUploadListView.as_view(), name='admin-image-upload-list'),
+    path('admin/uploads/<uuid:pk>/', views.AdminImageUploadDetailView.as_view(), name='admin-image-upload-detail'),
 ]
\ No newline at end of file
@@ -1,8 +1,21 @@
 # products/views.py - Updated with proper image handling
+import os
+import re
+
+from PIL import UnidentifiedImageError
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from .models import Category, Product
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Subquery, Value
+from django.db.models.functions import Concat, Left, Length
+from ppg_backend.fieldsets import SparseFieldsetViewMixin, parse_fieldset
+from ppg_backend.uploads import IMAGE_HEADER_SIZE, StreamingUploadMixin, sniff_image
+from .models import Category, CoPurchase, ImageUpload, Product
+from .recently_viewed import recently_viewed
 from .serializers import CategorySerializer, ProductSerializer
 
 # Custom permission for admin users only
@@ -11,31 +24,86 @@ class IsAdminUser(permissions.BasePermission):
         return request.user and request.user.is_authenticated and request.user.role == 'ADMIN'
 
 # Existing public views
-class CategoryListView(generics.ListAPIView):
-    queryset = Category.objects.filter(is_active=True)
+class CategoryListView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """Active categories in tree order; ?subtree=<id> limits it to one category and its descendants"""
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    query_budget = 3
+
+    def get_queryset(self):
+        queryset = Category.objects.filter(is_active=True).order_by('path')
+        subtree = self.request.query_params.get('subtree')
+        if subtree:
+            if not subtree.isdigit():
+                raise ValidationError({"subtree": "subtree must be a category ID"})
+            path = Category.objects.filter(pk=subtree).values_list('path', flat=True).first()
+            if path is None:
+                return queryset.none()
+            queryset = queryset.subtree(path)
+        return queryset
 
-class ProductsByCategoryView(generics.ListAPIView):
+class ProductsByCategoryView(SparseFieldsetViewMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
-        category_id = self.kwargs['category_id']
-        return Product.objects.filter(category_id=category_id, is_active=True)
+        # Products anywhere under the category, as one range scan over category paths
+        root = Category.objects.filter(pk=self.kwargs['category_id'])
+        upper_bound = root.annotate(upper=Concat(Left('path', Length('path') - 1), Value('0'))).values('upper')[:1]
+        return Product.objects.filter(
+            category__path__gte=Subquery(root.values('path')[:1]),
+            category__path__lt=Subquery(upper_bound),
+            is_active=True,
+        )
 
-class NewestProductsView(generics.ListAPIView):
+    query_budget = 2
+
+class NewestProductsView(SparseFieldsetViewMixin, generics.ListAPIView):
     queryset = Product.objects.filter(is_active=True).order_by('-created_at')[:10]
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
+    query_budget = 2
 
-class ProductDetailView(generics.RetrieveAPIView):
+class ProductDetailView(SparseFieldsetViewMixin, generics.RetrieveAPIView):
     queryset = Product.objects.filter(is_active=True)
     serializer_class = ProductSerializer
     permission_classes = [permissions.AllowAny]
+    # One more when a signed-in viewer's recently viewed list has to be reloaded
+    query_budget = 4
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            recently_viewed.record(request.user.pk, int(self.kwargs['pk']))
+        if self.wants_recommendations():
+            # One indexed lookup on the precomputed co-purchase table
+            related = CoPurchase.objects.top_related(self.kwargs['pk'], settings.RECOMMENDATIONS_TOP_K)
+            response.data['frequently_bought_together'] = ProductSerializer(
+                related, many=True, context=self.get_serializer_context()
+            ).data
+        return response
+
+    def wants_recommendations(self):
+        include = parse_fieldset(self.request.query_params.get('fields'))
+        exclude = parse_fieldset(self.request.query_params.get('exclude'))
+        return (not include or 'frequently_bought_together' in include) and 'frequently_bought_together' not in exclude
+
+class RecentlyViewedProductsView(SparseFieldsetViewMixin, generics.ListAPIView):
+    """The signed-in user's recently viewed products, newest first"""
+    serializer_class = ProductSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    queryset = Product.objects.filter(is_active=True)
+    query_budget = 2
+
+    def list(self, request, *args, **kwargs):
+        # The ids come from the cached list; only the products themselves are read
+        product_ids = recently_viewed.recent(request.user.pk)
+        products = self.filter_queryset(self.get_queryset()).in_bulk(product_ids)
+        serializer = self.get_serializer([products[pk] for pk in product_ids if pk in products], many=True)
+        return Response(serializer.data)
 
 # Admin views with file upload support
-class AdminProductListView(generics.ListCreateAPIView):
+class AdminProductListView(StreamingUploadMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     """View to list all products and create new ones - admin only"""
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
@@ -43,7 +111,7 @@ class AdminProductListView(generics.ListCreateAPIView):
     parser_classes = (MultiPartParser, FormParser, JSONParser)
     
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response({
             "products": serializer.data,
@@ -57,7 +125,7 @@ class AdminProductListView(generics.ListCreateAPIView):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-class AdminProductDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AdminProductDetailView(StreamingUploadMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """View to retrieve, update or delete a product - admin only"""
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
@@ -74,13 +142,12 @@ class AdminProductDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Delete associated image file
-        if instance.image:
-            instance.image.delete(save=False)
+        # The image file may be shared with other rows; its name is queued for
+        # process_media_deletions, which deletes it once nothing references it
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class AdminCategoryListView(generics.ListCreateAPIView):
+class AdminCategoryListView(StreamingUploadMixin, SparseFieldsetViewMixin, generics.ListCreateAPIView):
     """View to list all categories and create new ones - admin only"""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -88,7 +155,7 @@ class AdminCategoryListView(generics.ListCreateAPIView):
     parser_classes = (MultiPartParser, FormParser, JSONParser)
     
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response({
             "categories": serializer.data,
@@ -102,7 +169,7 @@ class AdminCategoryListView(generics.ListCreateAPIView):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-class AdminCategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class AdminCategoryDetailView(StreamingUploadMixin, SparseFieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     """View to retrieve, update or delete a category - admin only"""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -120,16 +187,116 @@ class AdminCategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         
-        # Check if category has products
-        if instance.products.exists():
+        # Check if category has products, its own or in subcategories
+        if instance.product_count or instance.products.exists():
             return Response(
                 {"error": "Cannot delete category that contains products. Please move or delete products first."},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if instance.children.exists():
+            return Response(
+                {"error": "Cannot delete category that has subcategories. Please move or delete them first."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Delete associated image file
-        if instance.image:
-            instance.image.delete(save=False)
-        
+        # The image file may be shared with other rows; its name is queued for
+        # process_media_deletions, which deletes it once nothing references it
         self.perform_destroy(instance)
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+def describe_upload(upload):
+    return {
+        "id": str(upload.id),
+        "filename": upload.filename,
+        "size": upload.size,
+        "received": upload.received,
+        "complete": upload.complete,
+        "image": upload.image.name or None,
+    }
+
+
+class AdminImageUploadListView(APIView):
+    """Start a resumable image upload - admin only"""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        filename = os.path.basename(str(request.data.get('filename') or ''))
+        folder = request.data.get('folder', 'products')
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            return Response({"error": "size is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not filename:
+            return Response({"error": "filename is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if folder not in dict(ImageUpload.FOLDER_CHOICES):
+            return Response({"error": "folder must be products or categories"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < size <= settings.IMAGE_UPLOAD_MAX_SIZE:
+            return Response({"error": f"size must be between 1 and {settings.IMAGE_UPLOAD_MAX_SIZE} bytes"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        upload = ImageUpload.objects.create(user=request.user, folder=folder, filename=filename, size=size)
+        return Response(describe_upload(upload), status=status.HTTP_201_CREATED)
+
+
+class AdminImageUploadDetailView(APIView):
+    """Check or continue a resumable image upload with PUT + Content-Range - admin only"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        upload = ImageUpload.objects.filter(pk=pk, user=request.user).first()
+        if upload is None:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(describe_upload(upload))
+
+    def put(self, request, pk):
+        match = CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+        if not match:
+            return Response({"error": "Content-Range: bytes <start>-<end>/<size> is required"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        start, end, total = (int(value) for value in match.groups())
+        length = end - start + 1
+        if length <= 0 or length > settings.IMAGE_UPLOAD_CHUNK_MAX_SIZE:
+            return Response({"error": f"Chunks must be 1 to {settings.IMAGE_UPLOAD_CHUNK_MAX_SIZE} bytes"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if request.stream is None:
+            return Response({"error": "Request body is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            upload = ImageUpload.objects.select_for_update().filter(pk=pk, user=request.user).first()
+            if upload is None:
+                return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+            if total != upload.size or end >= upload.size:
+                return Response({"error": "Content-Range does not match the upload size"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if upload.complete or start != upload.received:
+                # The client resumes from "received"
+                return Response(describe_upload(upload), status=status.HTTP_409_CONFLICT)
+
+            header = b''
+            if start == 0:
+                header = request.stream.read(min(IMAGE_HEADER_SIZE, length))
+                if sniff_image(header) is None:
+                    upload.delete()
+                    return Response({"error": "Upload is not a JPEG, PNG, GIF or WebP image"},
+                                    status=status.HTTP_400_BAD_REQUEST)
+
+            if not upload.append(request.stream, length, prefix=header):
+                upload.save(update_fields=['received', 'updated_at'])
+                return Response({"error": "Request body is shorter than Content-Range", **describe_upload(upload)},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            if upload.received == upload.size:
+                try:
+                    upload.finish()
+                except (OSError, SyntaxError, UnidentifiedImageError):
+                    upload.discard_part()
+                    upload.delete()
+                    return Response({"error": "Upload is not a valid image"}, status=status.HTTP_400_BAD_REQUEST)
+            upload.save(update_fields=['received', 'image', 'updated_at'])
+
+        return Response(describe_upload(upload))